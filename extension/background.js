@@ -6,6 +6,36 @@ const IS_FIREFOX = typeof browser !== 'undefined';
 const MEDIA_EXTENSIONS = ['.m3u8', '.mpd', '.mp4', '.flv', '.webm', '.mkv', '.avi', '.mov'];
 const MEDIA_PATTERNS = ['playlist', 'chunklist', 'master', 'index', 'manifest', 'stream', 'video', 'media'];
 
+// The patterns above compiled once into case-insensitive regexes, so the
+// request listener never lowercases or loops over lists per request
+function escapeRegExp(text) {
+  return text.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
+}
+const SEGMENT_RE = /\.m4s|\.ts\?|\/seg-\d+|\/chunk/i;
+const MEDIA_EXTENSION_RE = new RegExp(
+  MEDIA_EXTENSIONS.map(ext => escapeRegExp(ext)).join('|'), 'i');
+const MEDIA_PATTERN_RE = new RegExp(
+  `^(?=.*(?:${MEDIA_PATTERNS.map(escapeRegExp).join('|')}))(?=.*(?:m3u8|\\.mp4|video))`, 'i');
+const STREAM_TYPES = { '.m3u8': 'hls', '.mpd': 'dash' };
+
+// Stream type for a request URL ("hls", "dash", "mp4", ...), or null if it
+// is not a media stream worth offering (segments and chunks are skipped)
+function classifyRequest(url, requestType) {
+  if (SEGMENT_RE.test(url)) {
+    return null;
+  }
+  const ext = MEDIA_EXTENSION_RE.exec(url);
+  if (ext) {
+    const found = ext[0].toLowerCase();
+    return STREAM_TYPES[found] || found.slice(1);
+  }
+  // Streams without a clear extension, fetched as media or by script
+  if ((requestType === 'media' || requestType === 'xmlhttprequest') && MEDIA_PATTERN_RE.test(url)) {
+    return /m3u8/i.test(url) ? 'hls' : 'video';
+  }
+  return null;
+}
+
 // Helper function for setting badge (works with both Chrome MV3 and Firefox MV2)
 function setBadge(text) {
   try {
@@ -21,32 +51,410 @@ function setBadge(text) {
   }
 }
 
-// Cross-browser native messaging helper
-// Firefox returns Promises, Chrome uses callbacks
-function sendNativeMessage(hostName, message) {
-  return new Promise((resolve, reject) => {
-    if (IS_FIREFOX) {
-      // Firefox: Promise-based API
-      browser.runtime.sendNativeMessage(hostName, message)
-        .then(response => resolve(response))
-        .catch(error => reject(error));
+// Long-lived native host connection
+// One connectNative port carries every command; replies are matched to
+// requests by the "id" field the host echoes back.
+const HOST_NAME = "com.my_downloader";
+let hostPort = null;
+let nextRequestId = 1;
+const pendingRequests = new Map();
+// Replies over Chrome's 1 MB host->browser limit arrive as numbered chunk
+// frames carrying base64 slices of the JSON; parts are kept here until the
+// last one arrives
+const chunkedMessages = new Map();
+
+// Returns the whole message once every chunk of it has arrived, else null
+function collectChunk(frame) {
+  let entry = chunkedMessages.get(frame.chunk);
+  if (!entry) {
+    entry = { parts: new Array(frame.count), received: 0 };
+    chunkedMessages.set(frame.chunk, entry);
+  }
+  if (entry.parts[frame.index] === undefined) {
+    entry.parts[frame.index] = frame.data;
+    entry.received++;
+  }
+  if (entry.received < frame.count) {
+    return null;
+  }
+  chunkedMessages.delete(frame.chunk);
+  const binary = entry.parts.map(part => atob(part)).join('');
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) {
+    bytes[i] = binary.charCodeAt(i);
+  }
+  return JSON.parse(new TextDecoder().decode(bytes));
+}
+
+function getHostPort() {
+  if (hostPort) {
+    return hostPort;
+  }
+  
+  const port = API.runtime.connectNative(HOST_NAME);
+  
+  port.onMessage.addListener((message) => {
+    if (message && message.chunk !== undefined) {
+      message = collectChunk(message);
+      if (!message) {
+        return;
+      }
+    }
+    if (message && message.event) {
+      handleHostEvent(message);
+      return;
+    }
+    if (message && pendingRequests.has(message.id)) {
+      const request = pendingRequests.get(message.id);
+      pendingRequests.delete(message.id);
+      request.resolve(message);
+    }
+  });
+  
+  port.onDisconnect.addListener(() => {
+    // Chrome reports the reason via lastError, Firefox via port.error
+    const lastError = (!IS_FIREFOX && chrome.runtime.lastError) || port.error;
+    const errorMsg = (lastError && lastError.message) || "Native host disconnected";
+    console.log("Native host disconnected:", errorMsg);
+    
+    if (hostPort === port) {
+      hostPort = null;
+    }
+    pendingRequests.forEach(request => request.reject(new Error(errorMsg)));
+    pendingRequests.clear();
+    chunkedMessages.clear();
+  });
+  
+  hostPort = port;
+  
+  // Ask the host to push progress events on this port; the reply carries
+  // the parameters it strips from stream URLs
+  const id = nextRequestId++;
+  pendingRequests.set(id, {
+    resolve: reply => {
+      if (reply && Array.isArray(reply.strip)) {
+        volatileParamRe = compileParamPatterns(reply.strip);
+      }
+    },
+    reject: () => {}
+  });
+  port.postMessage({ command: "subscribe", id: id });
+  
+  return port;
+}
+
+// "1h 02m", "3m 20s", "45s" for an ETA in seconds
+function formatEta(seconds) {
+  if (seconds === null || seconds === undefined) {
+    return '';
+  }
+  const total = Math.round(seconds);
+  const hours = Math.floor(total / 3600);
+  const minutes = Math.floor((total % 3600) / 60);
+  if (hours > 0) {
+    return `${hours}h ${String(minutes).padStart(2, '0')}m`;
+  }
+  if (minutes > 0) {
+    return `${minutes}m ${String(total % 60).padStart(2, '0')}s`;
+  }
+  return `${total}s`;
+}
+
+// Extension status for a host job state that ends the download
+const TERMINAL_STATES = {
+  finished: 'completed',
+  failed: 'error',
+  interrupted: 'error',
+  stopped: 'stopped'
+};
+
+// Settle a download from the host's final word on it: exit code, size and
+// duration. Returns true if the download changed.
+function settleDownload(download, result) {
+  // A "finished" event carries the job state as status, a progress reply as state
+  const status = TERMINAL_STATES[result.event === 'finished' ? result.status : result.state];
+  if (!status) {
+    return false;
+  }
+  download.status = status;
+  download.exitCode = result.exit_code;
+  download.finalSize = result.size !== undefined ? result.size : (result.downloaded || 0);
+  if (result.duration !== undefined) {
+    download.duration = result.duration;
+  }
+  if (result.elapsed !== undefined) {
+    download.elapsed = result.elapsed;
+  }
+  if (status === 'completed') {
+    download.progress = 100;
+  } else if (status === 'error') {
+    download.error = result.error ||
+      (result.exit_code !== null && result.exit_code !== undefined ?
+        `FFmpeg exited with code ${result.exit_code}` : 'Download interrupted');
+  }
+  stopProgressMonitoring(download.jobId);
+  return true;
+}
+
+// Every change the background script makes to the stored downloads goes
+// through updateDownloads(mutate). One storage read/write is in flight at a
+// time and the mutations queued meanwhile are applied together in the next
+// one, so pushed events and poll ticks never overwrite each other's writes
+// and a burst of events costs one round trip. mutate(downloads) returns
+// true if it changed anything.
+let pendingMutations = [];
+let downloadsBusy = false;
+
+function updateDownloads(mutate) {
+  pendingMutations.push(mutate);
+  if (!downloadsBusy) {
+    flushDownloads();
+  }
+}
+
+function flushDownloads() {
+  const mutations = pendingMutations;
+  pendingMutations = [];
+  downloadsBusy = true;
+  API.storage.local.get(['downloads'], (result) => {
+    const downloads = result.downloads || [];
+    let changed = false;
+    mutations.forEach(mutate => {
+      changed = mutate(downloads) || changed;
+    });
+    const done = () => {
+      downloadsBusy = false;
+      if (pendingMutations.length > 0) {
+        flushDownloads();
+      }
+    };
+    if (changed) {
+      API.storage.local.set({ downloads: downloads }, done);
     } else {
-      // Chrome: Callback-based API
-      chrome.runtime.sendNativeMessage(hostName, message, (response) => {
-        if (chrome.runtime.lastError) {
-          reject(new Error(chrome.runtime.lastError.message));
-        } else {
-          resolve(response);
+      done();
+    }
+  });
+}
+
+// Apply an event pushed by the host to the stored download
+function handleHostEvent(event) {
+  // A background probe finished; the same stream may be listed in several tabs
+  if (event.event === "probed") {
+    if (event.probe) {
+      let claimed = false;
+      streamCatalog.forEach(streams => streams.forEach(stream => {
+        if (stream.probeKey === event.key) {
+          applyProbe(stream, event.probe);
+          claimed = true;
         }
-      });
+      }));
+      if (!claimed) {
+        // The event can overtake the reply that gives the stream its key
+        unclaimedProbes.set(event.key, event.probe);
+        if (unclaimedProbes.size > MAX_UNCLAIMED_PROBES) {
+          unclaimedProbes.delete(unclaimedProbes.keys().next().value);
+        }
+      }
+    }
+    return;
+  }
+  
+  if (event.event !== "progress" && event.event !== "started" && event.event !== "finished") {
+    return;
+  }
+  
+  updateDownloads(downloads => {
+    const download = downloads.find(d => d.jobId === event.job_id);
+    if (!download) {
+      return false;
+    }
+    
+    // The job ended: switch state now, whatever the file size is doing
+    if (event.event === "finished") {
+      if (download.status === 'downloading' || download.status === 'queued') {
+        return settleDownload(download, event);
+      }
+      return false;
+    }
+    
+    // A queued job got a scheduler slot and FFmpeg is running
+    if (event.event === "started") {
+      download.status = 'downloading';
+      download.pid = event.pid;
+      download.queuePosition = 0;
+      return true;
+    }
+    
+    if (download.status !== 'downloading') {
+      return false;
+    }
+    
+    const sizeText = `${((event.downloaded || 0) / (1024*1024)).toFixed(2)} MB`;
+    const speedText = event.speed ? `${event.speed.toFixed(2)}x` :
+      (event.rate ? `${(event.rate / (1024*1024)).toFixed(2)} MB/s` : 'Calculating...');
+    const etaText = formatEta(event.eta);
+    download.currentSize = event.downloaded || 0;
+    download.speedText = `${sizeText} | ${speedText}` + (etaText ? ` | ETA ${etaText}` : '');
+    if (event.percent !== null && event.percent !== undefined) {
+      download.progress = event.percent;
+    }
+    download.estimatedTotal = event.estimated_total || 0;
+    download.eta = event.eta;
+    download.lastEventTime = Date.now();
+    return true;
+  });
+}
+
+// Send a command to the native host and resolve with its reply
+function hostRequest(message) {
+  return new Promise((resolve, reject) => {
+    const id = nextRequestId++;
+    pendingRequests.set(id, { resolve, reject });
+    try {
+      getHostPort().postMessage(Object.assign({}, message, { id: id }));
+    } catch (e) {
+      pendingRequests.delete(id);
+      reject(e);
     }
   });
 }
 
+// Detected streams per tab
+// Every matching request lands in an in-memory catalog: per tab, keyed on
+// the URL without its rotating auth parameters, most recently seen last and
+// at most MAX_STREAMS_PER_TAB entries. Storage is written in one batch at
+// most every CATALOG_FLUSH_MS, not once per request.
+const MAX_STREAMS_PER_TAB = 50;
+const CATALOG_FLUSH_MS = 2000;
+// Query parameters that change on every request for the same stream, as
+// fnmatch patterns: a copy of the host's canonical.DEFAULT_STRIP (a test
+// keeps the two equal), replaced by the host's own list, rules file
+// included, once it answers "subscribe"
+const DEFAULT_VOLATILE_PARAMS = [
+  'secure', 'token', '*_token', 'token_*', '_tid', 'tid', 'sig', 'signature',
+  'expires', 'exp', 'hdnts', 'hdntl', '__gda__', 'policy', 'key-pair-id',
+  'x-amz-*', 'x-goog-*', 'auth', 'auth_key', 'sessionid', 'utm_*', '_', 'cachebuster'
+];
+
+function compileParamPatterns(patterns) {
+  const alternatives = patterns.map(pattern =>
+    escapeRegExp(pattern).replace(/\\\*/g, '.*').replace(/\\\?/g, '.'));
+  return new RegExp(`^(?:${alternatives.join('|')})$`, 'i');
+}
+let volatileParamRe = compileParamPatterns(DEFAULT_VOLATILE_PARAMS);
+const streamCatalog = new Map();   // tabId -> Map(key -> stream)
+let lastStream = null;
+let catalogFlushTimer = null;
+
+function streamKey(url) {
+  try {
+    const parsed = new URL(url);
+    const kept = [];
+    parsed.searchParams.forEach((value, name) => {
+      if (!volatileParamRe.test(name)) {
+        kept.push(`${name}=${value}`);
+      }
+    });
+    return `${parsed.origin}${parsed.pathname}?${kept.sort().join('&')}`;
+  } catch (e) {
+    return url;
+  }
+}
+
+// Record one sighting of a stream; returns true for a stream new to the tab
+function catalogStream(tabId, url, type) {
+  let streams = streamCatalog.get(tabId);
+  if (!streams) {
+    streams = new Map();
+    streamCatalog.set(tabId, streams);
+  }
+  const key = streamKey(url);
+  const now = Date.now();
+  const known = streams.get(key);
+  if (known) {
+    // Move to the end (most recent) and keep the freshest signed URL
+    streams.delete(key);
+    known.url = url;
+    known.lastSeen = now;
+    known.count++;
+    streams.set(key, known);
+  } else {
+    const stream = { url: url, type: type, firstSeen: now, lastSeen: now, count: 1 };
+    streams.set(key, stream);
+    if (streams.size > MAX_STREAMS_PER_TAB) {
+      streams.delete(streams.keys().next().value);
+    }
+    // Only manifests are worth probing up front: progressive files and
+    // stray segments would each cost the host an ffmpeg -i for nothing
+    if (type === "hls" || type === "dash") {
+      probeStream(stream);
+    }
+  }
+  lastStream = url;
+  scheduleCatalogFlush();
+  return !known;
+}
+
+// "probed" events that arrived before the probe reply naming their key,
+// oldest first; the reply claims its result from here
+const MAX_UNCLAIMED_PROBES = 20;
+const unclaimedProbes = new Map();   // key -> probe
+
+// Ask the host to probe a new stream right away (manifest, variants,
+// codecs), so a download of it later skips most of FFmpeg's startup
+function probeStream(stream) {
+  hostRequest({ command: "probe", url: stream.url })
+    .then(response => {
+      if (!response || response.status === "error") {
+        return;
+      }
+      stream.probeKey = response.key;
+      const probe = response.status === "probed" ? response : unclaimedProbes.get(response.key);
+      unclaimedProbes.delete(response.key);
+      if (probe) {
+        applyProbe(stream, probe);
+      }
+    })
+    .catch(() => {});   // no host: streams are still listed, just unprobed
+}
+
+function applyProbe(stream, probe) {
+  stream.duration = probe.duration;
+  stream.live = probe.live;
+  stream.container = probe.container;
+  stream.variants = (probe.variants || []).length;
+  scheduleCatalogFlush();
+}
+
+function tabStreams(tabId) {
+  const streams = streamCatalog.get(tabId);
+  // Most recently seen first
+  return streams ? Array.from(streams.values()).reverse() : [];
+}
+
+function scheduleCatalogFlush() {
+  if (!catalogFlushTimer) {
+    catalogFlushTimer = setTimeout(flushCatalog, CATALOG_FLUSH_MS);
+  }
+}
+
+function flushCatalog() {
+  catalogFlushTimer = null;
+  const catalog = {};
+  streamCatalog.forEach((streams, tabId) => {
+    catalog[tabId] = tabStreams(tabId);
+  });
+  const update = { stream_catalog: catalog };
+  if (lastStream) {
+    update.last_stream = lastStream;
+  }
+  API.storage.local.set(update);
+}
+
 // Initialize
 try {
   // Clear storage on startup
-  API.storage.local.remove('last_stream');
+  API.storage.local.remove(['last_stream', 'stream_catalog']);
   setBadge("");
 } catch (e) {
   console.log("Initialization error:", e.message);
@@ -59,27 +467,9 @@ try {
   
   webRequestAPI.onBeforeRequest.addListener(
     (details) => {
-      const url = details.url.toLowerCase();
-      const originalUrl = details.url;
-      
-      // Skip small segments and chunks
-      if (url.includes('.m4s') || url.includes('.ts?') || url.match(/\/seg-\d+/) || url.includes('/chunk')) {
-        return;
-      }
-      
-      // Check for media extensions
-      const hasMediaExt = MEDIA_EXTENSIONS.some(ext => url.includes(ext));
-      
-      // Check for media patterns in URL (for streams without clear extensions)
-      const hasMediaPattern = MEDIA_PATTERNS.some(pattern => url.includes(pattern)) && 
-                              (url.includes('m3u8') || url.includes('.mp4') || url.includes('video'));
-      
-      // Check content type header for video
-      const isVideoType = details.type === 'media' || details.type === 'xmlhttprequest';
-      
-      if (hasMediaExt || (hasMediaPattern && isVideoType)) {
-        console.log('[Stream Detected]', originalUrl);
-        API.storage.local.set({ last_stream: originalUrl });
+      const type = classifyRequest(details.url, details.type);
+      if (type && catalogStream(details.tabId, details.url, type)) {
+        console.log('[Stream Detected]', type, details.url);
         setBadge("!");
       }
     },
@@ -89,27 +479,78 @@ try {
   console.log("webRequest not available:", e.message);
 }
 
+// A closed tab's streams go with it
+try {
+  API.tabs.onRemoved.addListener((tabId) => {
+    if (streamCatalog.delete(tabId)) {
+      scheduleCatalogFlush();
+    }
+  });
+} catch (e) {
+  console.log("tabs.onRemoved not available:", e.message);
+}
+
 // 3. Handle Download Messages and Kill Commands
 API.runtime.onMessage.addListener((message, sender, sendResponse) => {
+  if (message.command === "get-streams") {
+    // Straight from memory: storage may be up to one flush behind
+    sendResponse({ streams: tabStreams(message.tabId), lastStream: lastStream });
+    return;
+  }
+  
+  if (message.command === "clear-streams") {
+    // One stream (e.g. once it is downloading), or everything
+    if (message.url) {
+      const key = streamKey(message.url);
+      streamCatalog.forEach(streams => streams.delete(key));
+    } else {
+      streamCatalog.clear();
+    }
+    lastStream = null;
+    API.storage.local.remove('last_stream');
+    scheduleCatalogFlush();
+    sendResponse({ status: "cleared" });
+    return;
+  }
+  
   if (message.command === "download") {
     console.log("Download request:", message);
     
-    // Use cross-browser native messaging helper
-    sendNativeMessage("com.my_downloader", { url: message.url, filename: message.filename })
+    hostRequest({
+      command: "download",
+      url: message.url,
+      filename: message.filename,
+      priority: message.priority || 0,
+      engine: message.engine,
+      select: message.select
+    })
       .then(response => {
         if (response && response.status === "success") {
           console.log("Download started successfully:", response);
           sendResponse({ 
             status: "started", 
+            jobId: response.job_id,
             pid: response.pid, 
             filename: response.filename, 
-            path: response.path 
+            path: response.path,
+            queuePosition: response.queue_position || 0,
+            attached: !!response.attached
           });
           
-          // Start monitoring progress for this download
-          if (response.pid) {
-            startProgressMonitoring(response.pid, response.filename, response.path);
+          // Start monitoring progress for this download (queued jobs too);
+          // a duplicate request attached to a job may already be monitored
+          if (response.job_id && !monitoredJobs.has(response.job_id)) {
+            startProgressMonitoring(response.job_id);
           }
+        } else if (response && response.status === "exists") {
+          // Same stream, already downloaded and still on disk
+          sendResponse({
+            status: "exists",
+            jobId: response.job_id,
+            filename: response.filename,
+            path: response.path,
+            size: response.size
+          });
         } else if (response && response.status === "error") {
           console.error("FFmpeg error:", response.message);
           sendResponse({ status: "error", error: response.message || "FFmpeg failed to start" });
@@ -129,8 +570,8 @@ API.runtime.onMessage.addListener((message, sender, sendResponse) => {
   
   if (message.command === "kill") {
     const pid = message.pid;
-    if (pid) {
-      sendNativeMessage("com.my_downloader", { command: "kill", pid: pid })
+    if (pid || message.jobId) {
+      hostRequest({ command: "kill", pid: pid, job_id: message.jobId })
         .then(response => {
           console.log("Kill response:", response);
           sendResponse({ status: "killed" });
@@ -144,80 +585,117 @@ API.runtime.onMessage.addListener((message, sender, sendResponse) => {
   }
 });
 
-// Monitor progress for a specific download by checking file size
-function startProgressMonitoring(pid, filename, path) {
-  let lastSize = 0;
-  let lastTime = Date.now();
-  let stuckCount = 0;
-  const maxStuckChecks = 60; // Consider complete after 30 seconds of no growth
+// Progress polling
+// One shared loop asks the host about every monitored job with a single
+// get-progress-batch request per tick, then applies all replies in one
+// updateDownloads() batch. Pushed events stay the primary source; polling only
+// fills in when they go quiet, and picks up a job's terminal state if its
+// "finished" event was missed (e.g. the port reconnected meanwhile).
+const PROGRESS_POLL_MS = 2000;
+const monitoredJobs = new Map(); // jobId -> { lastSize, lastTime }
+let progressTimer = null;
+
+// Start monitoring progress for a download by job id
+function startProgressMonitoring(jobId) {
+  monitoredJobs.set(jobId, { lastSize: 0, lastTime: Date.now() });
+  if (!progressTimer) {
+    progressTimer = setInterval(pollProgress, PROGRESS_POLL_MS);
+  }
+}
+
+function stopProgressMonitoring(jobId) {
+  monitoredJobs.delete(jobId);
+  if (monitoredJobs.size === 0 && progressTimer) {
+    clearInterval(progressTimer);
+    progressTimer = null;
+  }
+}
+
+function pollProgress() {
+  const jobIds = Array.from(monitoredJobs.keys());
+  if (jobIds.length === 0) {
+    return;
+  }
   
-  const progressInterval = setInterval(() => {
-    // Check file size by sending get-progress command (cross-browser)
-    sendNativeMessage("com.my_downloader", { command: "get-progress", pid: pid, filename: filename })
-      .then(response => {
-        API.storage.local.get(['downloads'], (result) => {
-          const downloads = result.downloads || [];
-          const download = downloads.find(d => d.pid === pid);
-          
-          if (!download || download.status !== 'downloading') {
-            clearInterval(progressInterval);
-            return;
-          }
-          
-          if (response && response.status === "progress") {
-            const currentSize = response.downloaded || 0;
-            const now = Date.now();
-            const timeDiff = (now - lastTime) / 1000;
-            const sizeDiff = currentSize - lastSize;
-            
-            // Calculate speed
-            let speedText = 'Calculating...';
-            if (timeDiff > 0 && sizeDiff > 0) {
-              const speedMBps = (sizeDiff / (1024 * 1024)) / timeDiff;
-              speedText = `${speedMBps.toFixed(2)} MB/s`;
-              stuckCount = 0;
-            } else {
-              stuckCount++;
-            }
-            
-            // Update download in queue
-            download.currentSize = currentSize;
-            download.speedText = `${(currentSize / (1024*1024)).toFixed(2)} MB | ${speedText}`;
-            
-            lastSize = currentSize;
-            lastTime = now;
-            
-            // Check if download might be complete (no growth for 30 seconds)
-            if (stuckCount >= maxStuckChecks && currentSize > 0) {
-              download.status = 'completed';
-              download.finalSize = currentSize;
-              clearInterval(progressInterval);
-            }
-            
-            API.storage.local.set({ downloads: downloads });
-          } else if (response && response.status === "error") {
-            // Process might have finished - check if file exists with size
-            stuckCount++;
-            if (stuckCount >= maxStuckChecks) {
-              if (lastSize > 0) {
-                download.status = 'completed';
-                download.finalSize = lastSize;
-              } else {
-                download.status = 'error';
-                download.error = 'Download failed or file not found';
-              }
-              API.storage.local.set({ downloads: downloads });
-              clearInterval(progressInterval);
-            }
-          }
+  hostRequest({ command: "get-progress-batch", job_ids: jobIds })
+    .then(response => {
+      const replies = (response && response.jobs) || {};
+      updateDownloads(downloads => {
+        let changed = false;
+        jobIds.forEach(jobId => {
+          changed = applyProgress(downloads, jobId, replies[jobId]) || changed;
         });
-      })
-      .catch(error => {
-        console.log("Progress check failed:", error.message);
-        stuckCount++;
-        if (stuckCount >= maxStuckChecks) {
-          clearInterval(progressInterval);
-        }
+        return changed;
       });
-  }, 2000); // Check every 2 seconds
-}
\ No newline at end of file
+    })
+    .catch(error => {
+      // The next tick reconnects; a host that died meanwhile reports its
+      // jobs as interrupted once it is back
+      console.log("Progress check failed:", error.message);
+    });
+}
+
+// Apply one job's progress reply to the stored downloads; returns true if
+// anything changed
+function applyProgress(downloads, jobId, response) {
+  const state = monitoredJobs.get(jobId);
+  const download = downloads.find(d => d.jobId === jobId);
+  
+  if (!state || !download || (download.status !== 'downloading' && download.status !== 'queued')) {
+    stopProgressMonitoring(jobId);
+    return false;
+  }
+  
+  // Still waiting for a scheduler slot on the host
+  if (response && response.state === 'queued') {
+    download.status = 'queued';
+    download.queuePosition = response.queue_position;
+    return true;
+  }
+  
+  if (response && response.status === "progress") {
+    if (settleDownload(download, response)) {
+      return true;
+    }
+    
+    const currentSize = response.downloaded || 0;
+    const now = Date.now();
+    const timeDiff = (now - state.lastTime) / 1000;
+    const sizeDiff = currentSize - state.lastSize;
+    
+    // Calculate speed
+    let speedText = 'Calculating...';
+    if (timeDiff > 0 && sizeDiff > 0) {
+      const speedMBps = (sizeDiff / (1024 * 1024)) / timeDiff;
+      speedText = `${speedMBps.toFixed(2)} MB/s`;
+    }
+    
+    // Update download in queue, unless pushed events are already
+    // keeping it current with FFmpeg's own numbers
+    if (!download.lastEventTime || now - download.lastEventTime > 5000) {
+      const etaText = formatEta(response.eta);
+      download.currentSize = currentSize;
+      download.speedText = `${(currentSize / (1024*1024)).toFixed(2)} MB | ${speedText}` +
+        (etaText ? ` | ETA ${etaText}` : '');
+      if (response.percent !== null && response.percent !== undefined) {
+        download.progress = response.percent;
+      }
+      download.estimatedTotal = response.estimated_total || 0;
+      download.eta = response.eta;
+    }
+    
+    state.lastSize = currentSize;
+    state.lastTime = now;
+    return true;
+  }
+  
+  // Every job is recorded by the host before it replies to "download", so
+  // a job it has no record of will never report anything
+  if (response && response.status === "error") {
+    download.status = 'error';
+    download.error = response.message || 'Unknown job';
+    stopProgressMonitoring(jobId);
+    return true;
+  }
+  return false;
+}
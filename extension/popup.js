@@ -14,12 +14,33 @@ document.addEventListener('DOMContentLoaded', () => {
   const activeCount = document.getElementById('activeCount');
   const emptyQueue = document.getElementById('emptyQueue');
   
-  // Load last detected stream
-  API.storage.local.get(['last_stream'], (result) => {
-    if (result.last_stream) {
-      urlInput.value = result.last_stream;
-    }
-  });
+  const streamSelect = document.getElementById('streamSelect');
+  
+  // Streams the background script caught on this tab, newest first; the
+  // global last stream is the fallback (e.g. for a stream in another tab)
+  function loadStreams() {
+    API.tabs.query({ active: true, currentWindow: true }, (tabs) => {
+      const tabId = tabs && tabs[0] ? tabs[0].id : undefined;
+      API.runtime.sendMessage({ command: "get-streams", tabId: tabId }, (response) => {
+        const streams = (response && response.streams) || [];
+        if (streams.length > 0) {
+          urlInput.value = streams[0].url;
+        } else if (response && response.lastStream) {
+          urlInput.value = response.lastStream;
+        }
+        streamSelect.style.display = streams.length > 1 ? '' : 'none';
+        streamSelect.innerHTML = streams.map((s, index) => {
+          const name = s.url.split('?')[0].split('/').pop() || s.url;
+          const length = s.live ? 'live' : (s.duration ? `${Math.round(s.duration / 60)} min` : '');
+          return `<option value="${index}">${s.type.toUpperCase()} · ${name}${length ? ' · ' + length : ''} (${s.count}×)</option>`;
+        }).join('');
+        streamSelect.onchange = () => {
+          urlInput.value = streams[parseInt(streamSelect.value)].url;
+        };
+      });
+    });
+  }
+  loadStreams();
   
   // Load and render queue
   function loadQueue() {
@@ -37,7 +58,7 @@ document.addEventListener('DOMContentLoaded', () => {
       return;
     }
     
-    const activeDownloads = downloads.filter(d => d.status === 'downloading').length;
+    const activeDownloads = downloads.filter(d => d.status === 'downloading' || d.status === 'queued').length;
     activeCount.textContent = activeDownloads;
     
     downloadQueue.innerHTML = downloads.map((d, index) => `
@@ -51,8 +72,8 @@ document.addEventListener('DOMContentLoaded', () => {
           <div class="download-speed">${d.speedText || 'Starting...'}</div>
         ` : ''}
         <div class="download-actions">
-          ${d.status === 'downloading' ? 
-            `<button class="stop-btn" data-pid="${d.pid}">⏹ Stop</button>` : 
+          ${d.status === 'downloading' || d.status === 'queued' ? 
+            `<button class="stop-btn" data-job-id="${d.jobId}">⏹ Stop</button>` : 
             `<button class="remove-btn" data-index="${index}">✕</button>`
           }
         </div>
@@ -61,7 +82,7 @@ document.addEventListener('DOMContentLoaded', () => {
     
     // Add event listeners for stop/remove buttons
     downloadQueue.querySelectorAll('.stop-btn').forEach(btn => {
-      btn.addEventListener('click', () => stopDownload(parseInt(btn.dataset.pid)));
+      btn.addEventListener('click', () => stopDownload(btn.dataset.jobId));
     });
     
     downloadQueue.querySelectorAll('.remove-btn').forEach(btn => {
@@ -71,10 +92,12 @@ document.addEventListener('DOMContentLoaded', () => {
   
   function getStatusText(d) {
     switch(d.status) {
+      case 'queued': 
+        return `🕒 Queued - position ${d.queuePosition || '?'}`;
       case 'downloading': 
         return `⏳ Downloading... PID: ${d.pid}`;
       case 'completed': 
-        return `✅ Completed - ${formatSize(d.finalSize || 0)}`;
+        return `✅ Completed - ${formatSize(d.finalSize || 0)}` + (d.elapsed ? ` in ${Math.round(d.elapsed)}s` : '');
       case 'error': 
         return `❌ Error: ${d.error || 'Unknown'}`;
       case 'stopped': 
@@ -103,28 +126,39 @@ document.addEventListener('DOMContentLoaded', () => {
     
     statusMsg.innerHTML = '⏳ Starting download...';
     
-    API.runtime.sendMessage({ command: "download", url: url, filename: filename }, (response) => {
+    // Everything by default; audio-only, video-only or given languages otherwise
+    const keep = document.getElementById('keepSelect').value;
+    const languages = document.getElementById('languageInput').value.trim();
+    const select = (keep !== 'all' || languages) ? { type: keep, languages: languages } : undefined;
+    
+    API.runtime.sendMessage({ command: "download", url: url, filename: filename, select: select }, (response) => {
       if (response && response.status === "started") {
         const newDownload = {
+          jobId: response.jobId,
           pid: response.pid,
           filename: response.filename || filename,
           path: response.path,
           url: url,
-          status: 'downloading',
+          status: response.queuePosition > 0 ? 'queued' : 'downloading',
+          queuePosition: response.queuePosition || 0,
           progress: 0,
           startTime: Date.now()
         };
         
-        // Add to queue
+        // Add to queue (a duplicate attached to a listed job adds nothing)
         API.storage.local.get(['downloads'], (result) => {
           const downloads = result.downloads || [];
-          downloads.unshift(newDownload); // Add to top
+          const listed = downloads.some(d => d.jobId === newDownload.jobId);
+          if (!listed) {
+            downloads.unshift(newDownload); // Add to top
+          }
           API.storage.local.set({ downloads: downloads }, () => {
             loadQueue();
-            statusMsg.innerHTML = '✅ Download added to queue!';
+            statusMsg.innerHTML = response.attached ?
+              '🔗 Already downloading - joined the existing download' : '✅ Download added to queue!';
             
             // Clear the detected stream so user can add another
-            API.storage.local.remove(['last_stream']);
+            API.runtime.sendMessage({ command: "clear-streams", url: url });
             urlInput.value = '';
             filenameInput.value = 'output.mp4';
             
@@ -138,6 +172,10 @@ document.addEventListener('DOMContentLoaded', () => {
             } catch(e) {}
           });
         });
+      } else if (response && response.status === "exists") {
+        const sizeText = `${((response.size || 0) / (1024*1024)).toFixed(1)} MB`;
+        statusMsg.innerHTML = `✅ Already downloaded: ${response.filename} (${sizeText})`;
+        API.runtime.sendMessage({ command: "clear-streams", url: url });
       } else {
         const errorMsg = response?.error || 'Unknown error';
         statusMsg.innerHTML = `❌ Error: ${errorMsg}`;
@@ -146,15 +184,20 @@ document.addEventListener('DOMContentLoaded', () => {
   });
   
   // Stop a download
-  function stopDownload(pid) {
-    API.runtime.sendMessage({ command: "kill", pid: pid }, (response) => {
-      API.storage.local.get(['downloads'], (result) => {
-        const downloads = result.downloads || [];
-        const download = downloads.find(d => d.pid === pid);
-        if (download) {
-          download.status = 'stopped';
-        }
-        API.storage.local.set({ downloads: downloads }, loadQueue);
+  function stopDownload(jobId) {
+    API.storage.local.get(['downloads'], (result) => {
+      const current = (result.downloads || []).find(d => d.jobId === jobId);
+      const pid = current ? current.pid : undefined;
+      
+      API.runtime.sendMessage({ command: "kill", pid: pid, jobId: jobId }, (response) => {
+        API.storage.local.get(['downloads'], (result) => {
+          const downloads = result.downloads || [];
+          const download = downloads.find(d => d.jobId === jobId);
+          if (download) {
+            download.status = 'stopped';
+          }
+          API.storage.local.set({ downloads: downloads }, loadQueue);
+        });
       });
     });
   }
@@ -171,15 +214,17 @@ document.addEventListener('DOMContentLoaded', () => {
   // Clear completed downloads
   clearCompletedBtn.addEventListener('click', () => {
     API.storage.local.get(['downloads'], (result) => {
-      const downloads = (result.downloads || []).filter(d => d.status === 'downloading');
+      const downloads = (result.downloads || []).filter(d => d.status === 'downloading' || d.status === 'queued');
       API.storage.local.set({ downloads: downloads }, loadQueue);
     });
   });
   
   // Clear detected stream
   clearBtn.addEventListener('click', () => {
-    API.storage.local.remove(['last_stream'], () => {
+    API.runtime.sendMessage({ command: "clear-streams" }, () => {
       urlInput.value = '';
+      streamSelect.style.display = 'none';
+      streamSelect.innerHTML = '';
       urlInput.placeholder = 'Cleared! Refresh the video page...';
       statusMsg.innerHTML = '🔄 Cleared. Refresh video page to detect new stream.';
       
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark every download engine against the synthetic media server
+
+Starts test_server.MediaServer with the given network conditions and times:
+  - ranged.download_ranged on /video.mp4 with 1 and N connections
+  - hls.download_hls on the HLS master playlist with 1 and N workers
+  - ffmpeg -i URL -c copy on a real HLS encode, when ffmpeg is installed
+
+The per-connection bandwidth cap is what makes parallel engines pay off, the
+same way per-connection throttling on a real CDN does. Latency, jitter and
+injected errors are seeded, so repeated runs see identical conditions.
+
+Usage: python bench_engines.py [--bandwidth 8M] [--latency 0.05] [--jitter 0.02]
+                               [--error-rate 0.0] [--seed 1] [--parallel 8]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import hls
+import ranged
+from bench_hls import make_real_stream, timed
+from test_server import MediaServer, parse_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark download engines offline')
+    parser.add_argument('--bandwidth', type=parse_rate, default=parse_rate('8M'), help='bytes/s per connection')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--file-size', type=parse_rate, default=parse_rate('32M'))
+    parser.add_argument('--segments', type=int, default=20)
+    parser.add_argument('--parallel', type=int, default=8, help='connections / workers for the parallel runs')
+    args = parser.parse_args()
+
+    ffmpeg = shutil.which('ffmpeg')
+    with tempfile.TemporaryDirectory() as directory:
+        if ffmpeg:
+            make_real_stream(ffmpeg, directory, args.segments)
+        server = MediaServer(bandwidth=args.bandwidth, latency=args.latency, jitter=args.jitter,
+                             error_rate=args.error_rate, seed=args.seed, file_size=args.file_size,
+                             segments=args.segments, static_dir=directory).start()
+        output = os.path.join(directory, 'out.part')
+        print(f"{args.bandwidth / (1024 * 1024):.1f} MB/s per connection, "
+              f"{args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms latency, "
+              f"{args.error_rate:.1%} errors, seed {args.seed}\n")
+
+        video = server.url('video.mp4')
+        timed('range engine, 1 connection', lambda: ranged.download_ranged(video, output, connections=1))
+        timed(f'range engine, {args.parallel} connections',
+              lambda: ranged.download_ranged(video, output, connections=args.parallel))
+
+        master = server.url('hls/master.m3u8')
+        timed('hls engine, 1 worker', lambda: hls.download_hls(master, output, workers=1))
+        timed(f'hls engine, {args.parallel} workers', lambda: hls.download_hls(master, output, workers=args.parallel))
+
+        if ffmpeg:
+            target = os.path.join(directory, 'ffmpeg.ts')
+
+            def run_ffmpeg():
+                subprocess.run([ffmpeg, '-loglevel', 'error', '-y', '-i', server.url('static/index.m3u8'),
+                                '-c', 'copy', target], check=True)
+                return os.path.getsize(target)
+
+            timed('ffmpeg -i url -c copy', run_ffmpeg)
+        else:
+            print('ffmpeg not found - skipped the FFmpeg engine')
+
+        stats = server.stats()
+        print(f"\n{stats['requests']} requests, {stats['errors']} injected errors, "
+              f"{stats['bytes'] / (1024 * 1024):.1f} MB served")
+        server.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark native messaging framing over a loopback pipe
+
+An echo thread reads frames from one pipe and writes them back on another,
+the way the host answers the browser. Each message is a progress event, the
+frame the host sends most often. Two measurements per implementation:
+  - throughput: N events written back to back, messages/sec at the reader
+  - round trip: one event at a time, median and p99 latency
+"legacy" is the host's previous code: three writes per message, and a str
+decode before json.loads.
+
+Usage: python bench_framing.py [--messages 20000] [--round-trips 2000]
+"""
+import argparse
+import json
+import os
+import statistics
+import struct
+import sys
+import threading
+import time
+
+import framing
+
+EVENT = {
+    "event": "progress", "job_id": "3f9c2a7d81e4", "downloaded": 73400320, "speed": 4.21,
+    "bitrate_kbps": 5120.4, "out_time": "00:02:13.44", "percent": 42.7, "estimated_total": 171966464,
+    "eta": 81.3, "rate": 1048576,
+}
+
+
+class LegacyReader:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def read(self):
+        raw_length = self.stream.read(4)
+        if len(raw_length) == 0:
+            return None
+        message_length = struct.unpack('@I', raw_length)[0]
+        return json.loads(self.stream.read(message_length).decode('utf-8'))
+
+
+class LegacyWriter:
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        encoded_content = json.dumps(message).encode('utf-8')
+        encoded_length = struct.pack('@I', len(encoded_content))
+        with self.lock:
+            self.stream.write(encoded_length)
+            self.stream.write(encoded_content)
+            self.stream.flush()
+
+
+IMPLEMENTATIONS = {
+    'legacy': (LegacyReader, LegacyWriter),
+    f'framing ({framing.load_orjson()})': (framing.FrameReader, framing.FrameWriter),
+}
+
+
+def loopback(reader_class, writer_class):
+    """(writer to the echo thread, reader of its replies, echo thread)"""
+    to_echo_read, to_echo_write = os.pipe()
+    from_echo_read, from_echo_write = os.pipe()
+    echo_reader = reader_class(os.fdopen(to_echo_read, 'rb'))
+    echo_writer = writer_class(os.fdopen(from_echo_write, 'wb'))
+
+    def echo():
+        while True:
+            message = echo_reader.read()
+            if message is None:
+                break
+            echo_writer.send(message)
+        echo_writer.stream.close()
+
+    thread = threading.Thread(target=echo, daemon=True)
+    thread.start()
+    return writer_class(os.fdopen(to_echo_write, 'wb')), reader_class(os.fdopen(from_echo_read, 'rb')), thread
+
+
+def throughput(reader_class, writer_class, count):
+    writer, reader, thread = loopback(reader_class, writer_class)
+
+    def produce():
+        for _ in range(count):
+            writer.send(EVENT)
+        writer.stream.close()
+
+    start = time.perf_counter()
+    producer = threading.Thread(target=produce)
+    producer.start()
+    received = 0
+    while reader.read() is not None:
+        received += 1
+    elapsed = time.perf_counter() - start
+    producer.join()
+    thread.join()
+    return received / elapsed
+
+
+def round_trips(reader_class, writer_class, count):
+    writer, reader, thread = loopback(reader_class, writer_class)
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        writer.send(EVENT)
+        reader.read()
+        samples.append(time.perf_counter() - start)
+    writer.stream.close()
+    thread.join()
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark native messaging framing')
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--round-trips', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{len(framing.encode(EVENT))} byte progress events\n")
+    for name, (reader_class, writer_class) in IMPLEMENTATIONS.items():
+        rate = throughput(reader_class, writer_class, args.messages)
+        median, p99 = round_trips(reader_class, writer_class, args.round_trips)
+        print(f"{name:<18} {rate:10,.0f} msgs/s   round trip median {median * 1e6:6.1f} us"
+              f"   p99 {p99 * 1e6:6.1f} us")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark the parallel HLS engine against serial segment fetching
+
+Serves a VOD playlist from the synthetic media server (test_server.py) with
+a fixed delay on every request (a stand-in for a high-latency CDN), then
+times:
+  - hls.download_hls with 1 worker (what FFmpeg's HLS demuxer does)
+  - hls.download_hls with N workers
+  - ffmpeg -i URL -c copy (the current path), when ffmpeg is installed
+
+Usage: python bench_hls.py [--segments 40] [--latency 0.15] [--workers 8]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import hls
+from test_server import MediaServer
+
+def make_real_stream(ffmpeg, directory, segments):
+    """Encode a short test pattern as real HLS so FFmpeg can read it too"""
+    subprocess.run([
+        ffmpeg, '-loglevel', 'error', '-f', 'lavfi', '-i', f'testsrc=size=640x360:rate=25:duration={segments * 2}',
+        '-c:v', 'libx264', '-g', '50', '-hls_time', '2', '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(directory, 'seg%05d.ts'), os.path.join(directory, 'index.m3u8'),
+    ], check=True)
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - start
+    rate = size / elapsed / (1024 * 1024) if elapsed else 0
+    print(f"{label:<28} {elapsed:8.2f} s {size / (1024 * 1024):9.2f} MB {rate:9.2f} MB/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parallel HLS segment fetching')
+    parser.add_argument('--segments', type=int, default=40)
+    parser.add_argument('--segment-size', type=int, default=256 * 1024, help='bytes (synthetic stream only)')
+    parser.add_argument('--latency', type=float, default=0.15, help='seconds added to every request')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    ffmpeg = shutil.which('ffmpeg')
+    with tempfile.TemporaryDirectory() as directory:
+        if ffmpeg:
+            make_real_stream(ffmpeg, directory, args.segments)
+        # Synthetic segments are sized from the variant bitrate
+        bandwidth = args.segment_size * 8 // 4
+        server = MediaServer(latency=args.latency, segments=args.segments, segment_duration=4.0,
+                             variants=[bandwidth], static_dir=directory).start()
+        url = server.url('static/index.m3u8' if ffmpeg else 'hls/v0/index.m3u8')
+        output = os.path.join(directory, 'out.part')
+
+        print(f"{args.segments} segments, {args.latency * 1000:.0f} ms per request\n")
+        serial = timed('hls engine, 1 worker', lambda: hls.download_hls(url, output, workers=1))
+        parallel = timed(f'hls engine, {args.workers} workers',
+                         lambda: hls.download_hls(url, output, workers=args.workers))
+
+        if ffmpeg:
+            target = os.path.join(directory, 'ffmpeg.ts')
+
+            def run_ffmpeg():
+                subprocess.run([ffmpeg, '-loglevel', 'error', '-y', '-i', url, '-c', 'copy', target], check=True)
+                return os.path.getsize(target)
+
+            timed('ffmpeg -i url -c copy', run_ffmpeg)
+        else:
+            print('ffmpeg not found - skipped the current-path comparison')
+
+        print(f"\nparallel speedup over serial: {serial / parallel:.1f}x")
+        server.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark output strategies: wall time and bytes written per strategy
+
+Encodes a test pattern to an MPEG-TS source once (the shape of a fetched
+HLS stream), then remuxes it with `-c copy` using each strategy's output
+options, the way launch_ffmpeg does. For "deferred" it also times the
+background faststart remux separately. That remux does not delay the job.
+
+Bytes written come from /proc/<pid>/io (wchar), read while the finished
+FFmpeg is still a zombie. Other platforms report only the output size.
+
+Usage: python bench_output.py [--duration 300] [--bitrate 8M] [--ffmpeg PATH]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import output
+
+
+def make_source(ffmpeg, path, duration, bitrate):
+    subprocess.run([
+        ffmpeg, '-loglevel', 'error', '-y', '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-b:v', bitrate, '-g', '60', '-c:a', 'aac',
+        '-f', 'mpegts', path,
+    ], check=True)
+
+
+def run_measured(command):
+    """(seconds, bytes written or None) for one FFmpeg run"""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL)
+    written = None
+    if hasattr(os, 'waitid') and os.path.exists(f'/proc/{process.pid}'):
+        # Wait for exit without reaping, so /proc/<pid>/io is still there
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        try:
+            with open(f'/proc/{process.pid}/io') as f:
+                counters = dict(line.split(': ') for line in f.read().splitlines())
+            written = int(counters['wchar'])
+        except (OSError, KeyError, ValueError):
+            pass
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+    return time.perf_counter() - start, written
+
+
+def megabytes(value):
+    return '       n/a' if value is None else f'{value / (1024 * 1024):8.1f} MB'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark output strategies')
+    parser.add_argument('--duration', type=int, default=300, help='seconds of source media')
+    parser.add_argument('--bitrate', default='8M', help='video bitrate of the source')
+    parser.add_argument('--ffmpeg', default=shutil.which('ffmpeg'))
+    args = parser.parse_args()
+    if not args.ffmpeg:
+        print('ffmpeg not found - pass --ffmpeg PATH')
+        return 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'source.ts')
+        print(f"Encoding {args.duration}s source at {args.bitrate}...")
+        make_source(args.ffmpeg, source, args.duration, args.bitrate)
+        print(f"source {megabytes(os.path.getsize(source))}\n")
+        print(f"{'strategy':<12} {'wall time':>10} {'written':>11} {'output':>11}")
+
+        for strategy in output.STRATEGIES:
+            target = os.path.join(directory, output.filename_for(strategy, 'out.mp4'))
+            command = [args.ffmpeg, '-loglevel', 'error', '-nostdin', '-y', '-i', source,
+                       '-c', 'copy', *output.ffmpeg_args(strategy), target]
+            elapsed, written = run_measured(command)
+            print(f"{strategy:<12} {elapsed:9.2f}s {megabytes(written)} {megabytes(os.path.getsize(target))}")
+
+            if strategy == 'deferred':
+                final = target + '.faststart.mp4'
+                elapsed, written = run_measured(output._remux_command(args.ffmpeg, target, final))
+                print(f"{'  + remux':<12} {elapsed:9.2f}s {megabytes(written)} {megabytes(os.path.getsize(final))}"
+                      "   (background, after the job finished)")
+            os.remove(target)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
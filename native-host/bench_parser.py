@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark FFmpeg output parsing throughput
+
+Replays recorded FFmpeg stderr and -progress logs through:
+  - the old per-line approach (inline re.search calls plus an
+    os.path.exists/getsize pair on every stderr line)
+  - ffparse.FFmpegOutputParser
+and prints lines/sec for each.
+
+Usage: python bench_parser.py [--repeat 200] [--stderr LOG] [--progress LOG]
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+from ffparse import FFmpegOutputParser
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'samples')
+
+
+def legacy_stderr(lines, download_path):
+    """What host.py did before: several inline regexes and a stat per line"""
+    progress = {}
+    for line in lines:
+        time_match = re.search(r'time=(\d{2}):(\d{2}):(\d{2})', line)
+        if time_match:
+            progress['time'] = time_match.groups()
+        speed_match = re.search(r'speed=\s*([\d.]+)x', line)
+        if speed_match:
+            progress['speed'] = speed_match.group(1)
+        if os.path.exists(download_path):
+            progress['downloaded'] = os.path.getsize(download_path)
+        re.search(r'Duration:\s*(\d+):(\d+):([\d.]+)', line)
+    return progress
+
+
+def legacy_progress(lines):
+    fields = {}
+    for line in lines:
+        key, sep, value = line.strip().partition('=')
+        if sep:
+            fields[key] = value
+            if key == 'progress':
+                fields = {}
+
+
+def parser_stderr(lines):
+    parser = FFmpegOutputParser()
+    for line in lines:
+        parser.feed_stderr(line)
+    return parser
+
+
+def parser_progress(lines):
+    parser = FFmpegOutputParser()
+    for line in lines:
+        parser.feed_progress(line)
+    return parser
+
+
+def rate(label, func, lines, *args):
+    start = time.perf_counter()
+    func(lines, *args)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {len(lines) / elapsed:>12,.0f} lines/s  ({elapsed * 1000:.1f} ms)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help='times to replay each log')
+    parser.add_argument('--stderr', default=os.path.join(SAMPLES, 'ffmpeg-hls-stderr.log'))
+    parser.add_argument('--progress', default=os.path.join(SAMPLES, 'ffmpeg-progress.log'))
+    args = parser.parse_args()
+
+    with open(args.stderr, encoding='utf-8', errors='replace') as f:
+        stderr_lines = f.read().splitlines() * args.repeat
+    with open(args.progress, encoding='utf-8', errors='replace') as f:
+        progress_lines = f.read().splitlines() * args.repeat
+
+    with tempfile.NamedTemporaryFile(suffix='.mp4') as output:
+        output.write(b'\0' * 1024)
+        output.flush()
+        print(f"stderr: {len(stderr_lines):,} lines")
+        old = rate('legacy regex + stat', legacy_stderr, stderr_lines, output.name)
+        new = rate('FFmpegOutputParser', parser_stderr, stderr_lines)
+        print(f"  speedup: {old / new:.1f}x")
+
+    print(f"-progress: {len(progress_lines):,} lines")
+    old = rate('legacy split only', legacy_progress, progress_lines)
+    new = rate('FFmpegOutputParser', parser_progress, progress_lines)
+    print(f"  parser cost vs bare split: {new / old:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
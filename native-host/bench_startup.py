@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark native host cold start: process spawn to first reply
+
+Starts a fresh host process per sample, the way runtime.sendNativeMessage
+does, writes one framed command and times how long the reply takes to
+arrive. Prints median and p90 per command.
+
+Usage: python bench_startup.py [--runs 20] [--target host|host.py|host.pyz] [--python PATH]
+"""
+import argparse
+import json
+import os
+import statistics
+import struct
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+COMMANDS = [
+    {"command": "subscribe"},
+    {"command": "get-progress", "job_id": "0" * 12},
+    {"command": "get-progress-batch", "job_ids": ["0" * 12]},
+    {"command": "kill", "job_id": "0" * 12},
+    {"command": "list", "limit": 10},
+    {"command": "download"},  # no URL: validation error, no FFmpeg started
+]
+
+
+def frame(message):
+    encoded = json.dumps(message).encode('utf-8')
+    return struct.pack('@I', len(encoded)) + encoded
+
+
+def time_one(python, target, message):
+    """Seconds from spawn to a complete reply"""
+    # host.py runs as `-m host`, the way start_host.sh/.bat start it
+    command = [python, '-u', '-m', 'host'] if target == 'host' else [python, '-u', target]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, cwd=HERE)
+    process.stdin.write(frame(message))
+    process.stdin.flush()
+    length = struct.unpack('@I', process.stdout.read(4))[0]
+    reply = json.loads(process.stdout.read(length))
+    elapsed = time.perf_counter() - start
+    process.stdin.close()
+    process.wait()
+    return elapsed, reply
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--target', default='host', help="'host' (as start_host runs it) or a path to run")
+    parser.add_argument('--python', default=sys.executable)
+    args = parser.parse_args()
+
+    baseline = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        subprocess.run([args.python, '-c', 'pass'], check=True)
+        baseline.append(time.perf_counter() - start)
+    print(f"{'interpreter only':<22} median {statistics.median(baseline) * 1000:6.1f} ms")
+
+    for message in COMMANDS:
+        samples = []
+        for _ in range(args.runs):
+            elapsed, reply = time_one(args.python, args.target, message)
+            samples.append(elapsed)
+        samples.sort()
+        p90 = samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+        print(f"{message['command']:<22} median {statistics.median(samples) * 1000:6.1f} ms"
+              f"   p90 {p90 * 1000:6.1f} ms   ({reply.get('status')})")
+
+
+if __name__ == '__main__':
+    main()
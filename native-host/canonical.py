@@ -0,0 +1,90 @@
+"""
+Canonical stream identity for coalescing duplicate download requests
+
+The extension often catches the same stream several times under different
+URLs: signed CDNs rotate auth and tracking parameters (secure=, _tid=,
+token=, Expires=, ...) on every request. Stripping those parameters leaves
+a URL that names the content itself, so a repeated request can attach to the
+job already fetching it, or be answered from the file already on disk.
+
+Which parameters are stripped is configurable. DEFAULT_STRIP applies to
+every host; a JSON rules file (FFMPEG_DOWNLOADER_CANONICAL_RULES) can add
+patterns, per host, or keep parameters a host needs to tell streams apart:
+
+    {"strip": ["sid"],
+     "hosts": {"*.example-cdn.net": {"strip": ["e", "h"], "keep": ["token"]}}}
+
+Patterns are fnmatch patterns, matched against lower-cased parameter names
+and host names.
+"""
+import fnmatch
+import hashlib
+import json
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Auth, signature and tracking parameters that do not change the content
+DEFAULT_STRIP = (
+    'secure', 'token', '*_token', 'token_*', '_tid', 'tid', 'sig', 'signature',
+    'expires', 'exp', 'hdnts', 'hdntl', '__gda__', 'policy', 'key-pair-id',
+    'x-amz-*', 'x-goog-*', 'auth', 'auth_key', 'sessionid', 'utm_*', '_', 'cachebuster',
+)
+
+
+class Rules:
+    """Parameter strip/keep patterns, global and per host"""
+
+    def __init__(self, strip=DEFAULT_STRIP, hosts=None):
+        self.strip = tuple(pattern.lower() for pattern in strip)
+        # host pattern -> {"strip": [...], "keep": [...]}
+        self.hosts = {pattern.lower(): rule for pattern, rule in (hosts or {}).items()}
+
+    @classmethod
+    def load(cls, path):
+        """DEFAULT_STRIP plus the rules in a JSON file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(DEFAULT_STRIP + tuple(config.get('strip', ())), config.get('hosts'))
+
+    def _for_host(self, host):
+        strip, keep = list(self.strip), []
+        for pattern, rule in self.hosts.items():
+            if fnmatch.fnmatchcase(host, pattern):
+                strip += [p.lower() for p in rule.get('strip', ())]
+                keep += [p.lower() for p in rule.get('keep', ())]
+        return strip, keep
+
+    def stripped(self, host, name):
+        """True if query parameter name is dropped for host"""
+        strip, keep = self._for_host(host)
+        name = name.lower()
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in keep):
+            return False
+        return any(fnmatch.fnmatchcase(name, pattern) for pattern in strip)
+
+
+DEFAULT_RULES = Rules()
+
+
+def canonical(url, rules=DEFAULT_RULES):
+    """url without auth/token parameters, fragment, default port or case noise;
+    the remaining parameters are sorted"""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not rules.stripped(host, name))
+    return urlunsplit((scheme, netloc, parts.path or '/', urlencode(query), ''))
+
+
+def content_key(url, variant_policy=None, max_bandwidth=None, rules=DEFAULT_RULES, selection=''):
+    """Identity of what a download produces: the canonical stream plus the
+    variant and stream selection, which pick different media from one input"""
+    identity = f"{canonical(url, rules)}\0{variant_policy or ''}\0{max_bandwidth or ''}"
+    if selection:
+        identity += f"\0{selection}"
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
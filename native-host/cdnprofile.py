@@ -0,0 +1,142 @@
+"""
+Per-CDN performance profiles learned from download history
+
+Origins differ: some serve HLS three times faster over persistent
+connections, others drop them mid-stream; some like eight parallel range
+requests, others throttle anything past two. Every finished or failed job
+records its throughput and outcome under (host, engine, settings), and a new
+job to the same host starts from the settings that did best there.
+
+Counts decay by DECAY per job, so a CDN that changes its behaviour is
+re-learned within a few downloads. A small share of jobs (EXPLORE_RATE)
+tries settings with too little history, so a profile picked early does not
+lock the others out.
+"""
+import json
+import random
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cdn_stats (
+    host     TEXT NOT NULL,
+    engine   TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    jobs     REAL NOT NULL DEFAULT 0,
+    failures REAL NOT NULL DEFAULT 0,
+    bytes    REAL NOT NULL DEFAULT 0,
+    seconds  REAL NOT NULL DEFAULT 0,
+    updated  REAL NOT NULL,
+    PRIMARY KEY (host, engine, settings)
+);
+"""
+
+# Weight kept by the history each time a new result is added
+DECAY = 0.9
+# Decayed job count below which settings count as under-sampled
+MIN_SAMPLES = 2
+# Share of jobs that try under-sampled settings instead of the best ones
+EXPLORE_RATE = 0.1
+# Settings failing more often than this are not picked on throughput
+MAX_FAILURE_RATE = 0.5
+
+
+def candidates(engine, parallel=4):
+    """Settings to choose from for an engine, the default (today's fixed
+    behaviour) first; parallel is the engine's configured worker count"""
+    if engine == 'ffmpeg':
+        return [{"persistent": True, "reconnect": False},
+                {"persistent": True, "reconnect": True},
+                {"persistent": False, "reconnect": True},
+                {"persistent": False, "reconnect": False}]
+    name = 'workers' if engine == 'hls' else 'connections'
+    counts = [parallel, parallel * 2, max(parallel // 2, 1)]
+    return [{name: count} for count in dict.fromkeys(counts)]
+
+
+def _key(settings):
+    return json.dumps(settings, sort_keys=True, separators=(',', ':'))
+
+
+class ProfileStore:
+    def __init__(self, path, rng=None):
+        self._lock = threading.Lock()
+        self._rng = rng or random.Random()
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+
+    def record(self, host, engine, settings, ok, downloaded=0, seconds=0.0):
+        """Add one job's outcome; throughput only counts for successes"""
+        if not ok:
+            downloaded, seconds = 0, 0.0
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO cdn_stats (host, engine, settings, jobs, failures, bytes, seconds, updated)"
+                " VALUES (?, ?, ?, 1, ?, ?, ?, ?)"
+                " ON CONFLICT (host, engine, settings) DO UPDATE SET"
+                " jobs = jobs * ? + 1, failures = failures * ? + excluded.failures,"
+                " bytes = bytes * ? + excluded.bytes, seconds = seconds * ? + excluded.seconds,"
+                " updated = excluded.updated",
+                [host, engine, _key(settings), 0 if ok else 1, downloaded, seconds, time.time(),
+                 DECAY, DECAY, DECAY, DECAY])
+
+    def stats(self, host, engine=None):
+        """[{engine, settings, jobs, failure_rate, throughput}, ...] for host"""
+        query = "SELECT * FROM cdn_stats WHERE host = ?"
+        args = [host]
+        if engine:
+            query += " AND engine = ?"
+            args.append(engine)
+        with self._lock:
+            rows = [dict(row) for row in self._db.execute(query, args)]
+        return [{
+            "engine": row['engine'],
+            "settings": json.loads(row['settings']),
+            "jobs": round(row['jobs'], 2),
+            "failure_rate": round(row['failures'] / row['jobs'], 3) if row['jobs'] else None,
+            "throughput": int(row['bytes'] / row['seconds']) if row['seconds'] else None,
+        } for row in rows]
+
+    def hosts(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT host FROM cdn_stats ORDER BY host")]
+
+    def choose(self, host, engine, options):
+        """(settings, reason) for a new job; reason is "default", "learned",
+        "explore", "untried" or "fallback\""""
+        known = {_key(entry['settings']): entry for entry in self.stats(host, engine)}
+        if not known:
+            return options[0], 'default'
+
+        def jobs(settings):
+            entry = known.get(_key(settings))
+            return entry['jobs'] if entry else 0
+
+        undersampled = [settings for settings in options if jobs(settings) < MIN_SAMPLES]
+        if undersampled and self._rng.random() < EXPLORE_RATE:
+            return self._rng.choice(undersampled), 'explore'
+
+        reliable = []
+        for settings in options:
+            entry = known.get(_key(settings))
+            if entry and entry['throughput'] and entry['failure_rate'] <= MAX_FAILURE_RATE:
+                reliable.append((entry['throughput'] * (1 - entry['failure_rate']), settings))
+        if reliable:
+            return max(reliable, key=lambda item: item[0])[1], 'learned'
+        for settings in options:
+            if not jobs(settings):
+                return settings, 'untried'
+        return min(options, key=lambda settings: known[_key(settings)]['failure_rate']), 'fallback'
+
+    def forget(self, host):
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM cdn_stats WHERE host = ?", (host,))
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,141 @@
+"""
+Cached FFmpeg discovery and capability probe
+
+Finding FFmpeg and asking it what it supports costs a few process spawns.
+The answer is kept in a small JSON file next to the logs and reused for as
+long as the binary's mtime and size are unchanged, so a normal host start
+costs one stat() and one small file read. The capability set lets the host
+turn on throughput options (persistent and parallel HTTP for HLS, keep-alive
+for progressive files) only where the installed FFmpeg understands them.
+"""
+import json
+import os
+import re
+
+PROBE_TIMEOUT = 10
+OPTION_RE = re.compile(r'^\s+-(\w+)\s', re.MULTILINE)
+
+# Input options worth setting when supported, fastest first
+HLS_OPTIONS = (
+    ('http_persistent', '1'),   # reuse one connection for every segment
+    ('http_multiple', '1'),     # fetch the next segment while reading this one
+)
+HTTP_OPTIONS = (
+    ('multiple_requests', '1'),  # keep-alive across requests to the same server
+)
+# Off by default; a CDN profile turns them on for origins that drop connections
+RECONNECT_OPTIONS = (
+    ('reconnect', '1'),
+    ('reconnect_streamed', '1'),
+    ('reconnect_delay_max', '5'),
+)
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _run(path, *args):
+    import subprocess
+    try:
+        result = subprocess.run([path, '-hide_banner', *args], stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, timeout=PROBE_TIMEOUT)
+    except (OSError, subprocess.SubprocessError):
+        return ''
+    return result.stdout.decode('utf-8', 'replace')
+
+
+def parse_protocols(text):
+    """Input protocol names from `ffmpeg -protocols`"""
+    protocols = []
+    section = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.endswith(':'):
+            section = stripped[:-1].lower()
+        elif stripped and section == 'input':
+            protocols.append(stripped)
+    return protocols
+
+
+def probe(path):
+    """Ask the binary at path for its version and capabilities"""
+    version_output = _run(path, '-version')
+    version = None
+    if version_output.startswith('ffmpeg version '):
+        version = version_output.split()[2]
+    return {
+        "version": version,
+        "protocols": parse_protocols(_run(path, '-protocols')),
+        "hls_options": sorted(set(OPTION_RE.findall(_run(path, '-h', 'demuxer=hls')))),
+        "http_options": sorted(set(OPTION_RE.findall(_run(path, '-h', 'protocol=http')))),
+    }
+
+
+def _load(cache_path):
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        if record.get('stat') == _stat_key(record['path']):
+            return record
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _save(cache_path, record):
+    temp_path = f"{cache_path}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+
+
+def discover(cache_path, find_path):
+    """Resolved path, version and capabilities of FFmpeg.
+
+    Served from cache_path while the cached binary is unchanged; otherwise
+    find_path() locates the binary again and it is re-probed. A binary that
+    cannot be found is reported but not cached.
+    """
+    record = _load(cache_path)
+    if record is not None:
+        return record
+
+    path = find_path()
+    try:
+        stat = _stat_key(path)
+    except OSError:
+        return {"path": path, "stat": None, "version": None, "protocols": [],
+                "hls_options": [], "http_options": []}
+    record = dict(probe(path), path=path, stat=stat)
+    if record['version']:
+        _save(cache_path, record)
+    return record
+
+
+def input_options(caps, url, is_hls, profile=None):
+    """Supported throughput options to place before -i url.
+
+    profile (see cdnprofile.py) can turn persistent connections off and
+    reconnects on for the URL's origin.
+    """
+    if not url.lower().startswith(('http://', 'https://')):
+        return []
+    profile = profile or {}
+    wanted = []
+    if profile.get('persistent', True):
+        wanted += HLS_OPTIONS if is_hls else HTTP_OPTIONS
+    supported = set(caps.get('hls_options' if is_hls else 'http_options') or ())
+    if profile.get('reconnect'):
+        # HTTP protocol options; the HLS demuxer hands them to its requests
+        wanted += RECONNECT_OPTIONS
+        supported |= set(caps.get('http_options') or ())
+    args = []
+    for name, value in wanted:
+        if name in supported:
+            args += [f'-{name}', value]
+    return args
@@ -0,0 +1,178 @@
+"""
+Streaming parser for FFmpeg's stderr and -progress output
+
+One FFmpegOutputParser follows one FFmpeg process. Lines are fed to it as
+they arrive and it keeps what it has learned so far: input duration and
+bitrate from the header, the latest progress numbers, and recent error
+lines. It makes one pass over each line with precompiled patterns and never
+looks at the filesystem; sizes come from FFmpeg's own counters.
+"""
+import collections
+import re
+
+DURATION_RE = re.compile(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+HEADER_BITRATE_RE = re.compile(r'bitrate:\s*(\d+(?:\.\d+)?)\s*kb/s')
+# "frame=  250 fps= 50 q=-1.0 size=    1024kB time=00:00:10.00 bitrate= 838.9kbits/s speed=2.01x"
+STATS_FIELD_RE = re.compile(r'(\w+)=\s*(\S+)')
+# Matched against the lowercased line; plain substring tests are several
+# times faster than one case-insensitive alternation regex
+ERROR_MARKERS = ('error', 'invalid', 'failed', 'not found', 'refused', 'denied', 'timed out',
+                 'server returned')
+
+# "Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'https://...':"
+INPUT_RE = re.compile(r"^Input #\d+, (.+?), from '")
+# "  Stream #0:1[0x101](eng): Audio: aac (LC) ([15][0][0][0] / 0x000F), 48000 Hz, stereo"
+STREAM_RE = re.compile(r'Stream #\d+:(\d+)(?:\[\w+\])?(?:\((\w+)\))?: (Video|Audio|Subtitle|Data): (\w+)')
+VIDEO_SIZE_RE = re.compile(r', (\d{2,5})x(\d{2,5})')
+
+DEFAULT_ERROR_LINES = 20
+SIZE_UNITS = {'B': 1, 'kB': 1024, 'KiB': 1024, 'mB': 1024 * 1024, 'MiB': 1024 * 1024}
+
+
+def parse_clock(text):
+    """'HH:MM:SS.ss' -> seconds, None for N/A"""
+    hours, sep, rest = text.partition(':')
+    minutes, sep2, seconds = rest.partition(':')
+    if not (sep and sep2):
+        return None
+    try:
+        return max(int(hours) * 3600 + int(minutes) * 60 + float(seconds), 0.0)
+    except ValueError:
+        return None
+
+
+def parse_size(text):
+    """'1024kB' -> bytes, None for N/A"""
+    digits = text.rstrip('BKMGikmb')
+    try:
+        return int(digits) * SIZE_UNITS.get(text[len(digits):] or 'B', 1)
+    except ValueError:
+        return None
+
+
+def parse_progress_block(fields):
+    """Convert the raw fields of a -progress block into numbers"""
+    progress = {}
+
+    # out_time_ms is also in microseconds (long-standing FFmpeg quirk)
+    out_time_us = fields.get('out_time_us', fields.get('out_time_ms'))
+    if out_time_us and out_time_us != 'N/A':
+        progress['out_time'] = max(int(out_time_us), 0) / 1000000.0
+
+    total_size = fields.get('total_size')
+    if total_size and total_size != 'N/A':
+        progress['downloaded'] = int(total_size)
+
+    speed = fields.get('speed', '').strip().rstrip('x')
+    if speed and speed != 'N/A':
+        progress['speed'] = float(speed)
+
+    bitrate = fields.get('bitrate', '').strip()
+    if bitrate.endswith('kbits/s'):
+        progress['bitrate_kbps'] = float(bitrate[:-len('kbits/s')])
+
+    progress['state'] = fields.get('progress', 'continue')
+    return progress
+
+
+def parse_input_info(text):
+    """Container, duration, bitrate and streams from the input header that
+    `ffmpeg -i url` prints to stderr"""
+    info = {"container": None, "duration": None, "bitrate_kbps": None, "streams": []}
+    for line in text.splitlines():
+        if line.startswith(('Output #', 'Stream mapping:')):
+            break
+        match = INPUT_RE.match(line)
+        if match and info['container'] is None:
+            # "mov,mp4,m4a,..." names one demuxer; the first name is enough
+            info['container'] = match.group(1).split(',')[0]
+            continue
+        if 'Duration:' in line and info['duration'] is None:
+            match = DURATION_RE.search(line)
+            if match:
+                hours, minutes, seconds = match.groups()
+                info['duration'] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+            match = HEADER_BITRATE_RE.search(line)
+            if match:
+                info['bitrate_kbps'] = float(match.group(1))
+            continue
+        match = STREAM_RE.search(line)
+        if match:
+            index, language, kind, codec = match.groups()
+            stream = {"index": int(index), "type": kind.lower(), "codec": codec, "language": language}
+            if kind == 'Video':
+                size = VIDEO_SIZE_RE.search(line)
+                if size:
+                    stream['width'], stream['height'] = int(size.group(1)), int(size.group(2))
+            info['streams'].append(stream)
+    return info
+
+
+class FFmpegOutputParser:
+    def __init__(self, error_lines=DEFAULT_ERROR_LINES):
+        self.duration = None
+        self.input_bitrate_kbps = None
+        self.progress = {}
+        self.errors = collections.deque(maxlen=error_lines)
+        self._fields = {}
+
+    @property
+    def estimated_total(self):
+        """Expected output bytes from the input's duration and bitrate"""
+        if self.duration and self.input_bitrate_kbps:
+            return self.input_bitrate_kbps * 1000 / 8 * self.duration
+        return None
+
+    def feed_progress(self, line):
+        """Consume one "-progress" line; returns the block it completes, if any"""
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            return None
+        self._fields[key] = value
+        if key != 'progress':
+            return None
+        fields, self._fields = self._fields, {}
+        self.progress = parse_progress_block(fields)
+        return self.progress
+
+    def feed_stderr(self, line):
+        """Consume one stderr line (header, classic stats line or message)"""
+        if line.startswith(('frame=', 'size=')):
+            self._parse_stats(line)
+            return
+        if self.duration is None and 'Duration:' in line:
+            match = DURATION_RE.search(line)
+            if match:
+                hours, minutes, seconds = match.groups()
+                self.duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+            match = HEADER_BITRATE_RE.search(line)
+            if match:
+                self.input_bitrate_kbps = float(match.group(1))
+            return
+        lowered = line.lower()
+        for marker in ERROR_MARKERS:
+            if marker in lowered:
+                self.errors.append(line.strip())
+                return
+
+    def _parse_stats(self, line):
+        # Only seen when FFmpeg runs without -nostats; -progress is preferred
+        progress = dict(self.progress)
+        for key, value in STATS_FIELD_RE.findall(line):
+            if key in ('size', 'Lsize'):
+                size = parse_size(value)
+                if size is not None:
+                    progress['downloaded'] = size
+            elif key == 'time':
+                out_time = parse_clock(value)
+                if out_time is not None:
+                    progress['out_time'] = out_time
+            elif key == 'bitrate' and value.endswith('kbits/s'):
+                progress['bitrate_kbps'] = float(value[:-len('kbits/s')])
+            elif key == 'speed' and value.endswith('x'):
+                progress['speed'] = float(value[:-1])
+        self.progress = progress
+
+    @property
+    def last_error(self):
+        return self.errors[-1] if self.errors else None
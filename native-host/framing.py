@@ -0,0 +1,153 @@
+"""
+Native messaging framing: a native-endian uint32 length, then UTF-8 JSON
+
+The reader copes with short reads from the pipe and decodes straight out of
+one reusable buffer. The writer hands the header and payload to the stream
+in a single write. Chrome refuses host->browser messages over 1 MB, so a
+larger reply is sent as a run of "chunk" frames that the extension
+reassembles. orjson is used when it is installed; the standard library
+json module otherwise.
+
+Importing orjson (and the modules it pulls in) takes longer than a one-shot
+sendNativeMessage host spends on its single small message, so it is only
+loaded once a connection turns out to be persistent (a second message) or a
+message is large; see load_orjson().
+"""
+import json
+import os
+import struct
+import threading
+
+# Set by load_orjson(); None means the standard library json module
+orjson = None
+_orjson_wanted = os.environ.get('FFMPEG_DOWNLOADER_JSON') != 'stdlib'
+
+HEADER = struct.Struct('@I')
+# Chrome's limit for a single host->browser message
+MAX_OUTGOING = 1024 * 1024
+# Sanity limit for browser->host messages (commands are tiny)
+MAX_INCOMING = 64 * 1024 * 1024
+# Payload bytes per chunk frame; base64 grows it by 4/3, well under 1 MB
+CHUNK_PAYLOAD = 512 * 1024
+# Incoming message size from which orjson is worth importing
+ORJSON_MIN_SIZE = 64 * 1024
+
+
+def load_orjson():
+    """Switch encode()/decode() to orjson if it is installed; returns the
+    codec in use, 'orjson' or 'json'"""
+    global orjson, _orjson_wanted
+    if orjson is None and _orjson_wanted:
+        _orjson_wanted = False
+        try:
+            import orjson as module
+        except ImportError:  # optional speed-up
+            module = None
+        orjson = module
+    return 'orjson' if orjson is not None else 'json'
+
+
+class FramingError(Exception):
+    """The peer sent something that is not a valid frame"""
+
+
+def encode(message):
+    """message -> UTF-8 JSON bytes"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # a type only json.dumps knows, e.g. an int subclass
+    return json.dumps(message, separators=(',', ':')).encode('utf-8')
+
+
+def decode(data):
+    """UTF-8 JSON bytes, bytearray or memoryview -> message"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(str(data, 'utf-8'))
+
+
+class FrameReader:
+    def __init__(self, stream, max_size=MAX_INCOMING):
+        self.stream = stream
+        self.max_size = max_size
+        self._buffer = bytearray(64 * 1024)
+        self._messages = 0
+
+    def _read_exact(self, size):
+        """memoryview of the next size bytes; short only at end of stream"""
+        if size > len(self._buffer):
+            self._buffer = bytearray(size)
+        view = memoryview(self._buffer)[:size]
+        filled = 0
+        while filled < size:
+            count = self.stream.readinto(view[filled:])
+            if not count:
+                break
+            filled += count
+        return view[:filled]
+
+    def read(self):
+        """Next message, or None once the browser closes the pipe"""
+        header = self._read_exact(HEADER.size)
+        if len(header) == 0:
+            return None
+        if len(header) < HEADER.size:
+            raise FramingError("Truncated length header")
+        size = HEADER.unpack(header)[0]
+        if size > self.max_size:
+            raise FramingError(f"Message of {size} bytes exceeds the {self.max_size} byte limit")
+        payload = self._read_exact(size)
+        if len(payload) < size:
+            raise FramingError(f"Truncated message: {len(payload)} of {size} bytes")
+        self._messages += 1
+        if self._messages == 2 or size >= ORJSON_MIN_SIZE:
+            load_orjson()
+        return decode(payload)
+
+
+class FrameWriter:
+    def __init__(self, stream, max_size=MAX_OUTGOING, chunk_payload=CHUNK_PAYLOAD):
+        self.stream = stream
+        self.max_size = max_size
+        self.chunk_payload = chunk_payload
+        self._lock = threading.Lock()
+        self._next_chunked = 1
+
+    def _write_frame(self, payload):
+        self.stream.write(HEADER.pack(len(payload)) + payload)
+
+    def send(self, message):
+        """Write one message, split into chunk frames if it is too large"""
+        payload = encode(message)
+        # Replies and pushed events may come from different threads; the
+        # lock also keeps the frames of a chunked reply together
+        with self._lock:
+            if len(payload) <= self.max_size:
+                self._write_frame(payload)
+            else:
+                self._write_chunks(payload)
+            self.stream.flush()
+
+    def _write_chunks(self, payload):
+        import base64
+        chunked_id = self._next_chunked
+        self._next_chunked += 1
+        view = memoryview(payload)
+        count = (len(payload) + self.chunk_payload - 1) // self.chunk_payload
+        for index in range(count):
+            part = view[index * self.chunk_payload:(index + 1) * self.chunk_payload]
+            self._write_frame(encode({
+                "chunk": chunked_id,
+                "index": index,
+                "count": count,
+                "data": base64.b64encode(part).decode('ascii'),
+            }))
+
+
+def join_chunks(frames):
+    """Rebuild the message from its chunk frames (the extension's job; used by tests and tools)"""
+    import base64
+    ordered = sorted(frames, key=lambda frame: frame['index'])
+    return decode(b''.join(base64.b64decode(frame['data']) for frame in ordered))
@@ -0,0 +1,372 @@
+"""
+Parallel HLS segment fetcher
+
+FFmpeg's HLS demuxer downloads segments one after another, so on a
+high-latency CDN most of the time is spent waiting on round trips. This
+engine parses the media playlist itself, fetches several segments at once
+over keep-alive connections and writes them to a single file in playlist
+order. FFmpeg then only has to remux that local file.
+"""
+import collections
+import http.client
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT = 30
+MAX_REDIRECTS = 5
+SEGMENT_RETRIES = 3
+# Seconds between fsync + journal checkpoints while fetching
+CHECKPOINT_INTERVAL = 1.0
+# Bytes read between throttle calls when a bandwidth limit applies
+THROTTLE_BLOCK = 64 * 1024
+USER_AGENT = 'Mozilla/5.0 (ffmpeg-downloader)'
+
+Segment = collections.namedtuple('Segment', 'uri duration byterange')
+
+
+class UnsupportedPlaylist(Exception):
+    """The playlist needs features this engine leaves to FFmpeg"""
+
+
+class DownloadCancelled(Exception):
+    """The job was stopped while segments were being fetched"""
+
+
+class HTTPError(Exception):
+    def __init__(self, url, status):
+        super().__init__(f"HTTP {status} for {url}")
+        self.url = url
+        self.status = status
+
+
+# HELPER: Parse "#EXT-X-...:KEY=VALUE,KEY="a,b"" attribute lists
+def parse_attributes(text):
+    attributes = {}
+    key = []
+    value = []
+    in_key = True
+    in_quotes = False
+    for char in text + ',':
+        if in_key:
+            if char == '=':
+                in_key = False
+            else:
+                key.append(char)
+        elif char == '"':
+            in_quotes = not in_quotes
+        elif char == ',' and not in_quotes:
+            attributes[''.join(key).strip()] = ''.join(value)
+            key, value, in_key = [], [], True
+        else:
+            value.append(char)
+    return attributes
+
+
+def _parse_byterange(text, previous_end):
+    """EXT-X-BYTERANGE "length[@offset]" -> (offset, length)"""
+    length, _, offset = text.partition('@')
+    return (int(offset) if offset else previous_end, int(length))
+
+
+def parse_playlist(text, base_url):
+    """Parse a master or media playlist into a dict"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or not lines[0].startswith('#EXTM3U'):
+        raise UnsupportedPlaylist("Not an M3U8 playlist")
+
+    playlist = {
+        "type": "media",
+        "variants": [],
+        "media": [],
+        "segments": [],
+        "init": None,
+        "encrypted": False,
+        "endlist": False,
+        "target_duration": None,
+    }
+    duration = None
+    byterange = None
+    stream_info = None
+    next_offset = 0
+
+    for line in lines[1:]:
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            playlist['type'] = 'master'
+            stream_info = parse_attributes(line.split(':', 1)[1])
+        elif line.startswith('#EXT-X-MEDIA:'):
+            playlist['type'] = 'master'
+            media = parse_attributes(line.split(':', 1)[1])
+            if 'URI' in media:
+                media['uri'] = urljoin(base_url, media['URI'])
+            playlist['media'].append(media)
+        elif line.startswith('#EXTINF:'):
+            duration = float(line.split(':', 1)[1].split(',')[0])
+        elif line.startswith('#EXT-X-BYTERANGE:'):
+            byterange = _parse_byterange(line.split(':', 1)[1], next_offset)
+        elif line.startswith('#EXT-X-MAP:'):
+            attributes = parse_attributes(line.split(':', 1)[1])
+            init_range = None
+            if 'BYTERANGE' in attributes:
+                init_range = _parse_byterange(attributes['BYTERANGE'], 0)
+            playlist['init'] = Segment(urljoin(base_url, attributes['URI']), 0.0, init_range)
+        elif line.startswith('#EXT-X-KEY:'):
+            method = parse_attributes(line.split(':', 1)[1]).get('METHOD', 'NONE')
+            if method != 'NONE':
+                playlist['encrypted'] = True
+        elif line.startswith('#EXT-X-TARGETDURATION:'):
+            playlist['target_duration'] = float(line.split(':', 1)[1])
+        elif line.startswith('#EXT-X-ENDLIST'):
+            playlist['endlist'] = True
+        elif line.startswith('#'):
+            continue
+        elif stream_info is not None:
+            variant = dict(stream_info)
+            variant['uri'] = urljoin(base_url, line)
+            variant['bandwidth'] = int(stream_info.get('BANDWIDTH', 0))
+            playlist['variants'].append(variant)
+            stream_info = None
+        else:
+            playlist['segments'].append(Segment(urljoin(base_url, line), duration or 0.0, byterange))
+            if byterange:
+                next_offset = byterange[0] + byterange[1]
+            duration = None
+            byterange = None
+
+    return playlist
+
+
+class SegmentFetcher:
+    """HTTP GETs over keep-alive connections, one pool per worker thread.
+
+    throttle(amount), when given, is called for every block of body read
+    and may sleep to hold the transfer to a bandwidth limit.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, headers=None, throttle=None):
+        self.timeout = timeout
+        self.headers = {'User-Agent': USER_AGENT}
+        self.headers.update(headers or {})
+        self.throttle = throttle
+        self._local = threading.local()
+        self._all_connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self, scheme, netloc):
+        pool = getattr(self._local, 'pool', None)
+        if pool is None:
+            pool = self._local.pool = {}
+        conn = pool.get((scheme, netloc))
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            conn = conn_class(netloc, timeout=self.timeout)
+            pool[(scheme, netloc)] = conn
+            with self._lock:
+                self._all_connections.append(conn)
+        return conn
+
+    def _drop(self, scheme, netloc):
+        conn = self._local.pool.pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def _send(self, method, parts, headers):
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        conn = self._connection(parts.scheme, parts.netloc)
+        try:
+            conn.request(method, path, headers=headers)
+            return conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Server closed the idle keep-alive connection; reconnect once
+            self._drop(parts.scheme, parts.netloc)
+            conn = self._connection(parts.scheme, parts.netloc)
+            conn.request(method, path, headers=headers)
+            return conn.getresponse()
+
+    def open(self, url, byterange=None, method='GET'):
+        """Send a request, following redirects, and return the response.
+
+        byterange is (offset, length) or (offset, None) for "offset-". The
+        caller must read the body and then call release(response) before
+        this thread makes another request.
+        """
+        headers = dict(self.headers)
+        if byterange:
+            offset, length = byterange
+            end = '' if length is None else offset + length - 1
+            headers['Range'] = f"bytes={offset}-{end}"
+
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            response = self._send(method, parts, headers)
+            response.pool_key = (parts.scheme, parts.netloc)
+            if response.status in (301, 302, 303, 307, 308):
+                response.read()
+                self.release(response)
+                url = urljoin(url, response.getheader('Location'))
+                continue
+            if response.status not in (200, 206):
+                response.read()
+                self.release(response)
+                raise HTTPError(url, response.status)
+            return response
+        raise HTTPError(url, 'too many redirects')
+
+    def release(self, response):
+        """Return the response's connection to the pool (or drop it)"""
+        if response.will_close:
+            self._drop(*response.pool_key)
+
+    def get(self, url, byterange=None):
+        """Return the body of url (optionally a (offset, length) slice)"""
+        response = self.open(url, byterange)
+        try:
+            if self.throttle is None:
+                return response.read()
+            blocks = []
+            while True:
+                block = response.read(THROTTLE_BLOCK)
+                if not block:
+                    return b''.join(blocks)
+                self.throttle(len(block))
+                blocks.append(block)
+        finally:
+            self.release(response)
+
+    def get_text(self, url):
+        return self.get(url).decode('utf-8', 'replace')
+
+    def close(self):
+        with self._lock:
+            for conn in self._all_connections:
+                conn.close()
+            self._all_connections = []
+
+
+def fetch_with_retry(fetcher, segment, retries=SEGMENT_RETRIES):
+    for attempt in range(retries):
+        try:
+            return fetcher.get(segment.uri, segment.byterange)
+        except (HTTPError, http.client.HTTPException, OSError):
+            if attempt == retries - 1:
+                raise
+            time.sleep(0.5 * (attempt + 1))
+
+
+def load_media_playlist(fetcher, url, cache=None):
+    """Fetch url; if it is a master playlist follow its best variant.
+
+    cache is an optional manifest.ManifestCache to parse through.
+    """
+    def load(url):
+        if cache is not None:
+            return cache.fetch(fetcher, url)
+        return parse_playlist(fetcher.get_text(url), url)
+
+    playlist = load(url)
+    if playlist['type'] == 'master':
+        if not playlist['variants']:
+            raise UnsupportedPlaylist("Master playlist has no variants")
+        best = max(playlist['variants'], key=lambda variant: variant['bandwidth'])
+        playlist = load(best['uri'])
+    return playlist
+
+
+def _resume_point(output_path, resume, segment_count):
+    """Validate a journal checkpoint against the playlist and the .part file"""
+    if not resume or resume.get('segment_count') != segment_count:
+        return 0, 0
+    done = resume.get('segments_done', 0)
+    offset = resume.get('bytes_done', 0)
+    try:
+        if os.path.getsize(output_path) < offset:
+            return 0, 0
+    except OSError:
+        return 0, 0
+    return done, offset
+
+
+def download_hls(url, output_path, workers=DEFAULT_WORKERS, fetcher=None,
+                 on_progress=None, cancel=None, resume=None, on_checkpoint=None,
+                 checkpoint_interval=CHECKPOINT_INTERVAL, cache=None, throttle=None):
+    """Fetch every segment of a VOD playlist into output_path, in order.
+
+    on_progress(segments_done, segments_total, bytes_written) is called
+    after each segment is written. resume is a checkpoint previously passed
+    to on_checkpoint(checkpoint); output_path is truncated to it and the
+    remaining segments are appended. throttle is passed to the fetcher
+    created when none is given. Returns the number of bytes written.
+    """
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = SegmentFetcher(throttle=throttle)
+
+    try:
+        playlist = load_media_playlist(fetcher, url, cache)
+        if playlist['encrypted']:
+            raise UnsupportedPlaylist("Encrypted playlists are left to FFmpeg")
+        if not playlist['endlist']:
+            raise UnsupportedPlaylist("Live playlists are left to FFmpeg")
+
+        segments = playlist['segments']
+        done, written = _resume_point(output_path, resume, len(segments))
+        # Keep a bounded window in flight so memory stays flat on long VODs
+        window = workers * 2
+
+        def checkpoint(out):
+            # Data must be on disk before the journal claims it
+            out.flush()
+            os.fsync(out.fileno())
+            if on_checkpoint:
+                on_checkpoint({"segments_done": done, "bytes_done": written,
+                               "segment_count": len(segments)})
+
+        with ThreadPoolExecutor(max_workers=workers) as pool, \
+                open(output_path, 'r+b' if written else 'wb') as out:
+            if written:
+                out.truncate(written)
+                out.seek(written)
+            elif playlist['init']:
+                written += out.write(fetch_with_retry(fetcher, playlist['init']))
+
+            pending = collections.deque()
+            remaining = iter(segments[done:])
+            for segment in itertools.islice(remaining, window):
+                pending.append(pool.submit(fetch_with_retry, fetcher, segment))
+
+            last_checkpoint = time.time()
+            while pending:
+                if cancel is not None and cancel.is_set():
+                    for future in pending:
+                        future.cancel()
+                    checkpoint(out)
+                    raise DownloadCancelled()
+                try:
+                    data = pending.popleft().result()
+                except Exception:
+                    for future in pending:
+                        future.cancel()
+                    checkpoint(out)
+                    raise
+                written += out.write(data)
+                done += 1
+                for segment in itertools.islice(remaining, 1):
+                    pending.append(pool.submit(fetch_with_retry, fetcher, segment))
+                if on_progress:
+                    on_progress(done, len(segments), written)
+                if time.time() - last_checkpoint >= checkpoint_interval:
+                    last_checkpoint = time.time()
+                    checkpoint(out)
+
+            checkpoint(out)
+
+        return written
+    finally:
+        if own_fetcher:
+            fetcher.close()
@@ -1,19 +1,30 @@
+# Startup budget: a one-shot command (get-progress, kill, list) should reply
+# within a few tens of milliseconds, so only cheap modules are imported here
+# and importing does no I/O. subprocess, platform, urllib, sqlite3 and the
+# download engines (which pull in http.client and concurrent.futures) are
+# imported by the code that needs them; the logs directory, job store,
+# journals and log writer thread are created on first use, and FFmpeg is
+# only discovered once a job needs it. start_host.sh/.bat run `-m host` so
+# this module loads from cached bytecode.
 import sys
-import json
-import struct
-import subprocess
 import os
-import re
 import threading
-import signal
-import platform
-import shutil
-from urllib.parse import urlparse
-from pathlib import Path
+import time
+import collections
+
+from framing import FrameReader, FrameWriter, FramingError
+from ffparse import FFmpegOutputParser
+from journal import JobJournal
+from progress import ProgressEstimator
+from ratelimit import BandwidthLimiter
+from scheduler import DownloadScheduler
+from supervisor import ProcessSupervisor
 
 # Cross-platform FFmpeg path detection
 def get_ffmpeg_path():
     """Get FFmpeg executable path based on OS"""
+    import platform
+    import shutil
     if platform.system() == 'Windows':
         # Check common Windows locations
         possible_paths = [
@@ -46,44 +57,97 @@ def get_ffmpeg_path():
             return '/usr/bin/ffmpeg'
         return 'ffmpeg'  # Assume in PATH
 
-FFMPEG_PATH = get_ffmpeg_path()
-
 # Setup logs directory
-LOGS_DIR = Path(__file__).parent.parent / "logs"
-LOGS_DIR.mkdir(exist_ok=True)
-LOG_FILE = LOGS_DIR / "ffmpeg-download.log"
-PROGRESS_FILE = LOGS_DIR / "progress.json"
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+if os.path.isfile(HOST_DIR):
+    # Running from the host.pyz zipapp built by install.py
+    HOST_DIR = os.path.dirname(HOST_DIR)
+LOGS_DIR = os.path.join(os.path.dirname(HOST_DIR), "logs")
+LOG_FILE = os.path.join(LOGS_DIR, "ffmpeg-download.log")
+FFMPEG_CAPS_FILE = os.path.join(LOGS_DIR, "ffmpeg-caps.json")
+JOBS_DB = os.path.join(LOGS_DIR, "jobs.db")
+
+JOURNAL_DIR = os.path.join(LOGS_DIR, "jobs")
+
+DOWNLOADS_DIR = os.path.join(os.path.expanduser('~'), "Downloads")
+
+def logs_dir():
+    """LOGS_DIR, created by whatever first writes there"""
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    return LOGS_DIR
+
+# Path, version and supported options of FFmpeg, looked up on first use by
+# ffmpeg_info(); cached on disk until the binary changes
+FFMPEG_PATH = None
+FFMPEG_INFO = None
+# Seconds before a host that found no FFmpeg looks again, so installing it
+# does not need a browser restart
+FFMPEG_RECHECK_INTERVAL = 5.0
+_ffmpeg_checked = None
+_ffmpeg_lock = threading.Lock()
+
+def ffmpeg_info():
+    """FFmpeg discovery results, resolved once per process (a missing
+    FFmpeg is looked for again every FFMPEG_RECHECK_INTERVAL seconds)"""
+    global FFMPEG_INFO, FFMPEG_PATH, _ffmpeg_checked
+    with _ffmpeg_lock:
+        missing = FFMPEG_INFO is not None and not FFMPEG_INFO['version']
+        if FFMPEG_INFO is None or (missing and time.monotonic() - _ffmpeg_checked >= FFMPEG_RECHECK_INTERVAL):
+            import ffcaps
+            logs_dir()
+            previous = FFMPEG_INFO
+            FFMPEG_INFO = ffcaps.discover(FFMPEG_CAPS_FILE, get_ffmpeg_path)
+            _ffmpeg_checked = time.monotonic()
+            # A path set from outside stays; one we discovered follows the binary
+            if FFMPEG_PATH is None or (previous and FFMPEG_PATH == previous['path']):
+                FFMPEG_PATH = FFMPEG_INFO['path']
+        return FFMPEG_INFO
 
 # HELPER: Read message from Chrome (Standard Input)
+# Created on first use so importing host never touches the standard streams
+_reader = None
+_writer = None
+_writer_lock = threading.Lock()
+
 def get_message():
     """Read a single message from stdin (native messaging protocol)"""
-    raw_length = sys.stdin.buffer.read(4)
-    if len(raw_length) == 0:
-        return None
-    message_length = struct.unpack('@I', raw_length)[0]
-    message = sys.stdin.buffer.read(message_length).decode('utf-8')
-    return json.loads(message)
+    global _reader
+    if _reader is None:
+        _reader = FrameReader(sys.stdin.buffer)
+    return _reader.read()
 
 # HELPER: Send message to Chrome (Standard Output)
 def send_message(message_content):
-    encoded_content = json.dumps(message_content).encode('utf-8')
-    encoded_length = struct.pack('@I', len(encoded_content))
-    sys.stdout.buffer.write(encoded_length)
-    sys.stdout.buffer.write(encoded_content)
-    sys.stdout.buffer.flush()
+    """Write one framed message; replies over 1 MB go out as chunk frames"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = FrameWriter(sys.stdout.buffer)
+    _writer.send(message_content)
 
 # HELPER: Log messages
-def log_message(message):
-    """Write message to log file"""
-    try:
-        with open(LOG_FILE, 'a') as log:
-            log.write(message + '\n')
-    except:
-        pass
+# The writer thread starts with the first record, so a command that logs
+# nothing never creates the logs directory or the thread
+LOGGER = None
+_logger_lock = threading.Lock()
+
+def log_message(message, job_id=None, pid=None, **fields):
+    """Queue a JSON-lines record for the log file (never blocks on disk)"""
+    global LOGGER
+    from hostlog import AsyncLogger, split_level
+    if LOGGER is None:
+        with _logger_lock:
+            if LOGGER is None:
+                logs_dir()
+                LOGGER = AsyncLogger(LOG_FILE)
+    level, text = split_level(message)
+    LOGGER.log(text, level=level, job_id=job_id, pid=pid, **fields)
 
 # HELPER: Extract title from URL
 def extract_title_from_url(url):
     """Extract a meaningful title from URL"""
+    from urllib.parse import urlparse
     try:
         parsed = urlparse(url)
         path = parsed.path.split('/')[-1]
@@ -93,253 +157,1373 @@ def extract_title_from_url(url):
         pass
     return None
 
-# HELPER: Parse FFmpeg progress - extract size
-def parse_ffmpeg_progress(line, download_path):
-    """Parse FFmpeg progress line and return dict with file size"""
+def range_filename(filename, url):
+    """filename with the source file's extension: the range engine copies
+    the file byte for byte, so its container stays the source's"""
+    from urllib.parse import urlparse
+    source = os.path.splitext(urlparse(url).path)[1].lower()
+    if source not in PROGRESSIVE_EXTENSIONS:
+        source = '.mp4'
+    name, extension = os.path.splitext(filename)
+    if extension.lower() == source:
+        return filename
+    if extension.lower() in PROGRESSIVE_EXTENSIONS + ('.ts', '.m3u8'):
+        return name + source
+    return filename + source
+
+# Live jobs (process handles, progress) of this host process, keyed by
+# job id; every job is also recorded in STORE, which outlives the process
+JOBS = {}
+JOBS_LOCK = threading.Lock()
+
+# FFmpeg processes allowed to run at once; later downloads wait in a queue
+MAX_CONCURRENT_DOWNLOADS = int(os.environ.get('FFMPEG_DOWNLOADER_MAX_JOBS', '3'))
+
+# Download engines: "ffmpeg" reads the URL directly, "hls" fetches
+# segments in parallel and only uses FFmpeg to remux, "range" fetches a
+# progressive file over parallel range requests; "auto" picks by URL
+ENGINES = ('ffmpeg', 'hls', 'range')
+DEFAULT_ENGINE = os.environ.get('FFMPEG_DOWNLOADER_ENGINE', 'ffmpeg')
+# (0 means the engine's own default)
+HLS_WORKERS = int(os.environ.get('FFMPEG_DOWNLOADER_HLS_WORKERS', '0'))
+RANGE_CONNECTIONS = int(os.environ.get('FFMPEG_DOWNLOADER_RANGE_CONNECTIONS', '0'))
+PROGRESSIVE_EXTENSIONS = ('.mp4', '.webm', '.mkv', '.mov', '.m4v')
+
+# Learn per-CDN settings (persistent connections, reconnects, parallelism)
+# from download history and start new jobs from the best known ones (see
+# cdnprofile.py); "0" keeps every job on the fixed defaults
+CDN_PROFILES = os.environ.get('FFMPEG_DOWNLOADER_PROFILES', '1') != '0'
+
+# How FFmpeg writes the output file (see output.py): "auto" picks by
+# expected size; "faststart", "fragmented", "ts", "mkv" or "deferred"
+DEFAULT_OUTPUT = os.environ.get('FFMPEG_DOWNLOADER_OUTPUT', 'auto')
+
+# Host-wide download cap in bytes/s shared by all jobs (0 means unlimited);
+# change it at runtime with the "limit" command
+MAX_RATE = int(os.environ.get('FFMPEG_DOWNLOADER_MAX_RATE', '0'))
+# Shortest pause worth stopping an FFmpeg process for to hold its share
+MIN_FFMPEG_PAUSE = 0.05
+# Longest single pause, so a sudden cut in the cap cannot stall a job
+MAX_FFMPEG_PAUSE = 5.0
+
+# Which variant of a master playlist to download: "max-bandwidth",
+# "max-resolution" or "bandwidth-cap" (with max_bandwidth in bits/s)
+# (unset means manifest.DEFAULT_POLICY)
+DEFAULT_VARIANT_POLICY = os.environ.get('FFMPEG_DOWNLOADER_VARIANT_POLICY')
+
+# JSON file of extra URL canonicalization rules (see canonical.py); the
+# built-in rules strip common auth/token parameters
+CANONICAL_RULES_FILE = os.environ.get('FFMPEG_DOWNLOADER_CANONICAL_RULES')
+
+# Minimum seconds between pushed progress events for one job
+PROGRESS_EVENT_INTERVAL = 1.0
+# Seconds between [PROGRESS] log lines for one job
+PROGRESS_LOG_INTERVAL = 5.0
+# FFmpeg stderr lines kept per job for error reporting
+STDERR_TAIL_LINES = 50
+
+# Set once a connectNative client sends "subscribe"; one-shot
+# sendNativeMessage callers must only ever see their single reply
+EVENTS_ENABLED = threading.Event()
+
+def push_event(event):
+    """Send an unsolicited event to a subscribed extension"""
+    if not EVENTS_ENABLED.is_set():
+        return
     try:
-        progress = {}
-        
-        # Extract time: 00:01:23.45
-        time_match = re.search(r'time=(\d{2}):(\d{2}):(\d{2})', line)
-        if time_match:
-            progress['time'] = f"{time_match.group(1)}:{time_match.group(2)}:{time_match.group(3)}"
-        
-        # Extract speed: 1.5x
-        speed_match = re.search(r'speed=\s*([\d.]+)x', line)
-        if speed_match:
-            progress['speed'] = f"{speed_match.group(1)}x"
-        
-        # Check actual file size being written
-        if os.path.exists(download_path):
-            try:
-                file_size = os.path.getsize(download_path)
-                progress['downloaded'] = file_size
-            except:
-                pass
-        
-        return progress if progress else None
-    except:
+        send_message(event)
+    except (BrokenPipeError, OSError):
+        EVENTS_ENABLED.clear()
+
+def new_job_id():
+    """Return a short unique id for a download job"""
+    return os.urandom(6).hex()
+
+def find_job(msg):
+    """Look up a live job by job_id, falling back to pid for older clients"""
+    record = find_record(msg)
+    if record is None:
         return None
+    with JOBS_LOCK:
+        return JOBS.get(record['job_id'])
+
+def find_record(msg):
+    """Look up a job's stored record by job_id, pid or (oldest clients) filename"""
+    if msg.get('job_id'):
+        return job_store().get(msg['job_id'])
+    if msg.get('pid'):
+        return job_store().by_pid(msg['pid'])
+    if msg.get('filename'):
+        return job_store().by_path(os.path.join(DOWNLOADS_DIR, msg['filename']))
+    return None
+
+def record_job(job, **fields):
+    """Write a job's new state through to the job store"""
+    job_store().update(job['job_id'], **fields)
 
-# HELPER: Get total file size from FFmpeg output
-def extract_duration_and_bitrate(stderr_lines):
-    """Extract duration to estimate total size"""
+def record_summary(record):
+    """Public view of a stored job that is no longer live in this process"""
+    return {
+        "job_id": record['job_id'],
+        "pid": record['pid'],
+        "url": record['url'],
+        "path": record['output_path'],
+        "filename": os.path.basename(record['output_path']),
+        "status": record['status'],
+        "engine": record['engine'],
+        "downloaded": record['bytes'],
+        "exit_code": record['exit_code'],
+        "error": record['error'],
+        "created": record['created'],
+        "finished": record['finished'],
+    }
+
+# HELPER: Check whether a PID from a previous host run is still alive
+def pid_alive(pid):
+    if sys.platform == 'win32':
+        # os.kill() on Windows is TerminateProcess for any signal, 0 included
+        import psutil
+        return psutil.pid_exists(pid)
     try:
-        for line in stderr_lines:
-            # Look for Duration: HH:MM:SS.ms
-            duration_match = re.search(r'Duration:\s*(\d+):(\d+):([\d.]+)', line)
-            if duration_match:
-                hours = int(duration_match.group(1))
-                minutes = int(duration_match.group(2))
-                seconds = float(duration_match.group(3))
-                total_seconds = hours * 3600 + minutes * 60 + seconds
-                
-                # Look for bitrate
-                bitrate_match = re.search(r'bitrate=\s*([\d.]+)\s*kb/s', line)
-                if bitrate_match:
-                    bitrate_kbps = float(bitrate_match.group(1))
-                    estimated_size = (bitrate_kbps * 1000 / 8) * total_seconds  # Convert kb/s to bytes/s
-                    return estimated_size
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+def job_for_key(job_key):
+    """The queued or running job for a journal key, if there is one"""
+    with JOBS_LOCK:
+        for job in JOBS.values():
+            if job.get('job_key') == job_key and job['status'] in ('queued', 'downloading'):
+                return job
+    return None
+
+def job_for_content(content_key):
+    """The queued or running job fetching a canonical stream, if there is one"""
+    with JOBS_LOCK:
+        for job in JOBS.values():
+            if job.get('content_key') == content_key and job['status'] in ('queued', 'downloading'):
+                return job
+    return None
+
+def job_summary(job):
+    """Public view of a job for replies to the extension"""
+    return {
+        "job_id": job['job_id'],
+        "pid": job['pid'],
+        "url": job['url'],
+        "path": job['path'],
+        "filename": os.path.basename(job['path']),
+        "status": job['status'],
+        "queue_position": SCHEDULER.position(job),
+        "engine": job['engine'],
+        "output": job.get('output_strategy') or job.get('output'),
+        "profile": job.get('profile'),
+        "select": job.get('selection'),
+        "error": job.get('error_message'),
+        "progress": progress_fields(job),
+    }
+
+def progress_fields(job):
+    """Progress numbers reported for a job in replies and events"""
+    progress = job['progress']
+    fields = {
+        "downloaded": progress.get('downloaded', 0),
+        "speed": progress.get('speed'),
+        "bitrate_kbps": progress.get('bitrate_kbps'),
+        "out_time": progress.get('out_time'),
+    }
+    # percent, estimated_total, eta (seconds) and rate (bytes/s)
+    fields.update(job['estimator'].snapshot())
+    return fields
+
+# HELPER: Progress reply for a live job, or for its stored record
+def progress_reply(job, record=None):
+    if job:
+        reply = {
+            "status": "progress",
+            "pid": job['pid'],
+            "job_id": job['job_id'],
+            "state": job['status'],
+            "queue_position": SCHEDULER.position(job),
+        }
+        reply.update(progress_fields(job))
+        return reply
+    
+    # Finished, or started by an earlier host process
+    return {
+        "status": "progress",
+        "pid": record['pid'],
+        "job_id": record['job_id'],
+        "state": record['status'],
+        "queue_position": None,
+        "downloaded": record['bytes'],
+        "estimated_total": record['bytes'] if record['status'] == 'finished' else 0,
+        "exit_code": record['exit_code'],
+        "error": record['error'],
+    }
+
+# Handle get-progress command - report FFmpeg's own progress numbers
+def handle_get_progress(msg):
+    record = find_record(msg)
+    if record is None:
+        return {"status": "error", "message": "Unknown job"}
+    with JOBS_LOCK:
+        job = JOBS.get(record['job_id'])
+    return progress_reply(job, record)
+
+# Handle get-progress-batch command - progress for many jobs in one reply;
+# without job_ids, every live job of this host is reported
+def handle_get_progress_batch(msg):
+    job_ids = msg.get('job_ids')
+    with JOBS_LOCK:
+        if job_ids is None:
+            live = dict(JOBS)
+        else:
+            live = {job_id: JOBS[job_id] for job_id in job_ids if job_id in JOBS}
+    
+    jobs = {job_id: progress_reply(job) for job_id, job in live.items()}
+    # Jobs that already finished (or belong to another host) come from the store
+    stored = job_store().get_many([job_id for job_id in job_ids or () if job_id not in live])
+    for record in stored:
+        jobs[record['job_id']] = progress_reply(None, record)
+    for job_id in job_ids or ():
+        jobs.setdefault(job_id, {"status": "error", "message": "Unknown job"})
+    return {"status": "progress-batch", "jobs": jobs}
+
+# Handle kill command - stop a job found by job id or PID; only PIDs the
+# job store knows belong to a download are ever signalled
+def handle_kill(msg):
+    import jobstore
+    if not (msg.get('job_id') or msg.get('pid')):
+        return {"status": "error", "message": "No job_id or pid provided"}
+    record = find_record(msg)
+    if record is None:
+        return {"status": "error", "message": "Unknown job"}
+    with JOBS_LOCK:
+        job = JOBS.get(record['job_id'])
+    
+    if job and SCHEDULER.cancel(job):
+        job['status'] = 'stopped'
+        log_message(f"[INFO] Removed queued job {job['job_id']}", job_id=job['job_id'])
+        finish_job(job)
+        return {"status": "killed", "pid": None, "job_id": job['job_id']}
+    
+    if job is None and record['status'] not in jobstore.ACTIVE_STATUSES:
+        return {"status": "killed", "pid": record['pid'], "job_id": record['job_id']}
+    
+    pid = job['pid'] if job else record['pid']
+    log_message(f"[INFO] Kill request for PID: {pid}", job_id=record['job_id'], pid=pid)
+    
+    # HLS engine jobs have no FFmpeg process while segments are fetched
+    if job and job['status'] == 'downloading' and not pid:
+        job['cancel'].set()
+        job['status'] = 'stopped'
+        record_job(job, status='stopped')
+        return {"status": "killed", "pid": None, "job_id": job['job_id']}
+    
+    if not pid:
+        job_store().update(record['job_id'], status='stopped', finished=time.time())
+        return {"status": "killed", "pid": None, "job_id": record['job_id']}
+    
+    if job and job.get('paused'):
+        # A stopped process would only act on SIGTERM once continued
+        resume_ffmpeg(job)
+    try:
+        import signal
+        os.kill(pid, signal.SIGTERM)
+        log_message(f"[SUCCESS] Process {pid} terminated", pid=pid)
+    except ProcessLookupError:
+        log_message(f"[WARNING] Process {pid} not found (already finished)", pid=pid)
+    except Exception as e:
+        log_message(f"[ERROR] Failed to kill process {pid}: {str(e)}", pid=pid)
+        return {"status": "error", "message": f"Failed to kill: {str(e)}"}
+    
+    if job:
+        job['status'] = 'stopped'
+    else:
+        # FFmpeg left running by an earlier host process has no monitor
+        job_store().update(record['job_id'], status='stopped', finished=time.time())
+    return {"status": "killed", "pid": pid, "job_id": record['job_id']}
+
+# Handle list command - report live jobs plus the stored job history
+def handle_list(msg):
+    with JOBS_LOCK:
+        jobs = list(JOBS.values())
+    live = {job['job_id'] for job in jobs}
+    history = [record_summary(record)
+               for record in job_store().list(msg.get('statuses'), limit=int(msg.get('limit', 50)))
+               if record['job_id'] not in live]
+    interrupted = [
+        {"job_key": r['job_key'], "url": r['url'], "filename": r['filename'], "path": r['path'],
+         "segments_done": r.get('segments_done'), "segment_count": r.get('segment_count')}
+        for r in job_journal().incomplete() if job_for_key(r['job_key']) is None
+    ]
+    return {
+        "status": "jobs",
+        "jobs": [job_summary(job) for job in jobs],
+        "history": history,
+        "interrupted": interrupted,
+        "scheduler": SCHEDULER.stats(),
+        "supervised": SUPERVISOR.active,
+        "limiter": LIMITER.stats(),
+        "remux_pending": REMUXER.pending if REMUXER else 0,
+        "manifest_cache": MANIFEST_CACHE.stats() if MANIFEST_CACHE else None,
+        "probe_cache": PROBE_CACHE.stats() if PROBE_CACHE else None,
+        # Only what an earlier job found out: discovery runs FFmpeg
+        "ffmpeg": {"path": FFMPEG_PATH, "version": FFMPEG_INFO['version'] if FFMPEG_INFO else None}
+    }
+
+# Handle resume command - restart an interrupted job from its journal
+def handle_resume(msg):
+    record = job_journal().load(msg.get('job_key', ''))
+    if record is None:
+        return {"status": "error", "message": "No interrupted job with that key"}
+    return handle_download({"url": record['url'], "filename": record['filename'],
+                            "priority": msg.get('priority', 0)})
+
+# Handle cleanup command - forget finished jobs older than N days
+def handle_cleanup(msg):
+    days = float(msg.get('older_than_days', 7))
+    removed = job_store().cleanup(days * 86400)
+    log_message(f"[INFO] Removed {removed} job records older than {days:g} days")
+    return {"status": "cleaned", "removed": removed}
+
+# Handle configure command - change host settings at runtime
+def handle_configure(msg):
+    if 'max_concurrent' in msg:
+        SCHEDULER.set_max_concurrent(msg['max_concurrent'])
+        log_message(f"[INFO] Max concurrent downloads set to {SCHEDULER.max_concurrent}")
+    return {"status": "configured", "scheduler": SCHEDULER.stats()}
+
+# Handle limit command - change the bandwidth cap or a job's weight at runtime
+def handle_limit(msg):
+    if 'max_rate' in msg:
+        rate = int(msg['max_rate'] or 0)
+        if rate < 0:
+            return {"status": "error", "message": "max_rate must be 0 (unlimited) or positive"}
+        LIMITER.set_rate(rate)
+        log_message(f"[INFO] Bandwidth cap set to {rate / (1024 * 1024):.2f} MB/s" if rate else "[INFO] Bandwidth cap removed")
+    if 'weight' in msg:
+        weight = float(msg['weight'])
+        if weight <= 0:
+            return {"status": "error", "message": "weight must be positive"}
+        job = find_job(msg)
+        if job is None:
+            return {"status": "error", "message": "Unknown job"}
+        job['weight'] = weight
+        # Queued jobs pick the weight up when they start
+        LIMITER.set_weight(job['job_id'], weight)
+    return {"status": "limited", "limiter": LIMITER.stats()}
+
+# Collect FFmpeg stderr: input duration for percent and ETA, tail for errors
+def handle_stderr_line(job, raw_line):
+    parser = job['parser']
+    estimator = job['estimator']
+    line = raw_line.decode('utf-8', 'replace').rstrip()
+    job['stderr_tail'].append(line)
+    parser.feed_stderr(line)
+    if estimator.duration is None and parser.duration:
+        estimator.duration = parser.duration
+        estimator.prior_total = parser.estimated_total
+
+# Track progress from FFmpeg's "-progress pipe:1" stream
+def handle_progress_line(job, raw_line):
+    pid = job['pid']
+    # "progress=continue|end" closes one block
+    try:
+        block = job['parser'].feed_progress(raw_line.decode('utf-8', 'replace'))
+    except ValueError as e:
+        log_message(f"[WARN] Bad progress block from PID {pid}: {e}", job_id=job['job_id'], pid=pid)
+        return
+    if block is None:
+        return
+    job['progress'] = block
+    final = block['state'] == 'end'
+    job['estimator'].update(block.get('downloaded', 0), position=block.get('out_time'),
+                            fraction=1.0 if final else None)
+    if job.get('network_input') and not final:
+        throttle_ffmpeg(job, block.get('downloaded', 0))
+    
+    now = time.time()
+    if final or now - job['last_event'] >= PROGRESS_EVENT_INTERVAL:
+        job['last_event'] = now
+        event = {"event": "progress", "job_id": job['job_id'], "pid": pid}
+        event.update(progress_fields(job))
+        push_event(event)
+    
+    if now - job['last_log'] >= PROGRESS_LOG_INTERVAL:
+        job['last_log'] = now
+        elapsed = now - job['ffmpeg_started']
+        size_mb = block.get('downloaded', 0) / (1024 * 1024)
+        bitrate = block.get('bitrate_kbps') or 0
+        log_message(f"[PROGRESS] PID {pid}: {size_mb:.2f} MB downloaded | Bitrate: {bitrate / 1000:.2f} Mbps | Speed: {block.get('speed')}x | Elapsed: {int(elapsed)}s",
+                    job_id=job['job_id'], pid=pid, downloaded=block.get('downloaded', 0),
+                    speed=block.get('speed'), elapsed=round(elapsed, 1))
+        record_job(job, bytes=block.get('downloaded', 0))
+
+# FFmpeg reads the network itself, so its share of the bandwidth cap is
+# enforced after the fact: bytes written since the last block are charged to
+# the job and the process is stopped for as long as it is over its share
+def throttle_ffmpeg(job, downloaded):
+    delay = LIMITER.report(job['job_id'], max(downloaded - job['charged_bytes'], 0))
+    job['charged_bytes'] = downloaded
+    if delay >= MIN_FFMPEG_PAUSE and not job['paused']:
+        pause_ffmpeg(job, min(delay, MAX_FFMPEG_PAUSE))
+
+def pause_ffmpeg(job, seconds):
+    pid = job['pid']
+    try:
+        if sys.platform == 'win32':
+            import psutil
+            process = psutil.Process(pid)
+            process.suspend()
+            resume = process.resume
+        else:
+            import signal
+            os.kill(pid, signal.SIGSTOP)
+            resume = lambda: os.kill(pid, signal.SIGCONT)  # noqa: E731
+    except Exception as e:
+        log_message(f"[WARN] Cannot pause PID {pid} for the bandwidth limit: {e}", job_id=job['job_id'], pid=pid)
+        return
+    job['paused'] = resume
+    timer = threading.Timer(seconds, resume_ffmpeg, args=(job,))
+    timer.daemon = True
+    timer.start()
+
+def resume_ffmpeg(job):
+    resume, job['paused'] = job['paused'], None
+    if resume is None:
+        return
+    try:
+        resume()
+    except Exception:
+        pass  # already exited
+
+# Settle a job once its FFmpeg has exited and been reaped
+def handle_ffmpeg_exit(job, returncode):
+    pid = job['pid']
+    parser = job['parser']
+    # The pid may be reused once reaped; a pending resume must not signal it
+    job['paused'] = None
+    job['exit_code'] = returncode
+    job['stderr_tail'] = list(job['stderr_tail'])
+    if job['status'] == 'downloading':
+        job['status'] = 'finished' if returncode == 0 else 'failed'
+    if returncode != 0 and parser.last_error:
+        job.setdefault('error_message', parser.last_error)
+    finish_job(job)
+    
+    # Final status
+    final_size = job['progress'].get('downloaded', 0)
+    total_time = time.time() - job['ffmpeg_started']
+    if returncode == 0 and final_size:
+        avg_speed = (final_size * 8) / (total_time * 1024 * 1024) if total_time > 0 else 0
+        log_message(f"[COMPLETE] PID {pid}: {final_size / (1024*1024):.2f} MB | Total time: {int(total_time)}s | Avg speed: {avg_speed:.2f} Mbps", job_id=job['job_id'], pid=pid)
+    else:
+        log_message(f"[ERROR] PID {pid}: FFmpeg exited with code {returncode}", job_id=job['job_id'], pid=pid, exit_code=returncode)
+
+# Hand a started FFmpeg to the supervisor thread shared by every job; the
+# callbacks above run on it, so they only parse, update the job and hand
+# off events and log records
+def supervise_ffmpeg(job):
+    now = time.time()
+    job['ffmpeg_started'] = now
+    job['last_event'] = 0
+    job['last_log'] = now
+    job['stderr_tail'] = collections.deque(maxlen=STDERR_TAIL_LINES)
+    job['charged_bytes'] = 0
+    job['paused'] = None
+    SUPERVISOR.watch(job['process'],
+                     on_stdout=lambda line: handle_progress_line(job, line),
+                     on_stderr=lambda line: handle_stderr_line(job, line),
+                     on_exit=lambda returncode: handle_ffmpeg_exit(job, returncode))
+
+# HELPER: Delete a file if it exists
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+# HELPER: Check whether an output path is taken on disk or by a pending job
+def path_in_use(path):
+    if os.path.exists(path):
+        return True
+    with JOBS_LOCK:
+        return any(job['path'] == path for job in JOBS.values())
+
+# Release a job's slot, record its outcome and settle its journal once it
+# stops running; the job then lives on only in the job store
+def finish_job(job):
+    SCHEDULER.job_finished(job)
+    LIMITER.unregister(job['job_id'])
+    finished = time.time()
+    size = job['progress'].get('downloaded', 0)
+    if job['status'] == 'finished':
+        try:
+            size = os.path.getsize(job['path'])
+        except OSError:
+            size = 0
+        if not size:
+            # A clean exit that left nothing behind is not a download
+            job['status'] = 'failed'
+            job.setdefault('error_message', "Output file is missing or empty")
+    record_job(job, status=job['status'], bytes=size,
+               exit_code=job.get('exit_code'), error=job.get('error_message'),
+               finished=finished)
+    if CDN_PROFILES and job.get('profile') and job.get('cdn') and job['status'] in ('finished', 'failed'):
+        # A user stop says nothing about the CDN; success and failure do
+        cdn_profiles().record(job['cdn'], job['engine'], job['profile'], job['status'] == 'finished',
+                              size, finished - job.get('started', finished))
+    with JOBS_LOCK:
+        JOBS.pop(job['job_id'], None)
+    # The terminal event: the extension settles the download on this, not
+    # on the file having stopped growing
+    push_event({
+        "event": "finished",
+        "job_id": job['job_id'],
+        "pid": job['pid'],
+        "status": job['status'],
+        "exit_code": job.get('exit_code'),
+        "size": size,
+        "duration": job['progress'].get('out_time') or job['estimator'].duration,
+        "elapsed": round(finished - job.get('started', finished), 1),
+        "error": job.get('error_message'),
+        "output": job.get('output_strategy'),
+    })
+    if job['status'] == 'failed':
+        # Keep the journal and partial data so the next attempt resumes
+        if job.get('job_key'):
+            job_journal().update(job['job_key'], status='interrupted')
+        return
+    for temp_file in job['temp_files']:
+        remove_file(temp_file)
+    if job.get('job_key'):
+        job_journal().remove(job['job_key'])
+    if job['status'] == 'finished' and job.get('output_strategy') == 'deferred':
+        deferred_remuxer().submit(FFMPEG_PATH, job['path'])
+        log_message(f"[INFO] Queued faststart remux of {job['path']}", job_id=job['job_id'])
+
+# Launch FFmpeg for a job, reading from stream URLs or local files
+def launch_ffmpeg(job, inputs, map_args=()):
+    import ffcaps
+    import output
+    import platform
+    import subprocess
+    
+    info = ffmpeg_info()
+    download_path = job['path']
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    probe = job.get('probe')
+    input_args = []
+    for input_url in inputs:
+        input_args += ffcaps.input_options(info, input_url, is_hls_url(input_url), job.get('profile'))
+        if probe and probe.get('streams') and input_url.lower().startswith(('http://', 'https://')):
+            # The probe already identified the streams
+            import streamprobe
+            input_args += streamprobe.FAST_PROBE_ARGS
+        input_args += ['-i', input_url]
+    strategy = job['output_strategy'] = output.choose(job['output'], job.get('expected_size'))
+    # Only network reads count against the bandwidth cap, not a local remux
+    job['network_input'] = any(input_url.lower().startswith(('http://', 'https://')) for input_url in inputs)
+    
+    log_message(f"\n[INFO] URL: {job['url']}", job_id=job['job_id'])
+    log_message(f"[INFO] Output: {download_path} ({strategy})", job_id=job['job_id'])
+    log_message(f"[INFO] FFmpeg path: {FFMPEG_PATH} (version {info['version']})", job_id=job['job_id'])
+    log_message(f"[INFO] Platform: {platform.system()}", job_id=job['job_id'])
+    
+    # Start FFmpeg with proper configuration
+    ffmpeg_cmd = [
+        FFMPEG_PATH,
+        '-loglevel', 'info',
+        '-y', 
+        *input_args,
+        *map_args,
+        '-c', 'copy', 
+        *output.ffmpeg_args(strategy),
+        '-progress', 'pipe:1',
+        '-nostats',
+        download_path
+    ]
+    
+    # Platform-specific process creation
+    # stdout carries -progress key=value blocks, stderr the input info
+    popen_kwargs = {
+        'stdout': subprocess.PIPE,
+        'stderr': subprocess.PIPE,
+        'stdin': subprocess.DEVNULL,
+        'shell': False,
+    }
+    
+    # Windows-specific: Detach FFmpeg from native host process
+    if sys.platform == 'win32':
+        popen_kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        # Unix: Start new process group
+        popen_kwargs['start_new_session'] = True
+
+    process = subprocess.Popen(ffmpeg_cmd, **popen_kwargs)
+    
+    job['process'] = process
+    job['parser'] = FFmpegOutputParser()
+    # A remux after a host-side fetch starts a new phase with its own ETA
+    job['estimator'] = ProgressEstimator()
+    if probe and probe.get('duration') and not probe.get('live'):
+        job['estimator'].duration = probe['duration']
+    job['pid'] = process.pid
+    job['status'] = 'downloading'
+    record_job(job, pid=process.pid, status='downloading', started=time.time())
+    log_message(f"[INFO] FFmpeg started with PID: {job['pid']}", job_id=job['job_id'], pid=job['pid'])
+    
+    # The supervisor keeps the host alive past the browser port until FFmpeg
+    # finishes and the final status is logged
+    supervise_ffmpeg(job)
+    
+    push_event({"event": "started", "job_id": job['job_id'], "pid": job['pid']})
+
+# Choose the variant (and audio rendition) of a master playlist for a job
+def resolve_job_stream(job):
+    import hls
+    import manifest
+    
+    fetcher = hls.SegmentFetcher()
+    try:
+        stream = manifest.resolve_stream(fetcher, job['url'], manifest_cache(),
+                                         job['variant_policy'], job['max_bandwidth'], job.get('selection'))
+        if stream['variant'] and job['output'] == 'auto' and not job.get('expected_size'):
+            # Size decides the output strategy; the engines read this
+            # playlist next anyway, so it is a cache hit for them
+            import output
+            playlist = manifest_cache().fetch(fetcher, stream['media_url'])
+            job['expected_size'] = output.estimate_hls_size(playlist, stream['variant'].get('bandwidth'))
+    finally:
+        fetcher.close()
+    if stream['variant']:
+        log_message(f"[INFO] Job {job['job_id']}: variant {stream['program']} {stream['variant']} ({job['variant_policy']})", job_id=job['job_id'])
+    elif stream['rendition']:
+        log_message(f"[INFO] Job {job['job_id']}: audio rendition {stream['rendition']}", job_id=job['job_id'])
+    job['stream'] = stream
+    return stream
+
+# Run FFmpeg on an HLS URL, mapping only the chosen variant's program
+def run_ffmpeg_job(job):
+    import selection
+    inputs = job['url']
+    probe = job.get('probe')
+    chosen = job.get('selection')
+    # The variant is resolved from the job's own URL, which carries the
+    # freshest signature; a probe (possibly made under an older one) only
+    # adds what it learned about the streams
+    try:
+        stream = resolve_job_stream(job)
+    except Exception as e:
+        # FFmpeg can still open the playlist itself with its default choice
+        log_message(f"[WARN] Manifest lookup failed for job {job['job_id']}: {e}", job_id=job['job_id'])
+        stream = None
+    streams = probed_streams(probe, stream)
+    if stream and (probe or chosen or stream['audio_url']) and (stream['variant'] or stream['rendition']):
+        # Open only the chosen media playlist (and audio rendition), so
+        # FFmpeg reads neither the other variants nor the renditions it
+        # would add to the variant's program
+        inputs = [stream['media_url']] + ([stream['audio_url']] if stream['audio_url'] else [])
+        map_args = selection.map_args(chosen, bool(stream['audio_url']), streams) or ['-map', '0:v?', '-map', '0:a?']
+    elif stream and stream['program'] is not None:
+        # Video and audio only: ID3 timed metadata and WebVTT in the
+        # program cannot be copied into MP4
+        program = stream['program']
+        map_args = ['-map', f"0:p:{program}:v?", '-map', f"0:p:{program}:a?"]
+    else:
+        map_args = selection.map_args(chosen, streams=streams)
+    
+    try:
+        launch_ffmpeg(job, inputs, map_args)
+    except Exception as e:
+        log_message(f"[ERROR] FFmpeg failed to start for job {job['job_id']}: {e}", job_id=job['job_id'])
+        job['status'] = 'failed'
+        job['error_message'] = str(e)
+        finish_job(job)
+
+# HELPER: A probe's per-stream details, if it looked at the same playlists
+# the job opens (the variant may differ once the master is fetched again)
+def probed_streams(probe, stream):
+    if not probe or not probe.get('streams'):
         return None
-    except:
+    probed = probe.get('stream')
+    opened = stream if stream and (stream['variant'] or stream['rendition']) else None
+    probed = probed if probed and (probed['variant'] or probed['rendition']) else None
+    if (opened is None) != (probed is None):
         return None
+    if opened and (probed['program'], probed['rendition']) != (opened['program'], opened['rendition']):
+        return None
+    return probe['streams']
 
-def main():
+# HELPER: Rate-limited progress events for jobs fetched by the host itself
+def fetch_progress_reporter(job):
+    last_event = [0]
+    
+    def report(final=False):
+        now = time.time()
+        if final or now - last_event[0] >= PROGRESS_EVENT_INTERVAL:
+            last_event[0] = now
+            event = {"event": "progress", "job_id": job['job_id'], "pid": None, "phase": "fetch"}
+            event.update(progress_fields(job))
+            push_event(event)
+    return report
+
+# Fetch HLS segments in parallel, then hand the local file to FFmpeg
+def run_hls_job(job):
+    import hls
+    
+    workers = job['profile'].get('workers') or HLS_WORKERS or hls.DEFAULT_WORKERS
+    fetch_path = job['path'] + '.part'
+    job['temp_files'].append(fetch_path)
+    report = fetch_progress_reporter(job)
+    
+    def on_progress(done, total, written):
+        job['progress'] = {"downloaded": written, "segments_done": done, "segments_total": total}
+        job['estimator'].update(written, fraction=done / total if total else None)
+        report(final=done == total)
+    
+    def on_checkpoint(checkpoint):
+        job_journal().update(job['job_key'], part_path=fetch_path, **checkpoint)
+    
+    resume = job['resume']
+    if resume and resume.get('segments_done'):
+        log_message(f"[INFO] Resuming HLS job {job['job_id']} at segment {resume['segments_done']}/{resume.get('segment_count')}", job_id=job['job_id'])
+    log_message(f"[INFO] HLS engine fetching {job['url']} with {workers} workers", job_id=job['job_id'])
+    audio_path = None
     try:
-        msg = get_message()
-        
-        if msg is None:
-            sys.exit(0)
-        
-        command = msg.get('command')
-        
-        # Handle get-progress command - check file size on disk
-        if command == 'get-progress':
-            pid = msg.get('pid')
-            filename = msg.get('filename', '')
-            
-            # Try to find the file in Downloads folder
-            downloads = str(Path.home() / "Downloads")
-            
-            # If filename provided, use it directly
-            if filename:
-                download_path = os.path.join(downloads, filename)
-                if os.path.exists(download_path):
-                    file_size = os.path.getsize(download_path)
-                    send_message({
-                        "status": "progress",
-                        "pid": pid,
-                        "downloaded": file_size,
-                        "estimated_total": 0
-                    })
-                    sys.exit(0)
-            
-            # File not found
-            send_message({"status": "error", "message": "File not found"})
-            sys.exit(0)
-        
-        # Handle kill command - kill FFmpeg process by PID
-        if command == 'kill':
-            pid = msg.get('pid')
-            log_message(f"[INFO] Kill request for PID: {pid}")
-            
-            try:
-                os.kill(pid, signal.SIGTERM)
-                log_message(f"[SUCCESS] Process {pid} terminated")
-                send_message({"status": "killed", "pid": pid})
-            except ProcessLookupError:
-                log_message(f"[WARNING] Process {pid} not found (already finished)")
-                send_message({"status": "killed", "pid": pid})
-            except Exception as e:
-                log_message(f"[ERROR] Failed to kill process {pid}: {str(e)}")
-                send_message({"status": "error", "message": f"Failed to kill: {str(e)}"})
-            sys.exit(0)
-        
-        # Handle download command (default)
-        url = msg.get('url')
-        filename = msg.get('filename', '')
-        
-        if not url:
-            send_message({"status": "error", "message": "No URL provided"})
-            sys.exit(1)
-        
-        # If no filename provided, try to extract from URL
-        if not filename or filename == 'output.mp4':
-            extracted = extract_title_from_url(url)
-            if extracted:
-                filename = extracted
-            else:
-                filename = 'output.mp4'
-        
+        stream = resolve_job_stream(job)
+        throttle = LIMITER.throttle_for(job['job_id'], job['cancel'])
+        written = hls.download_hls(stream['media_url'], fetch_path, workers=workers,
+                                   on_progress=on_progress, cancel=job['cancel'],
+                                   resume=resume, on_checkpoint=on_checkpoint,
+                                   cache=manifest_cache(), throttle=throttle)
+        if stream['audio_url']:
+            # The variant's audio lives in a separate rendition playlist
+            audio_path = job['path'] + '.audio.part'
+            job['temp_files'].append(audio_path)
+            written += hls.download_hls(stream['audio_url'], audio_path, workers=workers,
+                                        cancel=job['cancel'], cache=manifest_cache(), throttle=throttle)
+    except hls.UnsupportedPlaylist as e:
+        log_message(f"[INFO] HLS engine falling back to FFmpeg: {e}", job_id=job['job_id'])
+        remove_file(fetch_path)
+        job['engine'] = 'ffmpeg'
+        job_journal().update(job['job_key'], engine='ffmpeg')
+        try:
+            import selection
+            choose_profile(job)
+            launch_ffmpeg(job, job['url'], selection.map_args(job.get('selection')))
+        except Exception as e:
+            log_message(f"[ERROR] FFmpeg fallback failed to start for job {job['job_id']}: {e}", job_id=job['job_id'])
+            job['status'] = 'failed'
+            job['error_message'] = str(e)
+            finish_job(job)
+        return
+    except hls.DownloadCancelled:
+        log_message(f"[INFO] HLS job {job['job_id']} stopped during fetch", job_id=job['job_id'])
+        finish_job(job)
+        return
+    except Exception as e:
+        # The .part file and journal stay behind so a retry resumes here
+        log_message(f"[ERROR] HLS fetch failed for job {job['job_id']}: {e}", job_id=job['job_id'])
+        job['status'] = 'failed'
+        job['error_message'] = str(e)
+        finish_job(job)
+        return
+    
+    log_message(f"[INFO] HLS fetch complete: {written / (1024*1024):.2f} MB, remuxing", job_id=job['job_id'])
+    job['expected_size'] = written
+    if job['cancel'].is_set():
+        finish_job(job)
+        return
+    try:
+        import selection
+        chosen = job.get('selection')
+        if chosen:
+            # Languages were chosen by rendition; the fetched segments may
+            # carry no language metadata to match again
+            chosen = dict(chosen, languages=[])
+        if audio_path:
+            launch_ffmpeg(job, [fetch_path, audio_path], selection.map_args(chosen, True))
+        else:
+            launch_ffmpeg(job, fetch_path, selection.map_args(chosen))
+    except Exception as e:
+        log_message(f"[ERROR] Remux failed to start for job {job['job_id']}: {e}", job_id=job['job_id'])
+        job['status'] = 'failed'
+        job['error_message'] = str(e)
+        finish_job(job)
+
+# Fetch a progressive file over parallel range requests (no FFmpeg needed)
+def run_range_job(job):
+    import hls
+    import ranged
+    
+    connections = job['profile'].get('connections') or RANGE_CONNECTIONS or ranged.DEFAULT_CONNECTIONS
+    fetch_path = job['path'] + '.part'
+    job['temp_files'].append(fetch_path)
+    report = fetch_progress_reporter(job)
+    
+    def on_progress(downloaded, total):
+        job['progress'] = {"downloaded": downloaded}
+        job['estimator'].total_bytes = total
+        job['estimator'].update(downloaded)
+        report()
+    
+    def on_checkpoint(checkpoint):
+        job_journal().update(job['job_key'], part_path=fetch_path, **checkpoint)
+    
+    log_message(f"[INFO] Range engine fetching {job['url']} with {connections} connections", job_id=job['job_id'])
+    try:
+        size = ranged.download_ranged(job['url'], fetch_path, connections=connections,
+                                      on_progress=on_progress, cancel=job['cancel'],
+                                      resume=job['resume'], on_checkpoint=on_checkpoint,
+                                      throttle=LIMITER.throttle_for(job['job_id'], job['cancel']))
+        os.replace(fetch_path, job['path'])
+    except hls.DownloadCancelled:
+        log_message(f"[INFO] Range job {job['job_id']} stopped", job_id=job['job_id'])
+        finish_job(job)
+        return
+    except Exception as e:
+        log_message(f"[ERROR] Range fetch failed for job {job['job_id']}: {e}", job_id=job['job_id'])
+        job['status'] = 'failed'
+        job['error_message'] = str(e)
+        finish_job(job)
+        return
+    
+    if job['status'] == 'downloading':
+        job['status'] = 'finished'
+    job['progress'] = {"downloaded": size}
+    job['estimator'].update(size, fraction=1.0)
+    report(final=True)
+    log_message(f"[COMPLETE] Job {job['job_id']}: {size / (1024*1024):.2f} MB via range requests", job_id=job['job_id'])
+    finish_job(job)
+
+# HELPER: Does the URL point at an HLS playlist
+def is_hls_url(url):
+    from urllib.parse import urlparse
+    return urlparse(url).path.lower().endswith('.m3u8')
+
+# Pick a concrete engine for "auto" from the URL's file type
+def resolve_engine(engine, url, selective=False, output_strategy='auto'):
+    if engine == 'range' and (selective or output_strategy not in ('auto', 'faststart')):
+        # Range requests copy the file byte for byte; dropping streams or
+        # changing the container takes FFmpeg
+        return 'ffmpeg'
+    if engine != 'auto':
+        return engine
+    from urllib.parse import urlparse
+    path = urlparse(url).path.lower()
+    if is_hls_url(url):
+        return 'hls'
+    if path.endswith(PROGRESSIVE_EXTENSIONS) and not selective and output_strategy in ('auto', 'faststart'):
+        return 'range'
+    return 'ffmpeg'
+
+# Start a job once the scheduler gives it a slot
+def start_download(job):
+    job['started'] = time.time()
+    choose_profile(job)
+    # A probe made when the stream was detected saves the manifest lookup
+    # and most of FFmpeg's own probing
+    job['probe'] = PROBE_CACHE.get(job['content_key']) if PROBE_CACHE else None
+    if job['probe'] and not job.get('expected_size'):
+        job['expected_size'] = job['probe'].get('size')
+    LIMITER.register(job['job_id'], job['weight'])
+    runners = {'hls': run_hls_job, 'range': run_range_job}
+    if job['engine'] == 'ffmpeg' and is_hls_url(job['url']):
+        # The manifest lookup is network I/O; keep it off the message loop
+        runners['ffmpeg'] = run_ffmpeg_job
+    if job['engine'] in runners:
+        job['status'] = 'downloading'
+        record_job(job, status='downloading', started=job['started'])
+        threading.Thread(target=runners[job['engine']], args=(job,), daemon=False).start()
+        push_event({"event": "started", "job_id": job['job_id'], "pid": None})
+    else:
+        import selection
+        probe = job['probe']
+        launch_ffmpeg(job, job['url'],
+                      selection.map_args(job.get('selection'), streams=probe and probe.get('streams')))
+
+# A queued job that could not be started once its turn came
+def launch_failed(job, error):
+    log_message(f"[ERROR] Job {job['job_id']} failed to start: {error}", job_id=job['job_id'])
+    job['error_message'] = str(error)
+    finish_job(job)
+
+SCHEDULER = DownloadScheduler(MAX_CONCURRENT_DOWNLOADS, start_download, launch_failed)
+LIMITER = BandwidthLimiter(MAX_RATE)
+SUPERVISOR = ProcessSupervisor(
+    on_error=lambda e, process: log_message(f"[ERROR] Monitor callback failed for PID {process.pid}: {e}", pid=process.pid))
+
+# Job store and journals, opened by the first command that reads or writes
+# jobs; commands like subscribe or limit never touch SQLite
+STORE = None
+JOURNAL = None
+_store_lock = threading.Lock()
+
+def job_store():
+    global STORE
+    with _store_lock:
+        if STORE is None:
+            from jobstore import JobStore
+            logs_dir()
+            STORE = JobStore(JOBS_DB)
+            # Jobs whose host died mid-download are settled now, not left
+            # "downloading"
+            orphans = STORE.mark_orphans(pid_alive)
+            if orphans:
+                log_message(f"[INFO] Marked {orphans} jobs from a previous host run as interrupted")
+        return STORE
+
+def job_journal():
+    global JOURNAL
+    with _store_lock:
+        if JOURNAL is None:
+            JOURNAL = JobJournal(JOURNAL_DIR)
+        return JOURNAL
+
+# Parsed manifests shared by every job; created with the first HLS job
+MANIFEST_CACHE = None
+_manifest_cache_lock = threading.Lock()
+
+def manifest_cache():
+    global MANIFEST_CACHE
+    with _manifest_cache_lock:
+        if MANIFEST_CACHE is None:
+            import manifest
+            MANIFEST_CACHE = manifest.ManifestCache()
+        return MANIFEST_CACHE
+
+# Faststart remuxes for "deferred" jobs; created with the first one
+REMUXER = None
+_remuxer_lock = threading.Lock()
+
+def deferred_remuxer():
+    global REMUXER
+    with _remuxer_lock:
+        if REMUXER is None:
+            import output
+            REMUXER = output.DeferredRemuxer(on_done=remux_done)
+        return REMUXER
+
+def remux_done(path, ok, error):
+    record = job_store().by_path(path)
+    job_id = record['job_id'] if record else None
+    if ok:
+        log_message(f"[INFO] Faststart remux of {path} done", job_id=job_id)
+        if record:
+            # Keeps the completed-download index matching the file on disk
+            job_store().update(job_id, bytes=os.path.getsize(path))
+    else:
+        log_message(f"[WARN] Faststart remux of {path} failed, keeping the fragmented file: {error}", job_id=job_id)
+    push_event({"event": "remuxed", "job_id": job_id, "path": path, "ok": ok, "error": error})
+
+# URL canonicalization rules; loaded with the first download
+CANONICAL_RULES = None
+_canonical_rules_lock = threading.Lock()
+
+def canonical_rules():
+    global CANONICAL_RULES
+    with _canonical_rules_lock:
+        if CANONICAL_RULES is None:
+            import canonical
+            CANONICAL_RULES = canonical.DEFAULT_RULES
+            if CANONICAL_RULES_FILE:
+                try:
+                    CANONICAL_RULES = canonical.Rules.load(CANONICAL_RULES_FILE)
+                except (OSError, ValueError) as e:
+                    log_message(f"[WARN] Ignoring canonical rules in {CANONICAL_RULES_FILE}: {e}")
+        return CANONICAL_RULES
+
+# HELPER: Reply for a request whose stream is already being fetched, or
+# is already on disk, instead of downloading it a second time
+def duplicate_reply(content_key, url):
+    import jobstore
+    job = job_for_content(content_key)
+    if job is not None:
+        if job['status'] == 'queued':
+            # Not fetching yet: the newest URL carries the freshest signature
+            job['url'] = url
+            record_job(job, url=url)
+        log_message(f"[INFO] Attached duplicate request to job {job['job_id']}", job_id=job['job_id'])
+        return {
+            "status": "success",
+            "job_id": job['job_id'],
+            "pid": job['pid'],
+            "path": job['path'],
+            "filename": os.path.basename(job['path']),
+            "queue_position": SCHEDULER.position(job),
+            "resumed": False,
+            "attached": True,
+        }
+    
+    record = job_store().by_content_key(content_key, jobstore.ACTIVE_STATUSES)
+    if record and record['host_pid'] != os.getpid() and record['host_pid'] and pid_alive(record['host_pid']):
+        # Running in another host process (a one-shot host, or an older one)
+        return {
+            "status": "success",
+            "job_id": record['job_id'],
+            "pid": record['pid'],
+            "path": record['output_path'],
+            "filename": os.path.basename(record['output_path']),
+            "queue_position": None,
+            "resumed": False,
+            "attached": True,
+        }
+    
+    record = job_store().by_content_key(content_key, ('finished',))
+    if record:
+        try:
+            size = os.path.getsize(record['output_path'])
+        except OSError:
+            size = None
+        # A file that was deleted or replaced since is downloaded again
+        if size and size == record['bytes']:
+            log_message(f"[INFO] {url} is already downloaded to {record['output_path']}", job_id=record['job_id'])
+            return {
+                "status": "exists",
+                "job_id": record['job_id'],
+                "path": record['output_path'],
+                "filename": os.path.basename(record['output_path']),
+                "size": size,
+                "finished": record['finished'],
+            }
+    return None
+
+# Per-CDN history (see cdnprofile.py), in the job store's database;
+# opened with the first job
+PROFILES = None
+_profiles_lock = threading.Lock()
+
+def cdn_profiles():
+    global PROFILES
+    with _profiles_lock:
+        if PROFILES is None:
+            import cdnprofile
+            logs_dir()
+            PROFILES = cdnprofile.ProfileStore(JOBS_DB)
+        return PROFILES
+
+# Pick the settings a job's engine starts with on its origin
+def choose_profile(job):
+    import cdnprofile
+    parallel = 0
+    if job['engine'] == 'hls':
+        import hls
+        parallel = HLS_WORKERS or hls.DEFAULT_WORKERS
+    elif job['engine'] == 'range':
+        import ranged
+        parallel = RANGE_CONNECTIONS or ranged.DEFAULT_CONNECTIONS
+    options = cdnprofile.candidates(job['engine'], parallel)
+    if CDN_PROFILES and job.get('cdn'):
+        job['profile'], reason = cdn_profiles().choose(job['cdn'], job['engine'], options)
+    else:
+        job['profile'], reason = options[0], 'default'
+    if reason != 'default':
+        log_message(f"[INFO] Job {job['job_id']}: {job['cdn']} profile {job['profile']} ({reason})", job_id=job['job_id'])
+
+# Handle profiles command - report (or forget) what was learned per CDN
+def handle_profiles(msg):
+    store = cdn_profiles()
+    if msg.get('forget'):
+        return {"status": "forgotten", "removed": store.forget(msg['forget'])}
+    hosts = [msg['host']] if msg.get('host') else store.hosts()
+    return {"status": "profiles", "enabled": CDN_PROFILES,
+            "profiles": {host: store.stats(host) for host in hosts}}
+
+# Ahead-of-time stream probes (see streamprobe.py); created with the first one
+PROBE_CACHE = None
+_probe_cache_lock = threading.Lock()
+
+def probe_cache():
+    global PROBE_CACHE
+    with _probe_cache_lock:
+        if PROBE_CACHE is None:
+            import streamprobe
+            PROBE_CACHE = streamprobe.ProbeCache(on_done=probe_done)
+        return PROBE_CACHE
+
+def probe_done(key, info, error):
+    if error:
+        log_message(f"[WARN] Probe {key} failed: {error}")
+    push_event({"event": "probed", "key": key, "error": error, "probe": info})
+
+# Probe a stream the way a download would open it: manifest (or headers)
+# first, then `ffmpeg -i` on each input FFmpeg would be given
+def run_probe(url, variant_policy, max_bandwidth, stream_selection=None):
+    import ffcaps
+    import hls
+    import subprocess
+    import streamprobe
+    
+    fetcher = hls.SegmentFetcher()
+    try:
+        info = streamprobe.probe_manifest(fetcher, url, manifest_cache(), variant_policy, max_bandwidth,
+                                          stream_selection)
+    finally:
+        fetcher.close()
+    stream = info['stream']
+    if stream and (stream['variant'] or stream['rendition']):
+        targets = [stream['media_url'], stream['audio_url']]
+    else:
+        targets = [url]
+    caps = ffmpeg_info()
+    if FFMPEG_PATH:
+        try:
+            results = [streamprobe.probe_with_ffmpeg(
+                           FFMPEG_PATH, target, ffcaps.input_options(caps, target, is_hls_url(target)))
+                       for target in targets if target]
+            streamprobe.merge_ffmpeg_info(info, results)
+        except (OSError, subprocess.SubprocessError) as e:
+            log_message(f"[WARN] FFmpeg probe of {url} failed: {e}")
+    return info
+
+# Handle probe command - identify a stream before anyone asks to download it
+def handle_probe(msg):
+    url = msg.get('url')
+    if not url:
+        return {"status": "error", "message": "No URL provided"}
+    import canonical
+    import manifest
+    import selection
+    variant_policy = msg.get('variant_policy') or DEFAULT_VARIANT_POLICY or manifest.DEFAULT_POLICY
+    if variant_policy not in manifest.POLICIES:
+        return {"status": "error", "message": f"Unknown variant policy: {variant_policy}"}
+    try:
+        stream_selection = selection.parse(msg.get('select'))
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    max_bandwidth = msg.get('max_bandwidth')
+    key = canonical.content_key(url, variant_policy, max_bandwidth, canonical_rules(),
+                                selection.key(stream_selection))
+    cache = probe_cache()
+    info = cache.get(key)
+    if info is None and msg.get('wait'):
+        info = run_probe(url, variant_policy, max_bandwidth, stream_selection)
+        cache.put(key, info)
+    if info is not None:
+        return dict(info, status="probed", key=key)
+    # The result is pushed as a "probed" event and kept for the download
+    cache.submit(key, lambda: run_probe(url, variant_policy, max_bandwidth, stream_selection))
+    return {"status": "probing", "key": key}
+
+# Handle download command (default)
+def handle_download(msg):
+    url = msg.get('url')
+    filename = msg.get('filename', '')
+    
+    if not url:
+        return {"status": "error", "message": "No URL provided"}
+    
+    # The same stream under rotated auth/token parameters is one download;
+    # "force" fetches it again regardless
+    import canonical
+    import manifest
+    import selection
+    from urllib.parse import urlsplit
+    variant_policy = msg.get('variant_policy') or DEFAULT_VARIANT_POLICY or manifest.DEFAULT_POLICY
+    try:
+        stream_selection = selection.parse(msg.get('select'))
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    rules = canonical_rules()
+    content_key = canonical.content_key(url, variant_policy, msg.get('max_bandwidth'), rules,
+                                        selection.key(stream_selection))
+    if not msg.get('force'):
+        reply = duplicate_reply(content_key, url)
+        if reply is not None:
+            return reply
+    
+    # If no filename provided, try to extract from URL
+    if not filename or filename == 'output.mp4':
+        extracted = extract_title_from_url(url)
+        if extracted:
+            filename = extracted
+        else:
+            filename = 'output.mp4'
+    
+    # Output strategy; the filename's container can imply one
+    import output
+    output_strategy = output.requested(msg.get('output') or DEFAULT_OUTPUT, filename)
+    if output_strategy not in output.STRATEGIES + (output.DEFAULT_STRATEGY,):
+        return {"status": "error", "message": f"Unknown output strategy: {output_strategy}"}
+    
+    # The engine decides the container: a range job keeps the source's,
+    # FFmpeg writes the strategy's
+    engine = resolve_engine(msg.get('engine') or DEFAULT_ENGINE, url, stream_selection is not None,
+                            output_strategy)
+    if engine == 'range':
+        filename = range_filename(filename, url)
+    else:
         # Ensure filename has extension
         if not filename.lower().endswith(('.mp4', '.mkv', '.m3u8', '.ts')):
             filename += '.mp4'
-        
-        # Determine path
-        downloads = str(Path.home() / "Downloads")
-        download_path = os.path.join(downloads, filename)
-        
-        # Avoid overwriting files
-        if os.path.exists(download_path):
-            name, ext = os.path.splitext(filename)
-            counter = 1
-            while os.path.exists(os.path.join(downloads, f"{name}_{counter}{ext}")):
-                counter += 1
-            download_path = os.path.join(downloads, f"{name}_{counter}{ext}")
-        
-        log_message(f"\n[INFO] URL: {url}")
-        log_message(f"[INFO] Output: {download_path}")
-        log_message(f"[INFO] FFmpeg path: {FFMPEG_PATH}")
-        log_message(f"[INFO] Platform: {platform.system()}")
-        
-        # Start FFmpeg with proper configuration
-        ffmpeg_cmd = [
-            FFMPEG_PATH,
-            '-loglevel', 'info',
-            '-y', 
-            '-i', url, 
-            '-c', 'copy', 
-            '-movflags', '+faststart',
-            download_path
-        ]
-        
-        # Platform-specific process creation
-        popen_kwargs = {
-            'stdout': subprocess.DEVNULL,
-            'stderr': subprocess.DEVNULL,
-            'stdin': subprocess.DEVNULL,
-            'shell': False,
-        }
-        
-        # Windows-specific: Detach FFmpeg from native host process
-        if sys.platform == 'win32':
-            popen_kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
-        else:
-            # Unix: Start new process group
-            popen_kwargs['start_new_session'] = True
+        filename = output.filename_for(output_strategy, filename)
+    
+    # Determine path
+    downloads = DOWNLOADS_DIR
+    download_path = os.path.join(downloads, filename)
+    
+    # A journal left by an interrupted attempt at the same job resumes it
+    # in place instead of starting over under a new name
+    job_key = JobJournal.key_for(canonical.canonical(url, rules), filename)
+    record = job_journal().load(job_key)
+    if record and job_for_key(job_key) is None:
+        download_path = record['path']
+        log_message(f"[INFO] Resuming interrupted job {job_key} into {download_path}")
+    else:
+        record = None
+    
+    # Avoid overwriting files, including ones still waiting in the queue
+    if record is None and path_in_use(download_path):
+        name, ext = os.path.splitext(filename)
+        counter = 1
+        while path_in_use(os.path.join(downloads, f"{name}_{counter}{ext}")):
+            counter += 1
+        download_path = os.path.join(downloads, f"{name}_{counter}{ext}")
+    
+    job = {
+        "job_id": new_job_id(),
+        "pid": None,
+        "url": url,
+        "path": download_path,
+        "status": "queued",
+        "process": None,
+        "progress": {},
+        "estimator": ProgressEstimator(),
+        "stderr_tail": [],
+        "engine": resolve_engine(msg.get('engine') or (record and record['engine']) or DEFAULT_ENGINE, url,
+                                 stream_selection is not None, output_strategy),
+        "cancel": threading.Event(),
+        "temp_files": [],
+        "job_key": job_key,
+        "resume": record,
+        "variant_policy": variant_policy,
+        "max_bandwidth": msg.get('max_bandwidth'),
+        "stream": None,
+        "selection": stream_selection,
+        "weight": float(msg.get('weight', 1)),
+        "output": output_strategy,
+        "output_strategy": None,
+        "expected_size": msg.get('expected_size'),
+        "content_key": content_key,
+        "probe": None,
+        "cdn": (urlsplit(url).hostname or '').lower(),
+        "profile": None,
+    }
+    if job['engine'] not in ENGINES:
+        return {"status": "error", "message": f"Unknown engine: {job['engine']}"}
+    if job['variant_policy'] not in manifest.POLICIES:
+        return {"status": "error", "message": f"Unknown variant policy: {job['variant_policy']}"}
+    if job['weight'] <= 0:
+        return {"status": "error", "message": "weight must be positive"}
+    with JOBS_LOCK:
+        JOBS[job['job_id']] = job
+    job_store().add(job['job_id'], url, download_path, job_key=job_key, engine=job['engine'],
+              content_key=content_key)
+    
+    job_journal().save(dict(record or {}, job_key=job_key, url=url, filename=filename,
+                      path=download_path, engine=job['engine'], status='running'))
+    
+    queue_position = SCHEDULER.submit(job, priority=int(msg.get('priority', 0)))
+    if job.get('error'):
+        with JOBS_LOCK:
+            JOBS.pop(job['job_id'], None)
+        job_store().update(job['job_id'], status='failed', error=str(job['error']), finished=time.time())
+        if record is None:
+            job_journal().remove(job_key)
+        raise job['error']
+    
+    # Respond immediately - FFmpeg runs independently (or waits its turn)
+    return {
+        "status": "success", 
+        "job_id": job['job_id'],
+        "pid": job['pid'], 
+        "path": download_path,
+        "filename": os.path.basename(download_path),
+        "queue_position": queue_position,
+        "resumed": record is not None
+    }
 
-        process = subprocess.Popen(ffmpeg_cmd, **popen_kwargs)
-        
-        pid = process.pid
-        log_message(f"[INFO] FFmpeg started with PID: {pid}")
-        
-        # Send response immediately - FFmpeg runs independently
-        send_message({
-            "status": "success", 
-            "pid": pid, 
-            "path": download_path,
-            "filename": os.path.basename(download_path)
-        })
-        
-        # Monitor progress in background thread (logs every 5 seconds)
-        def monitor_download(pid, path):
-            import time
-            import psutil
-            
-            start_time = time.time()
-            last_size = 0
-            
-            while True:
-                time.sleep(5)
-                
-                # Check if FFmpeg process is still running
-                try:
-                    proc = psutil.Process(pid)
-                    if proc.status() == psutil.STATUS_ZOMBIE or not proc.is_running():
-                        break
-                except psutil.NoSuchProcess:
-                    break
-                
-                # Get current file size
-                try:
-                    if os.path.exists(path):
-                        current_size = os.path.getsize(path)
-                        elapsed = time.time() - start_time
-                        
-                        # Calculate speed (bytes per second over last 5 sec interval)
-                        speed = (current_size - last_size) / 5 if last_size > 0 else current_size / elapsed
-                        speed_mbps = (speed * 8) / (1024 * 1024)  # Convert to Mbps
-                        
-                        size_mb = current_size / (1024 * 1024)
-                        
-                        log_message(f"[PROGRESS] PID {pid}: {size_mb:.2f} MB downloaded | Speed: {speed_mbps:.2f} Mbps | Elapsed: {int(elapsed)}s")
-                        
-                        last_size = current_size
-                except Exception as e:
-                    log_message(f"[WARN] Progress check failed: {e}")
-            
-            # Final status
-            try:
-                if os.path.exists(path):
-                    final_size = os.path.getsize(path)
-                    total_time = time.time() - start_time
-                    avg_speed = (final_size * 8) / (total_time * 1024 * 1024) if total_time > 0 else 0
-                    log_message(f"[COMPLETE] PID {pid}: {final_size / (1024*1024):.2f} MB | Total time: {int(total_time)}s | Avg speed: {avg_speed:.2f} Mbps")
-                else:
-                    log_message(f"[ERROR] PID {pid}: Download failed - file not found")
-            except Exception as e:
-                log_message(f"[ERROR] PID {pid}: Final check failed: {e}")
-        
-        # Start monitor thread (non-daemon to keep process alive)
-        monitor_thread = threading.Thread(target=monitor_download, args=(pid, download_path), daemon=False)
-        monitor_thread.start()
-        
-        # Wait for monitor to complete (keeps host alive while monitoring)
-        monitor_thread.join()
-        
+# Handle subscribe command - enable pushed progress events on this port;
+# the reply tells the extension which URL parameters canonical.py strips,
+# so its stream catalog keys streams the same way
+def handle_subscribe(msg):
+    EVENTS_ENABLED.set()
+    return {"status": "subscribed", "strip": list(canonical_rules().strip)}
+
+COMMANDS = {
+    'download': handle_download,
+    'get-progress': handle_get_progress,
+    'get-progress-batch': handle_get_progress_batch,
+    'kill': handle_kill,
+    'list': handle_list,
+    'subscribe': handle_subscribe,
+    'configure': handle_configure,
+    'limit': handle_limit,
+    'probe': handle_probe,
+    'profiles': handle_profiles,
+    'resume': handle_resume,
+    'cleanup': handle_cleanup,
+}
+
+def handle_message(msg):
+    """Dispatch one message to its command handler and build the reply"""
+    try:
+        handler = COMMANDS.get(msg.get('command') or 'download')
+        if handler is None:
+            reply = {"status": "error", "message": f"Unknown command: {msg.get('command')}"}
+        else:
+            reply = handler(msg)
     except FileNotFoundError as e:
         error_msg = f"FFmpeg not found: {str(e)}"
         log_message(f"[ERROR] {error_msg}")
-        send_message({"status": "error", "message": error_msg})
+        reply = {"status": "error", "message": error_msg}
     except Exception as e:
         error_msg = str(e)
-        log_message(f"\n[ERROR] {error_msg}")
         import traceback
-        log_message(traceback.format_exc())
+        log_message(f"[ERROR] {error_msg}", traceback=traceback.format_exc())
+        reply = {"status": "error", "message": error_msg}
+    
+    # Echo the request id so a connectNative client can match replies
+    if 'id' in msg:
+        reply['id'] = msg['id']
+    return reply
+
+def main():
+    """Serve messages until the browser closes stdin.
+    
+    With runtime.sendNativeMessage the browser sends one message and closes
+    the pipe after the reply; with runtime.connectNative the same loop keeps
+    serving every command over one long-lived port.
+    """
+    while True:
+        try:
+            msg = get_message()
+        except FramingError as e:
+            # The stream is out of step; nothing after this can be trusted
+            log_message(f"[ERROR] Bad frame: {e}")
+            break
+        except ValueError as e:
+            # A whole frame that is not JSON: one bad command must not take
+            # the port and every running download down with it
+            log_message(f"[ERROR] Bad message: {e}")
+            reply = {"status": "error", "message": "Message is not valid JSON"}
+        else:
+            if msg is None:
+                break
+            reply = handle_message(msg)
+        
         try:
-            send_message({"status": "error", "message": error_msg})
-        except:
-            pass
+            send_message(reply)
+        except (BrokenPipeError, OSError):
+            # Browser went away - let running monitors finish logging
+            break
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+Asynchronous buffered JSON-lines logger for the native host
+
+Callers only put a record on a bounded queue, so progress ticks and
+per-segment events never wait on the disk. One background thread drains
+the queue in batches, writes JSON lines and rotates the file by size and
+age. When the queue is full, new records are dropped and counted rather
+than blocking the caller.
+"""
+import atexit
+import datetime
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+DEFAULT_MAX_AGE = 24 * 3600
+DEFAULT_QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.5
+
+LEVEL_PREFIX = re.compile(r'^\s*\[([A-Z]+)\]\s*')
+
+_STOP = object()
+
+
+class AsyncLogger:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT,
+                 max_age=DEFAULT_MAX_AGE, queue_size=DEFAULT_QUEUE_SIZE):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.max_age = max_age
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._opened_at = 0
+        self._thread = threading.Thread(target=self._run, name='host-logger', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, message, level='INFO', **fields):
+        """Queue one record; never blocks"""
+        record = {
+            "ts": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            "level": level,
+            "msg": message,
+            "host_pid": os.getpid(),
+        }
+        record.update((key, value) for key, value in fields.items() if value is not None)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def flush(self, timeout=5):
+        """Wait until everything queued so far is on disk"""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self):
+        if self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=5)
+            except queue.Full:
+                return
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Gather whatever else is already waiting, up to one batch
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < BATCH_SIZE and isinstance(batch[-1], dict):
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if self._write(batch):
+                return
+
+    def _write(self, batch):
+        """Write a batch; returns True once the stop marker is seen"""
+        lines = []
+        waiters = []
+        stop = False
+        for item in batch:
+            if item is _STOP:
+                stop = True
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            else:
+                lines.append(json.dumps(item, default=str))
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            lines.append(json.dumps({"ts": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds'),
+                                     "level": "WARN", "msg": f"Logger dropped {dropped} records", "host_pid": os.getpid()}))
+        try:
+            if lines:
+                self._rotate_if_needed()
+                self._file.write('\n'.join(lines) + '\n')
+                self._file.flush()
+        except OSError:
+            pass
+        for waiter in waiters:
+            waiter.set()
+        if stop and self._file is not None:
+            self._file.close()
+            self._file = None
+        return stop
+
+    def _open(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._opened_at = time.time()
+        if self._file.tell():
+            # Age an existing file from its first record, not from this process
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    first = json.loads(f.readline())
+                self._opened_at = datetime.datetime.fromisoformat(first['ts']).timestamp()
+            except (OSError, ValueError, KeyError, TypeError):
+                self._opened_at = 0
+
+    def _rotate_if_needed(self):
+        if self._file is None:
+            self._open()
+        too_big = self._file.tell() >= self.max_bytes
+        too_old = self.max_age and time.time() - self._opened_at >= self.max_age
+        if not (too_big or too_old) or not self._file.tell():
+            return
+        self._file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+
+def split_level(message, default='INFO'):
+    """'[WARN] text' -> ('WARN', 'text') for the host's existing log calls"""
+    match = LEVEL_PREFIX.match(message)
+    if match:
+        return match.group(1), message[match.end():]
+    return default, message.strip()
@@ -12,6 +12,8 @@ import shutil
 import platform
 import subprocess
 import argparse
+import tempfile
+import zipapp
 from pathlib import Path
 
 # Colors for terminal output
@@ -124,29 +126,64 @@ def check_python_dependencies():
         subprocess.run([sys.executable, '-m', 'pip', 'install', 'psutil'], check=True)
         print_success("psutil installed successfully")
 
-def create_venv():
-    """Create and setup virtual environment"""
+def host_modules():
+    """The native host's own modules (no tests, benchmarks or installer)"""
+    script_dir = Path(__file__).parent
+    return sorted(path for path in script_dir.glob('*.py')
+                  if not path.name.startswith(('test_', 'bench_')) and path.name != 'install.py')
+
+def precompile_host(python):
+    """Write bytecode for the host so no start pays for compiling source"""
+    modules = [str(path) for path in host_modules()]
+    subprocess.run([str(python), '-m', 'compileall', '-q', *modules], check=True)
+    print_success("Host modules precompiled")
+
+def build_zipapp(python):
+    """Bundle the host's bytecode into host.pyz (start_host.* prefer it)"""
+    target = Path(__file__).parent / 'host.pyz'
+    with tempfile.TemporaryDirectory() as build_dir:
+        for module in host_modules():
+            shutil.copy(module, build_dir)
+        with open(os.path.join(build_dir, '__main__.py'), 'w') as f:
+            f.write('import host\nhost.main()\n')
+        # Legacy .pyc next to each module: zipimport cannot write caches,
+        # and the bytecode must come from the interpreter that will run it
+        subprocess.run([str(python), '-m', 'compileall', '-q', '-b', build_dir], check=True)
+        zipapp.create_archive(build_dir, target,
+                              filter=lambda path: path.suffix == '.pyc' or path.name == '__main__.py')
+    print_success(f"Host bundle built: {target}")
+    print_info("Re-run with --zipapp after editing the host; the bundle takes precedence over host.py")
+    return target
+
+def create_venv(precompile=False, bundle=False):
+    """Create and setup virtual environment, optionally with a precompiled host"""
     venv_path = Path(__file__).parent / 'venv'
     
-    if venv_path.exists():
-        print_info("Virtual environment already exists")
-        return venv_path
-    
-    print_info("Creating virtual environment...")
-    subprocess.run([sys.executable, '-m', 'venv', str(venv_path)], check=True)
-    print_success("Virtual environment created")
-    
-    # Install requirements
     if platform.system() == 'Windows':
         pip_path = venv_path / 'Scripts' / 'pip'
+        python_path = venv_path / 'Scripts' / 'python.exe'
     else:
         pip_path = venv_path / 'bin' / 'pip'
+        python_path = venv_path / 'bin' / 'python'
     
-    req_file = Path(__file__).parent / 'requirements.txt'
-    if req_file.exists():
-        print_info("Installing requirements...")
-        subprocess.run([str(pip_path), 'install', '-r', str(req_file)], check=True)
-        print_success("Requirements installed")
+    if venv_path.exists():
+        print_info("Virtual environment already exists")
+    else:
+        print_info("Creating virtual environment...")
+        subprocess.run([sys.executable, '-m', 'venv', str(venv_path)], check=True)
+        print_success("Virtual environment created")
+        
+        # Install requirements
+        req_file = Path(__file__).parent / 'requirements.txt'
+        if req_file.exists():
+            print_info("Installing requirements...")
+            subprocess.run([str(pip_path), 'install', '-r', str(req_file)], check=True)
+            print_success("Requirements installed")
+    
+    if precompile:
+        precompile_host(python_path)
+    if bundle:
+        build_zipapp(python_path)
     
     return venv_path
 
@@ -233,6 +270,10 @@ def main():
     parser.add_argument('--extension-id', help='Extension ID (optional, can be set later)')
     parser.add_argument('--venv', action='store_true', help='Create virtual environment')
     parser.add_argument('--check', action='store_true', help='Only check dependencies')
+    parser.add_argument('--precompile', action='store_true',
+                        help='Precompile host bytecode for faster starts')
+    parser.add_argument('--zipapp', action='store_true',
+                        help='Bundle the precompiled host into host.pyz')
     
     args = parser.parse_args()
     
@@ -257,7 +298,13 @@ def main():
     # Create venv if requested
     if args.venv:
         print_header("Setting up Virtual Environment")
-        create_venv()
+        create_venv(precompile=args.precompile, bundle=args.zipapp)
+    elif args.precompile or args.zipapp:
+        print_header("Precompiling Native Host")
+        if args.precompile:
+            precompile_host(sys.executable)
+        if args.zipapp:
+            build_zipapp(sys.executable)
     
     # Install native hosts
     print_header("Installing Native Host")
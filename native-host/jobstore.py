@@ -0,0 +1,155 @@
+"""
+SQLite-backed registry of every download job
+
+Ties job ids to their PID, URL, output path and outcome, so progress and
+kill requests are answered from an indexed lookup instead of trusting a
+filename or PID sent by the extension, and so job history survives host
+restarts.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    job_key     TEXT,
+    url         TEXT NOT NULL,
+    pid         INTEGER,
+    host_pid    INTEGER,
+    output_path TEXT NOT NULL,
+    engine      TEXT,
+    status      TEXT NOT NULL,
+    bytes       INTEGER NOT NULL DEFAULT 0,
+    created     REAL NOT NULL,
+    started     REAL,
+    updated     REAL NOT NULL,
+    finished    REAL,
+    exit_code   INTEGER,
+    error       TEXT,
+    content_key TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_pid ON jobs (pid);
+CREATE INDEX IF NOT EXISTS jobs_output_path ON jobs (output_path);
+"""
+
+# Columns added after the first release, with their definitions; databases
+# created before them get an ALTER TABLE on open
+ADDED_COLUMNS = (
+    ('content_key', 'TEXT'),
+)
+INDEXES = """
+CREATE INDEX IF NOT EXISTS jobs_content_key ON jobs (content_key, status);
+"""
+
+COLUMNS = ('job_id', 'job_key', 'url', 'pid', 'host_pid', 'output_path', 'engine', 'status', 'bytes',
+           'created', 'started', 'updated', 'finished', 'exit_code', 'error', 'content_key')
+
+ACTIVE_STATUSES = ('queued', 'downloading')
+TERMINAL_STATUSES = ('finished', 'failed', 'stopped', 'interrupted')
+
+
+class JobStore:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        existing = {row['name'] for row in self._db.execute('PRAGMA table_info(jobs)')}
+        for name, definition in ADDED_COLUMNS:
+            if name not in existing:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+        self._db.executescript(INDEXES)
+
+    def add(self, job_id, url, output_path, status='queued', **fields):
+        now = time.time()
+        record = dict({"host_pid": os.getpid()}, **fields)
+        record.update(job_id=job_id, url=url, output_path=output_path, status=status,
+                      created=now, updated=now)
+        names = [name for name in COLUMNS if name in record]
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                [record[name] for name in names])
+
+    def update(self, job_id, **fields):
+        fields = {name: value for name, value in fields.items() if name in COLUMNS and name != 'job_id'}
+        fields['updated'] = time.time()
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", [*fields.values(), job_id])
+
+    def _one(self, query, args):
+        with self._lock:
+            row = self._db.execute(query, args).fetchone()
+        return dict(row) if row else None
+
+    def get(self, job_id):
+        return self._one("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+
+    def get_many(self, job_ids):
+        """Records for several job ids in one query (missing ids are skipped)"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return []
+        with self._lock:
+            return [dict(row) for row in self._db.execute(
+                f"SELECT * FROM jobs WHERE job_id IN ({', '.join('?' * len(job_ids))})", job_ids)]
+
+    def by_pid(self, pid):
+        """Most recent job that ran under pid (PIDs get reused)"""
+        return self._one("SELECT * FROM jobs WHERE pid = ? ORDER BY created DESC LIMIT 1", (pid,))
+
+    def by_path(self, output_path):
+        return self._one("SELECT * FROM jobs WHERE output_path = ? ORDER BY created DESC LIMIT 1", (output_path,))
+
+    def by_content_key(self, content_key, statuses=None):
+        """Most recent job for a canonical stream identity, optionally only in statuses"""
+        query = "SELECT * FROM jobs WHERE content_key = ?"
+        args = [content_key]
+        if statuses:
+            query += f" AND status IN ({', '.join('?' * len(statuses))})"
+            args += list(statuses)
+        return self._one(query + " ORDER BY created DESC LIMIT 1", args)
+
+    def list(self, statuses=None, limit=100):
+        query = "SELECT * FROM jobs"
+        args = []
+        if statuses:
+            query += f" WHERE status IN ({', '.join('?' * len(statuses))})"
+            args += list(statuses)
+        query += " ORDER BY created DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._db.execute(query, args)]
+
+    def mark_orphans(self, is_alive):
+        """Settle active jobs whose host and download process are both gone.
+
+        A job whose host is still running (another one-shot host, or the
+        persistent one) is left alone, as is an FFmpeg that outlived its host.
+        """
+        orphans = [job for job in self.list(ACTIVE_STATUSES, limit=-1)
+                   if job['host_pid'] != os.getpid()
+                   and not (job['host_pid'] and is_alive(job['host_pid']))
+                   and not (job['pid'] and is_alive(job['pid']))]
+        for job in orphans:
+            self.update(job['job_id'], status='interrupted', finished=time.time())
+        return len(orphans)
+
+    def cleanup(self, older_than):
+        """Delete finished records last touched more than older_than seconds ago"""
+        cutoff = time.time() - older_than
+        with self._lock:
+            cursor = self._db.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(TERMINAL_STATUSES))}) AND updated < ?",
+                [*TERMINAL_STATUSES, cutoff])
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._db.close()
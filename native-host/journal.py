@@ -0,0 +1,71 @@
+"""
+Durable per-job journal for resumable downloads
+
+Each job gets one small JSON file recording where its output goes and how
+far it got (HLS segments written, bytes in the .part file). The file is
+replaced atomically, so a host, browser or FFmpeg crash leaves either the
+previous checkpoint or the new one, never a torn record.
+"""
+import json
+import os
+import threading
+import time
+
+
+class JobJournal:
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key_for(url, filename):
+        """Stable key so a repeated request for the same job finds its journal"""
+        import hashlib
+        return hashlib.sha1(f"{url}\0{filename}".encode('utf-8')).hexdigest()[:16]
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, record):
+        """Write the record atomically (temp file + fsync + rename)"""
+        record['updated'] = time.time()
+        path = self._path(record['job_key'])
+        temp_path = path + '.tmp'
+        with self._lock:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(record, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+
+    def update(self, key, **fields):
+        record = self.load(key)
+        if record is None:
+            return None
+        record.update(fields)
+        self.save(record)
+        return record
+
+    def remove(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def incomplete(self):
+        """Every journal left behind by a job that did not finish"""
+        records = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.json'):
+                record = self.load(name[:-len('.json')])
+                if record is not None:
+                    records.append(record)
+        return records
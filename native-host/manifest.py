@@ -0,0 +1,169 @@
+"""
+Master playlist variant selection and a parsed-manifest cache
+
+Picks one variant of a master .m3u8 by policy instead of leaving it to
+FFmpeg's defaults, works out which audio rendition goes with it, and keeps
+parsed manifests in a small TTL/LRU cache so retries and resumes do not
+re-fetch them.
+"""
+import collections
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+from canonical import DEFAULT_PORTS
+
+POLICIES = ('max-bandwidth', 'max-resolution', 'bandwidth-cap')
+DEFAULT_POLICY = 'max-bandwidth'
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 64
+
+
+def canonical_url(url):
+    """Normalise scheme/host case, default ports and fragments for cache keys"""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    return urlunsplit((scheme, host, parts.path or '/', parts.query, ''))
+
+
+class ManifestCache:
+    """Parsed playlists keyed on canonical URL, with TTL and LRU eviction"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        key = canonical_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, url, playlist):
+        key = canonical_url(url)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), playlist)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def fetch(self, fetcher, url):
+        """Cached parse of url, fetching it on a miss"""
+        playlist = self.get(url)
+        if playlist is None:
+            import hls
+            playlist = hls.parse_playlist(fetcher.get_text(url), url)
+            # Live media playlists change every target duration; never cache them
+            if playlist['type'] == 'master' or playlist['endlist']:
+                self.put(url, playlist)
+        return playlist
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def resolution(variant):
+    """(width, height) from a RESOLUTION attribute, (0, 0) when absent"""
+    width, _, height = variant.get('RESOLUTION', '').partition('x')
+    if width.isdigit() and height.isdigit():
+        return int(width), int(height)
+    return 0, 0
+
+
+def select_variant(variants, policy=DEFAULT_POLICY, max_bandwidth=None):
+    """Index of the variant chosen by policy"""
+    if not variants:
+        import hls
+        raise hls.UnsupportedPlaylist("Master playlist has no variants")
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown variant policy: {policy}")
+
+    indexed = list(enumerate(variants))
+    if policy == 'max-resolution':
+        def pixels(item):
+            width, height = resolution(item[1])
+            return (width * height, item[1]['bandwidth'])
+        return max(indexed, key=pixels)[0]
+
+    if policy == 'bandwidth-cap' and max_bandwidth:
+        # Best variant under the cap, or the cheapest one if none fit
+        fitting = [item for item in indexed if item[1]['bandwidth'] <= max_bandwidth]
+        if not fitting:
+            return min(indexed, key=lambda item: item[1]['bandwidth'])[0]
+        indexed = fitting
+    return max(indexed, key=lambda item: item[1]['bandwidth'])[0]
+
+
+def audio_rendition(playlist, variant, languages=()):
+    """The separate audio rendition a variant needs, or None if muxed in;
+    the first one in languages if there is one, else the default"""
+    from selection import pick_rendition
+    group = variant.get('AUDIO')
+    if not group:
+        return None
+    renditions = [media for media in playlist['media']
+                  if media.get('TYPE') == 'AUDIO' and media.get('GROUP-ID') == group and media.get('uri')]
+    return pick_rendition(renditions, languages)
+
+
+def resolve_stream(fetcher, url, cache, policy=DEFAULT_POLICY, max_bandwidth=None, selection=None):
+    """Work out what to download for url.
+
+    Returns a dict with media_url (the media playlist to fetch), audio_url
+    (a separate audio rendition, or None), program (the variant index,
+    which is also FFmpeg's HLS program id), variant and rendition.
+    selection (see selection.py) narrows the variants by resolution, picks
+    the audio language, and for audio-only downloads fetches just the audio
+    rendition (rendition is then set and variant is None).
+    """
+    from selection import is_audio_only_variant, pick_rendition, variant_candidates
+    playlist = cache.fetch(fetcher, url)
+    if playlist['type'] != 'master':
+        return {"media_url": url, "audio_url": None, "program": None, "variant": None, "rendition": None}
+
+    variants = playlist['variants']
+    candidates = variant_candidates(variants, selection)
+    index = candidates[select_variant([variants[i] for i in candidates], policy, max_bandwidth)]
+    variant = variants[index]
+    kind = selection['type'] if selection else 'all'
+    languages = selection['languages'] if selection else ()
+    audio = audio_rendition(playlist, variant, languages)
+    if kind == 'audio' and not is_audio_only_variant(variant):
+        if audio is None:
+            audio = pick_rendition([media for media in playlist['media']
+                                    if media.get('TYPE') == 'AUDIO' and media.get('uri')], languages)
+        if audio is not None:
+            return {
+                "media_url": audio['uri'],
+                "audio_url": None,
+                "program": None,
+                "variant": None,
+                "rendition": {key: audio[key] for key in ('NAME', 'LANGUAGE', 'GROUP-ID') if key in audio},
+            }
+    if kind == 'video':
+        audio = None
+    return {
+        "media_url": variant['uri'],
+        "audio_url": audio['uri'] if audio else None,
+        "program": index,
+        "variant": {key: variant[key] for key in ('bandwidth', 'RESOLUTION', 'CODECS') if key in variant},
+        "rendition": None,
+    }
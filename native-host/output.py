@@ -0,0 +1,149 @@
+"""
+Output strategies: how FFmpeg writes the finished file
+
+"faststart" is a regular MP4 with the index (moov) at the front. FFmpeg
+writes the file and then shifts all of it to insert the index, so every byte
+goes to disk twice and the job sits at 100% while that happens. The other
+strategies write each byte once:
+
+  fragmented  MP4 in self-contained fragments, playable while it is written
+  ts          MPEG-TS, the container HLS segments already use
+  mkv         Matroska
+  deferred    fragmented MP4 now, then a faststart remux later in a
+              low-priority background pool, so the download finishes early
+
+"auto" picks faststart for files small enough that the rewrite is cheap and
+fragmented for large or unknown sizes.
+"""
+import os
+import queue
+import sys
+import threading
+
+STRATEGIES = ('faststart', 'fragmented', 'ts', 'mkv', 'deferred')
+DEFAULT_STRATEGY = 'auto'
+# Largest expected size that still gets an in-line faststart rewrite
+FASTSTART_MAX_BYTES = 256 * 1024 * 1024
+
+FRAGMENTED_FLAGS = '+frag_keyframe+empty_moov+default_base_moof'
+EXTENSIONS = {'ts': '.ts', 'mkv': '.mkv'}
+CONTAINER_FOR_EXTENSION = {'.ts': 'ts', '.mkv': 'mkv'}
+
+
+def requested(strategy, filename):
+    """The strategy a job asked for, taking the filename's container into account"""
+    extension = os.path.splitext(filename)[1].lower()
+    if strategy in (None, '', DEFAULT_STRATEGY) and extension in CONTAINER_FOR_EXTENSION:
+        return CONTAINER_FOR_EXTENSION[extension]
+    return strategy or DEFAULT_STRATEGY
+
+
+def filename_for(strategy, filename):
+    """filename with the extension the strategy's container needs"""
+    name, extension = os.path.splitext(filename)
+    wanted = EXTENSIONS.get(strategy, '.mp4')
+    if strategy == DEFAULT_STRATEGY or extension.lower() == wanted:
+        return filename
+    return name + wanted
+
+
+def choose(strategy, expected_size=None):
+    """Concrete strategy for a job: resolves "auto" by expected output size"""
+    if strategy != DEFAULT_STRATEGY:
+        return strategy
+    if expected_size and expected_size <= FASTSTART_MAX_BYTES:
+        return 'faststart'
+    return 'fragmented'
+
+
+def ffmpeg_args(strategy):
+    """Output options for FFmpeg, placed before the output path"""
+    if strategy == 'faststart':
+        return ['-movflags', '+faststart']
+    if strategy in ('fragmented', 'deferred'):
+        return ['-movflags', FRAGMENTED_FLAGS]
+    if strategy == 'ts':
+        return ['-f', 'mpegts']
+    if strategy == 'mkv':
+        return ['-f', 'matroska']
+    raise ValueError(f"Unknown output strategy: {strategy}")
+
+
+def estimate_hls_size(playlist, bandwidth):
+    """Bytes for a VOD media playlist at a variant's BANDWIDTH (bits/s)"""
+    if not bandwidth or not playlist.get('endlist'):
+        return None
+    duration = sum(segment.duration for segment in playlist['segments'])
+    return int(duration * bandwidth / 8) or None
+
+
+def _remux_command(ffmpeg_path, source, target):
+    return [ffmpeg_path, '-loglevel', 'error', '-nostdin', '-y', '-i', source,
+            '-map', '0', '-c', 'copy', '-movflags', '+faststart', target]
+
+
+class DeferredRemuxer:
+    """Faststart remuxes run one after another at low CPU/IO priority.
+
+    The worker thread is non-daemon while it has work, so a host whose
+    browser port closed still finishes the queue before exiting. A remux
+    that fails leaves the fragmented file in place, which is still a valid
+    MP4.
+    """
+
+    def __init__(self, on_done=None, workers=1):
+        # on_done(path, ok, error) after each remux
+        self.on_done = on_done
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._running = 0
+        self.pending = 0
+
+    def submit(self, ffmpeg_path, path):
+        with self._lock:
+            self.pending += 1
+            self._queue.put((ffmpeg_path, path))
+            if self._running < self.workers:
+                self._running += 1
+                threading.Thread(target=self._work, name='faststart-remux', daemon=False).start()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                try:
+                    ffmpeg_path, path = self._queue.get_nowait()
+                except queue.Empty:
+                    self._running -= 1
+                    return
+            ok, error = self.remux(ffmpeg_path, path)
+            with self._lock:
+                self.pending -= 1
+            if self.on_done:
+                self.on_done(path, ok, error)
+
+    def remux(self, ffmpeg_path, path):
+        """Rewrite path as a faststart MP4 in place; (ok, error message)"""
+        import subprocess
+        temp_path = path + '.faststart.mp4'
+        popen_kwargs = {'stdin': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL, 'stderr': subprocess.PIPE}
+        if sys.platform == 'win32':
+            popen_kwargs['creationflags'] = subprocess.BELOW_NORMAL_PRIORITY_CLASS
+        try:
+            process = subprocess.Popen(_remux_command(ffmpeg_path, path, temp_path), **popen_kwargs)
+            if sys.platform != 'win32':
+                try:
+                    os.setpriority(os.PRIO_PROCESS, process.pid, 19)
+                except OSError:
+                    pass
+            _, stderr = process.communicate()
+        except OSError as e:
+            return False, str(e)
+        if process.returncode != 0:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False, stderr.decode('utf-8', 'replace').strip() or f"exit code {process.returncode}"
+        os.replace(temp_path, path)
+        return True, None
@@ -0,0 +1,97 @@
+"""
+Percent-complete, total size and ETA estimates for a running job
+
+Each tick feeds the bytes written so far plus whichever measure of
+completion the engine has: media position against the input duration for
+FFmpeg, segments done for the HLS engine, or the exact size for range
+downloads. Throughput is smoothed with a time-weighted exponential moving
+average, so every update is O(1) and a single slow tick does not swing the
+ETA.
+"""
+import math
+import time
+
+# Seconds for an old rate sample's weight to halve
+DEFAULT_HALF_LIFE = 5.0
+# Do not extrapolate the total from less than this fraction of the job
+MIN_EXTRAPOLATE_FRACTION = 0.01
+
+
+class ProgressEstimator:
+    def __init__(self, half_life=DEFAULT_HALF_LIFE):
+        self.half_life = half_life
+        self.duration = None        # input media seconds, when known
+        self.total_bytes = None     # exact output size, when known
+        self.prior_total = None     # rough size from the header bitrate
+        self.downloaded = 0
+        self.position = None        # media seconds written
+        self.fraction = None        # 0..1 complete
+        self.byte_rate = None       # smoothed bytes/s
+        self.position_rate = None   # smoothed media seconds per second
+        self._last = None           # (time, downloaded, position)
+
+    def _smooth(self, current, sample, elapsed):
+        if current is None:
+            return sample
+        weight = 1 - math.exp(-elapsed * math.log(2) / self.half_life)
+        return current + weight * (sample - current)
+
+    def update(self, downloaded, position=None, fraction=None, now=None):
+        """Record one progress tick"""
+        now = time.monotonic() if now is None else now
+        if self._last is None:
+            self._last = (now, downloaded, position)
+        else:
+            last_time, last_downloaded, last_position = self._last
+            elapsed = now - last_time
+            # A tick on the same clock reading (Windows' clock moves in
+            # ~15 ms steps) has no rate of its own; it still moves the job
+            # on, and the next tick measures the rate over both
+            if elapsed > 0:
+                self.byte_rate = self._smooth(self.byte_rate, max(downloaded - last_downloaded, 0) / elapsed,
+                                              elapsed)
+                if position is not None and last_position is not None:
+                    self.position_rate = self._smooth(self.position_rate,
+                                                      max(position - last_position, 0) / elapsed, elapsed)
+                self._last = (now, downloaded, position)
+
+        self.downloaded = downloaded
+        self.position = position
+        if fraction is None:
+            if self.total_bytes:
+                fraction = downloaded / self.total_bytes
+            elif self.duration and position is not None:
+                fraction = position / self.duration
+        self.fraction = None if fraction is None else min(max(fraction, 0.0), 1.0)
+
+    @property
+    def estimated_total(self):
+        if self.total_bytes:
+            return self.total_bytes
+        if self.fraction and self.fraction >= MIN_EXTRAPOLATE_FRACTION:
+            return int(self.downloaded / self.fraction)
+        return int(self.prior_total) if self.prior_total else None
+
+    @property
+    def eta(self):
+        """Seconds left, or None until there is enough to go on"""
+        if self.fraction is not None and self.fraction >= 1.0:
+            return 0.0
+        # Media position is the better clock for FFmpeg jobs: bytes per
+        # second of video vary with the scene, seconds of video do not
+        if self.duration and self.position is not None and self.position_rate:
+            return max(self.duration - self.position, 0.0) / self.position_rate
+        total = self.estimated_total
+        if total and self.byte_rate:
+            return max(total - self.downloaded, 0) / self.byte_rate
+        return None
+
+    def snapshot(self):
+        """Numbers reported to the extension"""
+        eta = self.eta
+        return {
+            "percent": None if self.fraction is None else round(self.fraction * 100, 1),
+            "estimated_total": self.estimated_total or 0,
+            "eta": None if eta is None else round(eta, 1),
+            "rate": None if self.byte_rate is None else int(self.byte_rate),
+        }
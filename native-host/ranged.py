@@ -0,0 +1,233 @@
+"""
+Multi-connection HTTP range downloader for progressive files
+
+Plain .mp4/.webm/.mkv files do not need FFmpeg at all. When the server
+honours Range requests the file is split into fixed-size chunks that are
+fetched over several pooled connections and written straight into their
+place in a preallocated output file. Servers without range support get a
+single streamed GET instead.
+"""
+import concurrent.futures
+import http.client
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from hls import CHECKPOINT_INTERVAL, DownloadCancelled, SegmentFetcher
+
+DEFAULT_CONNECTIONS = 4
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+READ_SIZE = 256 * 1024
+CHUNK_RETRIES = 3
+
+
+class RangeError(Exception):
+    """The server stopped honouring range requests part-way through"""
+
+
+def probe(fetcher, url):
+    """Return (size, supports_ranges) using a one-byte range request"""
+    response = fetcher.open(url, (0, 1))
+    if response.status != 206:
+        # Range was ignored and the body is the whole file: close the
+        # connection rather than read it
+        fetcher._drop(*response.pool_key)
+        length = response.getheader('Content-Length')
+        return (int(length) if length and length.isdigit() else None), False
+    try:
+        response.read()
+        content_range = response.getheader('Content-Range') or ''
+        if '/' in content_range:
+            total = content_range.rsplit('/', 1)[1]
+            if total.isdigit():
+                return int(total), True
+        return None, False
+    finally:
+        fetcher.release(response)
+
+
+def split_chunks(size, chunk_size):
+    """[(offset, length), ...] covering size bytes"""
+    return [(offset, min(chunk_size, size - offset)) for offset in range(0, size, chunk_size)]
+
+
+class _FileWriter:
+    """Positional writes into the output, through mmap or per-call seeks"""
+
+    def __init__(self, path, size, use_mmap):
+        mode = 'r+b' if os.path.exists(path) else 'w+b'
+        self._file = open(path, mode)
+        self._file.truncate(size)
+        self._lock = threading.Lock()
+        self._map = mmap.mmap(self._file.fileno(), size) if use_mmap and size else None
+
+    def write_at(self, offset, data):
+        if self._map is not None:
+            self._map[offset:offset + len(data)] = data
+        else:
+            with self._lock:
+                self._file.seek(offset)
+                self._file.write(data)
+
+    def sync(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+def _fetch_chunk(fetcher, url, chunk, writer, stop, counter):
+    offset, length = chunk
+    for attempt in range(CHUNK_RETRIES):
+        received = 0
+        try:
+            response = fetcher.open(url, (offset, length))
+            try:
+                if response.status != 206:
+                    raise RangeError(f"Expected 206 for bytes {offset}-{offset + length - 1}, got {response.status}")
+                while received < length:
+                    if stop.is_set():
+                        raise DownloadCancelled()
+                    data = response.read(min(READ_SIZE, length - received))
+                    if not data:
+                        raise OSError("Connection closed mid-chunk")
+                    if fetcher.throttle:
+                        fetcher.throttle(len(data))
+                    writer.write_at(offset + received, data)
+                    received += len(data)
+                    counter.add(len(data))
+            finally:
+                fetcher.release(response)
+            return chunk
+        except (DownloadCancelled, RangeError):
+            raise
+        except (http.client.HTTPException, OSError):
+            counter.add(-received)
+            if attempt == CHUNK_RETRIES - 1:
+                raise
+            time.sleep(0.5 * (attempt + 1))
+
+
+class _Counter:
+    def __init__(self, value=0):
+        self.value = value
+        self._lock = threading.Lock()
+
+    def add(self, amount):
+        with self._lock:
+            self.value += amount
+
+
+def _download_single(fetcher, url, output_path, on_progress, cancel):
+    """Plain streamed GET for servers without range support"""
+    response = fetcher.open(url)
+    written = 0
+    try:
+        length = response.getheader('Content-Length')
+        total = int(length) if length and length.isdigit() else None
+        with open(output_path, 'wb') as out:
+            while True:
+                if cancel is not None and cancel.is_set():
+                    raise DownloadCancelled()
+                data = response.read(READ_SIZE)
+                if not data:
+                    break
+                if fetcher.throttle:
+                    fetcher.throttle(len(data))
+                written += out.write(data)
+                if on_progress:
+                    on_progress(written, total)
+    finally:
+        fetcher.release(response)
+    return written
+
+
+def _resume_chunks(output_path, resume, size, chunk_size):
+    """Chunk offsets already on disk according to a journal checkpoint"""
+    if not resume or resume.get('size') != size or resume.get('chunk_size') != chunk_size:
+        return set()
+    try:
+        if os.path.getsize(output_path) != size:
+            return set()
+    except OSError:
+        return set()
+    return set(resume.get('chunks_done', []))
+
+
+def download_ranged(url, output_path, connections=DEFAULT_CONNECTIONS, chunk_size=DEFAULT_CHUNK_SIZE,
+                    fetcher=None, on_progress=None, cancel=None, resume=None, on_checkpoint=None,
+                    use_mmap=False, checkpoint_interval=CHECKPOINT_INTERVAL, throttle=None):
+    """Download url into output_path over several range requests.
+
+    on_progress(bytes_done, total_bytes) is called as data arrives (total
+    is None when unknown). Checkpoints passed to on_checkpoint(checkpoint)
+    list the finished chunks; passing one back as resume skips them.
+    throttle is passed to the fetcher created when none is given.
+    Returns the number of bytes in the finished file.
+    """
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = SegmentFetcher(throttle=throttle)
+
+    try:
+        size, supports_ranges = probe(fetcher, url)
+        if not supports_ranges or not size:
+            return _download_single(fetcher, url, output_path, on_progress, cancel)
+
+        chunks = split_chunks(size, chunk_size)
+        done = _resume_chunks(output_path, resume, size, chunk_size)
+        counter = _Counter(sum(length for offset, length in chunks if offset in done))
+        writer = _FileWriter(output_path, size, use_mmap)
+
+        stop = threading.Event()
+
+        def checkpoint():
+            writer.sync()
+            if on_checkpoint:
+                on_checkpoint({"size": size, "chunk_size": chunk_size, "chunks_done": sorted(done)})
+
+        def wait_for(future):
+            # Poll so progress keeps flowing and a cancel is noticed mid-chunk
+            while True:
+                if cancel is not None and cancel.is_set():
+                    raise DownloadCancelled()
+                try:
+                    return future.result(timeout=0.25)
+                except concurrent.futures.TimeoutError:
+                    if on_progress:
+                        on_progress(counter.value, size)
+
+        try:
+            with ThreadPoolExecutor(max_workers=connections) as pool:
+                futures = [pool.submit(_fetch_chunk, fetcher, url, chunk, writer, stop, counter)
+                           for chunk in chunks if chunk[0] not in done]
+                try:
+                    last_checkpoint = time.time()
+                    for future in futures:
+                        done.add(wait_for(future)[0])
+                        if on_progress:
+                            on_progress(counter.value, size)
+                        if time.time() - last_checkpoint >= checkpoint_interval:
+                            last_checkpoint = time.time()
+                            checkpoint()
+                except BaseException:
+                    stop.set()
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            # Record finished chunks even on failure so a retry skips them
+            checkpoint()
+            writer.close()
+        return size
+    finally:
+        if own_fetcher:
+            fetcher.close()
@@ -0,0 +1,118 @@
+"""
+Host-wide bandwidth cap shared between jobs by weight
+
+One global rate (bytes/s) is divided between the jobs that are actually
+moving data, in proportion to their weights. A job that goes quiet (e.g. an
+HLS job remuxing) stops counting after ACTIVE_WINDOW seconds, so its share
+flows to the others and aggregate throughput stays at the cap. Each job has
+its own token bucket refilled at its current share. A bucket can run into
+debt by one read, so callers can take() after reading a block of any size.
+
+The host's own engines call take() for every block they read, which holds
+their sockets back and lets TCP slow the server down. FFmpeg reads the
+network itself, so the host reports the bytes it wrote after the fact and
+pauses the process for the returned delay; the average still converges to
+the job's share.
+"""
+import threading
+import time
+
+# Seconds of a job's share it may spend at once after idling
+BURST_SECONDS = 0.5
+# A job that has not taken bytes for this long gives up its share
+ACTIVE_WINDOW = 1.0
+# Longest single sleep inside take(), so cancellation stays responsive
+MAX_WAIT = 0.25
+
+
+class _Share:
+    def __init__(self, weight):
+        self.weight = weight
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.last_used = 0.0
+        self.taken = 0
+
+
+class BandwidthLimiter:
+    def __init__(self, rate=None):
+        self.rate = rate or None     # bytes/s for the whole host; None is unlimited
+        self._shares = {}
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = rate or None
+
+    def register(self, job_id, weight=1.0):
+        with self._lock:
+            self._shares[job_id] = _Share(max(float(weight), 0.01))
+
+    def unregister(self, job_id):
+        with self._lock:
+            self._shares.pop(job_id, None)
+
+    def set_weight(self, job_id, weight):
+        """False if the job is not registered"""
+        with self._lock:
+            share = self._shares.get(job_id)
+            if share is None:
+                return False
+            share.weight = max(float(weight), 0.01)
+            return True
+
+    def _share_rate(self, share, now):
+        """Bytes/s currently allotted to share (lock held)"""
+        active = sum(other.weight for other in self._shares.values()
+                     if other is share or now - other.last_used <= ACTIVE_WINDOW)
+        return self.rate * share.weight / active
+
+    def _charge(self, job_id, amount, now):
+        """Deduct amount; seconds until the job may continue (lock held)"""
+        share = self._shares.get(job_id)
+        if share is None:
+            return 0.0
+        share.taken += amount
+        if self.rate is None:
+            share.last_used = share.updated = now
+            return 0.0
+        rate = self._share_rate(share, now)
+        share.tokens = min(share.tokens + rate * (now - share.updated), rate * BURST_SECONDS)
+        share.updated = now
+        share.last_used = now
+        share.tokens -= amount
+        return -share.tokens / rate if share.tokens < 0 else 0.0
+
+    def take(self, job_id, amount, cancel=None):
+        """Account for amount bytes, sleeping while the job is over its share"""
+        with self._lock:
+            delay = self._charge(job_id, amount, time.monotonic())
+        deadline = time.monotonic() + delay
+        while delay > 0:
+            if cancel is not None and cancel.is_set():
+                return
+            time.sleep(min(delay, MAX_WAIT))
+            delay = deadline - time.monotonic()
+
+    def report(self, job_id, amount):
+        """Account for bytes already transferred; returns the seconds the
+        job should pause to get back within its share"""
+        with self._lock:
+            return self._charge(job_id, amount, time.monotonic())
+
+    def throttle_for(self, job_id, cancel=None):
+        """A throttle(amount) callable for the fetch engines"""
+        return lambda amount: self.take(job_id, amount, cancel)
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            jobs = {}
+            for job_id, share in self._shares.items():
+                jobs[job_id] = {
+                    "weight": share.weight,
+                    "active": now - share.last_used <= ACTIVE_WINDOW,
+                    "share": None if self.rate is None else int(self._share_rate(share, now)),
+                    "bytes": share.taken,
+                }
+            return {"max_rate": self.rate, "jobs": jobs}
@@ -0,0 +1,99 @@
+"""
+Bounded download scheduler for the native host
+
+At most max_concurrent jobs run at once. The rest wait in a priority queue:
+higher priority first, first-in first-out within the same priority.
+"""
+import heapq
+import itertools
+import threading
+
+
+class DownloadScheduler:
+    def __init__(self, max_concurrent, start_job, on_launch_error=None):
+        """start_job(job) is called outside the lock to launch a job.
+
+        on_launch_error(job, error) hears about jobs that fail to launch
+        when nobody is waiting on them: queued jobs started later by
+        job_finished() or set_max_concurrent(). A failure inside submit()
+        is left on the job for the submitter instead.
+        """
+        self.max_concurrent = max(1, int(max_concurrent))
+        self._start_job = start_job
+        self._on_launch_error = on_launch_error
+        self._queue = []
+        self._running = set()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def submit(self, job, priority=0):
+        """Queue a job; returns 0 if it started now, else its 1-based queue position"""
+        with self._lock:
+            heapq.heappush(self._queue, (-priority, next(self._counter), job['job_id'], job))
+            to_start = self._take_ready()
+        self._launch(to_start, submitted=job)
+        return self.position(job)
+
+    def job_finished(self, job):
+        """Free the job's slot and start whatever is next in line"""
+        with self._lock:
+            self._running.discard(job['job_id'])
+            to_start = self._take_ready()
+        self._launch(to_start)
+
+    def cancel(self, job):
+        """Drop a job that is still waiting; returns False if it is not queued"""
+        with self._lock:
+            for index, entry in enumerate(self._queue):
+                if entry[2] == job['job_id']:
+                    self._queue.pop(index)
+                    heapq.heapify(self._queue)
+                    return True
+        return False
+
+    def position(self, job):
+        """0 while running (or unknown), otherwise the 1-based queue position"""
+        with self._lock:
+            if job['job_id'] in self._running:
+                return 0
+            for position, entry in enumerate(sorted(self._queue), 1):
+                if entry[2] == job['job_id']:
+                    return position
+        return 0
+
+    def set_max_concurrent(self, max_concurrent):
+        """Change the limit; raising it starts queued jobs immediately"""
+        with self._lock:
+            self.max_concurrent = max(1, int(max_concurrent))
+            to_start = self._take_ready()
+        self._launch(to_start)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "running": len(self._running),
+                "queued": len(self._queue),
+            }
+
+    def _take_ready(self):
+        """Pop jobs that fit under the limit (caller holds the lock)"""
+        ready = []
+        while self._queue and len(self._running) < self.max_concurrent:
+            job = heapq.heappop(self._queue)[3]
+            self._running.add(job['job_id'])
+            ready.append(job)
+        return ready
+
+    def _launch(self, jobs, submitted=None):
+        for job in jobs:
+            try:
+                self._start_job(job)
+            except Exception as e:
+                # A job that fails to launch gives its slot to the next one;
+                # the error is kept on the job for whoever is waiting on it
+                job['status'] = 'failed'
+                job['error'] = e
+                self.job_finished(job)
+                if job is not submitted and self._on_launch_error:
+                    self._on_launch_error(job, e)
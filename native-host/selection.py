@@ -0,0 +1,154 @@
+"""
+Stream selection: which streams of an input a download keeps
+
+A download can ask for less than the whole input:
+
+    {"type": "audio", "languages": ["en"]}          audio only, English
+    {"type": "all", "resolution": 720}              video up to 720p plus audio
+    {"type": "video"}                               video only
+    "audio"                                         shorthand for {"type": "audio"}
+
+For HLS the selection picks the playlists that get fetched (the variant
+closest to the resolution, the audio rendition in the wanted language, or
+only the audio rendition), so unneeded renditions are never transferred.
+For everything FFmpeg reads it becomes -map options; FFmpeg's HLS and DASH
+demuxers then skip the segments of unmapped streams.
+"""
+import re
+
+TYPES = ('all', 'audio', 'video')
+HEIGHT_RE = re.compile(r'^(?:\d+x)?(\d+)p?$')
+# Codec prefixes of a video stream in an HLS CODECS attribute
+VIDEO_CODECS = ('avc', 'hvc', 'hev', 'vp0', 'vp9', 'av01', 'dvh', 'dva', 'mp4v')
+
+# ISO 639-1 codes (HLS LANGUAGE) for the ISO 639-2 codes FFmpeg reports
+ISO_639_2 = {
+    'ara': 'ar', 'chi': 'zh', 'zho': 'zh', 'cze': 'cs', 'ces': 'cs', 'dan': 'da', 'dut': 'nl', 'nld': 'nl',
+    'eng': 'en', 'fin': 'fi', 'fre': 'fr', 'fra': 'fr', 'ger': 'de', 'deu': 'de', 'gre': 'el', 'ell': 'el',
+    'heb': 'he', 'hin': 'hi', 'hun': 'hu', 'ind': 'id', 'ita': 'it', 'jpn': 'ja', 'kor': 'ko', 'nor': 'no',
+    'pol': 'pl', 'por': 'pt', 'rum': 'ro', 'ron': 'ro', 'rus': 'ru', 'spa': 'es', 'swe': 'sv', 'tha': 'th',
+    'tur': 'tr', 'ukr': 'uk', 'vie': 'vi',
+}
+
+
+def parse(value):
+    """Normalised selection from a request, None for "everything".
+
+    Raises ValueError for a selection that makes no sense.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = {"type": value}
+    kind = value.get('type') or 'all'
+    if kind not in TYPES:
+        raise ValueError(f"Unknown stream type: {kind}")
+    max_height = None
+    if value.get('resolution'):
+        match = HEIGHT_RE.match(str(value['resolution']).strip().lower())
+        if not match:
+            raise ValueError(f"Bad resolution: {value['resolution']}")
+        max_height = int(match.group(1))
+    languages = value.get('languages') or []
+    if isinstance(languages, str):
+        languages = languages.split(',')
+    languages = [language.strip().lower() for language in languages if language.strip()]
+    selection = {"type": kind, "max_height": max_height, "languages": languages,
+                 "subtitles": bool(value.get('subtitles'))}
+    if selection == {"type": 'all', "max_height": None, "languages": [], "subtitles": False}:
+        return None
+    return selection
+
+
+def key(selection):
+    """Stable text for a selection, part of a download's content identity"""
+    if not selection:
+        return ''
+    return (f"{selection['type']}:{selection['max_height'] or ''}:{','.join(selection['languages'])}"
+            f":{int(selection['subtitles'])}")
+
+
+def language_matches(language, wanted):
+    """True if a stream language ("en", "en-US", "eng") is one of wanted"""
+    if not language:
+        return False
+    primary = language.lower().split('-')[0]
+    primary = ISO_639_2.get(primary, primary)
+    return any(ISO_639_2.get(want.split('-')[0], want.split('-')[0]) == primary for want in wanted)
+
+
+def is_audio_only_variant(variant):
+    codecs = variant.get('CODECS')
+    if not codecs or 'RESOLUTION' in variant:
+        return False
+    return not any(codec.strip().lower().startswith(VIDEO_CODECS) for codec in codecs.split(','))
+
+
+def variant_candidates(variants, selection):
+    """Indexes of the variants a selection allows (all of them if none fit)"""
+    indexes = list(range(len(variants)))
+    if not selection:
+        return indexes
+    if selection['type'] == 'audio':
+        audio_only = [index for index in indexes if is_audio_only_variant(variants[index])]
+        if audio_only:
+            return audio_only
+    else:
+        indexes = [index for index in indexes if not is_audio_only_variant(variants[index])] or indexes
+    if selection['max_height']:
+        from manifest import resolution
+        fitting = [index for index in indexes if 0 < resolution(variants[index])[1] <= selection['max_height']]
+        if fitting:
+            return fitting
+        # Nothing small enough: the smallest there is
+        return [min(indexes, key=lambda index: resolution(variants[index])[1] or float('inf'))]
+    if selection['type'] == 'audio':
+        # Audio is muxed into every variant; the cheapest carries the least video
+        return [min(indexes, key=lambda index: variants[index]['bandwidth'])]
+    return indexes
+
+
+def pick_rendition(renditions, languages):
+    """The rendition in the first wanted language, else the default one"""
+    for wanted in languages:
+        for media in renditions:
+            if language_matches(media.get('LANGUAGE'), [wanted]):
+                return media
+    defaults = [media for media in renditions if media.get('DEFAULT') == 'YES']
+    return (defaults or renditions)[0] if renditions else None
+
+
+def map_args(selection, separate_audio=False, streams=None):
+    """-map options for inputs [media] or [media, audio rendition].
+
+    streams are a probe's per-stream details (see ffparse.parse_input_info,
+    tagged with "input"); languages are matched against them. Without them,
+    or when none is in a wanted language, every stream of the type is kept.
+    """
+    if not selection:
+        return ['-map', '0:v', '-map', '1:a'] if separate_audio else []
+    kind = selection['type']
+    audio_input = 1 if separate_audio else 0
+    args = []
+    if kind != 'audio':
+        args += ['-map', '0:v' if kind == 'video' else '0:v?']
+    if kind != 'video':
+        args += _language_maps(audio_input, 'a', selection['languages'], streams,
+                               required=kind == 'audio' and not separate_audio)
+    if selection['subtitles']:
+        args += _language_maps(0, 's', selection['languages'], streams, required=False)
+    return args
+
+
+def _language_maps(input_index, stream_type, languages, streams, required):
+    wanted_type = {'a': 'audio', 's': 'subtitle'}[stream_type]
+    suffix = '' if required else '?'
+    if languages and streams:
+        matching = [stream for stream in streams
+                    if stream.get('input', 0) == input_index and stream['type'] == wanted_type
+                    and language_matches(stream.get('language'), languages)]
+        if matching:
+            return [arg for stream in matching for arg in ('-map', f"{input_index}:{stream['index']}")]
+    # No languages, no probe to match them against, or none in them: keep
+    # them all rather than risk an output with none
+    return ['-map', f"{input_index}:{stream_type}{suffix}"]
@@ -1,3 +1,13 @@
 @echo off
-:: Use python from PATH with unbuffered output for native messaging
-python -u "%~dp0host.py" 2>&1
\ No newline at end of file
+:: Use python from PATH with unbuffered output for native messaging;
+:: prefer the installer's venv and precompiled host.pyz bundle when present
+set "PYTHON=python"
+if exist "%~dp0venv\Scripts\python.exe" set "PYTHON=%~dp0venv\Scripts\python.exe"
+if exist "%~dp0host.pyz" (
+    "%PYTHON%" -u "%~dp0host.pyz" 2>&1
+    exit /b
+)
+:: -m runs host from its cached bytecode; a script path would be compiled
+:: from source on every start
+cd /d "%~dp0"
+"%PYTHON%" -u -m host 2>&1
\ No newline at end of file
@@ -1,6 +1,17 @@
 #!/bin/bash
 # Native host launcher for Mac/Linux
-# Use python with unbuffered output for native messaging
+# Use python with unbuffered output for native messaging; prefer the
+# installer's venv and precompiled host.pyz bundle when they exist
 
 SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
-python3 -u "$SCRIPT_DIR/host.py" 2>&1
+PYTHON=python3
+if [ -x "$SCRIPT_DIR/venv/bin/python" ]; then
+    PYTHON="$SCRIPT_DIR/venv/bin/python"
+fi
+if [ -f "$SCRIPT_DIR/host.pyz" ]; then
+    exec "$PYTHON" -u "$SCRIPT_DIR/host.pyz" 2>&1
+fi
+# -m runs host from its cached bytecode; a script path would be compiled
+# from source on every start
+cd "$SCRIPT_DIR" || exit 1
+exec "$PYTHON" -u -m host 2>&1
@@ -0,0 +1,227 @@
+"""
+Ahead-of-time stream probing and a cache of the results
+
+Before FFmpeg writes its first byte it fetches the manifest, picks a
+variant and reads several seconds of media (-analyzeduration/-probesize)
+to identify the streams. The extension asks for a probe as soon as it sees
+a stream, so that work happens while the user is still deciding. A probe
+records the container, duration, variants (with the one the variant policy
+picks) and per-stream codecs. A download that finds a fresh probe goes
+straight to the chosen media playlist and opens it with FAST_PROBE_ARGS
+instead of FFmpeg's defaults.
+
+Results are kept per canonical stream identity (canonical.content_key), so
+a probe made under one signed URL serves a download made under the next.
+"""
+import collections
+import os
+import queue
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_TTL = 600
+DEFAULT_MAX_ENTRIES = 128
+# Seconds one `ffmpeg -i` probe may take
+FFMPEG_PROBE_TIMEOUT = 20
+# Input options for a stream the probe already identified: read 256 KB /
+# half a second of media instead of FFmpeg's 5 MB / 5 seconds
+FAST_PROBE_ARGS = ('-probesize', '262144', '-analyzeduration', '500000')
+
+ISO_DURATION_RE = re.compile(r'^P(?:(\d+(?:\.\d+)?)D)?(?:T(?:(\d+(?:\.\d+)?)H)?(?:(\d+(?:\.\d+)?)M)?(?:(\d+(?:\.\d+)?)S)?)?$')
+PROGRESSIVE_CONTAINERS = {'.mp4': 'mp4', '.m4v': 'mp4', '.mov': 'mp4', '.webm': 'webm', '.mkv': 'matroska',
+                          '.flv': 'flv', '.ts': 'mpegts', '.avi': 'avi'}
+
+
+def stream_type(url):
+    """"hls", "dash" or "progressive" from the URL's path"""
+    path = urlsplit(url).path.lower()
+    if path.endswith('.m3u8'):
+        return 'hls'
+    if path.endswith('.mpd'):
+        return 'dash'
+    return 'progressive'
+
+
+def parse_iso_duration(text):
+    """'PT1H2M3.5S' -> seconds, None if unparseable"""
+    match = ISO_DURATION_RE.match((text or '').strip())
+    if not match or not any(match.groups()):
+        return None
+    days, hours, minutes, seconds = (float(value or 0) for value in match.groups())
+    return days * 86400 + hours * 3600 + minutes * 60 + seconds
+
+
+def parse_mpd(text):
+    """Duration, liveness and representations of a DASH manifest"""
+    import xml.etree.ElementTree as ET
+    root = ET.fromstring(text)
+    representations = []
+    for element in root.iter():
+        if not element.tag.endswith('Representation'):
+            continue
+        representation = {"id": element.get('id'), "bandwidth": int(element.get('bandwidth') or 0)}
+        if element.get('width') and element.get('height'):
+            representation['resolution'] = f"{element.get('width')}x{element.get('height')}"
+        if element.get('codecs'):
+            representation['codecs'] = element.get('codecs')
+        if element.get('mimeType'):
+            representation['mime_type'] = element.get('mimeType')
+        representations.append(representation)
+    return {
+        "duration": parse_iso_duration(root.get('mediaPresentationDuration')),
+        "live": root.get('type') == 'dynamic',
+        "representations": representations,
+    }
+
+
+def _variant_summary(variant):
+    summary = {"bandwidth": variant['bandwidth']}
+    for key, name in (('RESOLUTION', 'resolution'), ('CODECS', 'codecs')):
+        if key in variant:
+            summary[name] = variant[key]
+    return summary
+
+
+def probe_manifest(fetcher, url, cache, policy=None, max_bandwidth=None, selection=None):
+    """What the manifest or HTTP headers say about url, without FFmpeg"""
+    kind = stream_type(url)
+    info = {"url": url, "type": kind, "duration": None, "live": False, "container": None,
+            "variants": [], "stream": None, "size": None}
+    if kind == 'hls':
+        import manifest
+        playlist = cache.fetch(fetcher, url)
+        stream = manifest.resolve_stream(fetcher, url, cache, policy or manifest.DEFAULT_POLICY, max_bandwidth,
+                                         selection)
+        if playlist['type'] == 'master':
+            info['variants'] = [_variant_summary(variant) for variant in playlist['variants']]
+            media = cache.fetch(fetcher, stream['media_url'])
+        else:
+            media = playlist
+        info['stream'] = stream
+        info['live'] = not media['endlist']
+        info['encrypted'] = media['encrypted']
+        if media['endlist']:
+            info['duration'] = sum(segment.duration for segment in media['segments'])
+        info['container'] = 'mp4' if media['init'] else 'mpegts'
+        if stream['variant']:
+            import output
+            info['size'] = output.estimate_hls_size(media, stream['variant'].get('bandwidth'))
+    elif kind == 'dash':
+        mpd = parse_mpd(fetcher.get_text(url))
+        info.update(duration=mpd['duration'], live=mpd['live'], container='mp4',
+                    variants=mpd['representations'])
+    else:
+        import ranged
+        info['size'], info['ranges'] = ranged.probe(fetcher, url)
+        extension = os.path.splitext(urlsplit(url).path.lower())[1]
+        info['container'] = PROGRESSIVE_CONTAINERS.get(extension)
+    return info
+
+
+def probe_with_ffmpeg(ffmpeg_path, url, input_args=(), timeout=FFMPEG_PROBE_TIMEOUT):
+    """Container, duration and streams as FFmpeg sees them (`ffmpeg -i url`)"""
+    import subprocess
+    from ffparse import parse_input_info
+    # With no output file FFmpeg prints the input header and exits non-zero
+    result = subprocess.run([ffmpeg_path, '-hide_banner', '-nostdin', *input_args, '-i', url],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                            timeout=timeout)
+    return parse_input_info(result.stderr.decode('utf-8', 'replace'))
+
+
+def merge_ffmpeg_info(info, inputs):
+    """Fold `ffmpeg -i` results, one per input a download opens, into a
+    manifest probe; each stream records which input it comes from"""
+    info['streams'] = [dict(stream, input=number)
+                       for number, ffmpeg_info in enumerate(inputs) for stream in ffmpeg_info['streams']]
+    if inputs and info['duration'] is None and not info['live']:
+        info['duration'] = inputs[0]['duration']
+    if inputs and info['container'] is None and inputs[0]['container'] not in (None, 'hls', 'dash'):
+        info['container'] = inputs[0]['container']
+    return info
+
+
+class ProbeCache:
+    """Probe results keyed on canonical stream identity, with TTL and LRU
+    eviction, plus a small pool that runs probes in the background.
+
+    Probes are speculative, so the workers are daemon threads: a host that
+    is done with its downloads does not wait for them.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, workers=2, on_done=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.workers = workers
+        # on_done(key, info, error) after each background probe
+        self.on_done = on_done
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._pending = set()
+        self._queue = queue.Queue()
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, info):
+        info['probed'] = time.time()
+        with self._lock:
+            self._entries[key] = (time.monotonic(), info)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def submit(self, key, probe):
+        """Run probe() in the background and cache its result; False if the
+        key is already cached or being probed"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if key in self._pending or (entry and time.monotonic() - entry[0] <= self.ttl):
+                return False
+            self._pending.add(key)
+            self._queue.put((key, probe))
+            if self._running < self.workers:
+                self._running += 1
+                threading.Thread(target=self._work, name='stream-probe', daemon=True).start()
+        return True
+
+    def _work(self):
+        while True:
+            with self._lock:
+                try:
+                    key, probe = self._queue.get_nowait()
+                except queue.Empty:
+                    self._running -= 1
+                    return
+            info, error = None, None
+            try:
+                info = probe()
+                self.put(key, info)
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            with self._lock:
+                self._pending.discard(key)
+            if self.on_done:
+                self.on_done(key, info, error)
+
+    def pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "pending": len(self._pending),
+                    "hits": self.hits, "misses": self.misses}
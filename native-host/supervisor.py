@@ -0,0 +1,199 @@
+"""
+One thread that supervises every FFmpeg child process
+
+Each child's stdout and stderr pipes are registered with a selector. The
+supervisor thread sleeps in select() until a pipe has data, splits what
+arrives into lines for the job's callbacks, and treats end-of-file on both
+pipes as the exit notification, then reaps the child. Nothing polls: a
+progress block is handled as soon as FFmpeg writes it. The thread count
+stays the same however many jobs run.
+
+The thread is non-daemon and only alive while it has children to watch, so
+the host outlives the browser port until the last FFmpeg has exited and its
+outcome has been recorded. That is what the per-job monitor threads did.
+
+Windows cannot select() on pipes, so there every pipe gets its own reader
+thread that feeds the same callbacks.
+"""
+import os
+import sys
+import threading
+
+READ_SIZE = 64 * 1024
+
+
+class _Watch:
+    def __init__(self, process, on_stdout, on_stderr, on_exit):
+        self.process = process
+        self.callbacks = {}
+        self.partial = {}
+        self.streams = {}
+        for stream, callback in ((process.stdout, on_stdout), (process.stderr, on_stderr)):
+            if stream is not None:
+                self.callbacks[stream.fileno()] = callback
+                self.partial[stream.fileno()] = b''
+                self.streams[stream.fileno()] = stream
+        self.on_exit = on_exit
+
+    def feed(self, fd, data):
+        """Hand complete lines to the stream's callback; data=b'' is EOF"""
+        callback = self.callbacks[fd]
+        if not data:
+            self.streams.pop(fd).close()
+            rest = self.partial.pop(fd)
+            if rest:
+                callback(rest)
+            return
+        lines = (self.partial[fd] + data).split(b'\n')
+        self.partial[fd] = lines.pop()
+        for line in lines:
+            callback(line + b'\n')
+
+    @property
+    def closed(self):
+        return not self.partial
+
+
+class ProcessSupervisor:
+    def __init__(self, on_error=None):
+        # on_error(exception, process) reports a callback that raised
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._watches = {}      # fd -> _Watch
+        self._pending = []      # watches registered since the last wake-up
+        self._thread = None
+        self._wake_write = None
+        self._idle = threading.Condition(self._lock)
+
+    @property
+    def active(self):
+        """Number of children still being watched"""
+        with self._lock:
+            return len({id(watch) for watch in self._watches.values()}) + len(self._pending)
+
+    def watch(self, process, on_stdout=None, on_stderr=None, on_exit=None):
+        """Supervise a Popen started with stdout/stderr=PIPE.
+
+        on_stdout(line) and on_stderr(line) get raw byte lines, and
+        on_exit(returncode) runs once both pipes are closed and the child is
+        reaped. All three run on the supervisor thread.
+        """
+        noop = lambda *args: None  # noqa: E731
+        watch = _Watch(process, on_stdout or noop, on_stderr or noop, on_exit or noop)
+        if sys.platform == 'win32':
+            self._watch_with_threads(watch)
+            return
+        with self._lock:
+            self._pending.append(watch)
+            if self._thread is None:
+                self._start()
+            try:
+                os.write(self._wake_write, b'\0')
+            except BlockingIOError:
+                pass  # already has a wake-up queued
+
+    def wait_idle(self, timeout=None):
+        """Block until no children are left; False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._watches and not self._pending, timeout)
+
+    # Selector loop (POSIX)
+
+    def _start(self):
+        import selectors
+        selector = selectors.DefaultSelector()
+        wake_read, self._wake_write = os.pipe()
+        os.set_blocking(wake_read, False)
+        os.set_blocking(self._wake_write, False)
+        selector.register(wake_read, selectors.EVENT_READ)
+        self._thread = threading.Thread(target=self._run, args=(selector, wake_read, self._wake_write),
+                                        name='ffmpeg-supervisor', daemon=False)
+        self._thread.start()
+
+    def _register_pending(self, selector):
+        import selectors
+        with self._lock:
+            pending, self._pending = self._pending, []
+            for watch in pending:
+                for fd in watch.callbacks:
+                    os.set_blocking(fd, False)
+                    selector.register(fd, selectors.EVENT_READ)
+                    self._watches[fd] = watch
+
+    def _run(self, selector, wake_read, wake_write):
+        try:
+            while True:
+                self._register_pending(selector)
+                with self._lock:
+                    if not self._watches and not self._pending:
+                        self._thread = None
+                        self._idle.notify_all()
+                        return
+                for key, _ in selector.select():
+                    if key.fd == wake_read:
+                        try:
+                            os.read(wake_read, READ_SIZE)
+                        except BlockingIOError:
+                            pass
+                        continue
+                    self._read(selector, key.fd)
+        finally:
+            selector.close()
+            os.close(wake_read)
+            os.close(wake_write)
+
+    def _read(self, selector, fd):
+        watch = self._watches[fd]
+        try:
+            data = os.read(fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            selector.unregister(fd)
+            with self._lock:
+                del self._watches[fd]
+        self._call(watch, watch.feed, fd, data)
+        if watch.closed:
+            self._call(watch, watch.on_exit, watch.process.wait())
+
+    def _call(self, watch, callback, *args):
+        # A failing callback must not take down the other jobs' supervision
+        try:
+            callback(*args)
+        except Exception as e:
+            if self.on_error:
+                self.on_error(e, watch.process)
+
+    # Reader threads (Windows)
+
+    def _watch_with_threads(self, watch):
+        lock = threading.Lock()
+
+        def pump(stream):
+            fd = stream.fileno()
+            for line in iter(stream.readline, b''):
+                with lock:
+                    self._call(watch, watch.feed, fd, line)
+            with lock:
+                self._call(watch, watch.feed, fd, b'')
+                if watch.closed:
+                    self._call(watch, watch.on_exit, watch.process.wait())
+
+        def forget(returncode, on_exit=watch.on_exit):
+            try:
+                on_exit(returncode)
+            finally:
+                with self._idle:
+                    self._pending.remove(watch)
+                    self._idle.notify_all()
+        watch.on_exit = forget
+
+        with self._lock:
+            self._pending.append(watch)
+        streams = [stream for stream in (watch.process.stdout, watch.process.stderr) if stream is not None]
+        for stream in streams:
+            # Whichever reader sees EOF last runs on_exit, so neither is a
+            # daemon: the host stays up until the outcome is recorded
+            threading.Thread(target=pump, args=(stream,), daemon=False).start()
@@ -1,49 +1,361 @@
 #!/usr/bin/env python3
 """
-Simple HTTP server for testing downloads
-Serves test video file so you can verify the entire download pipeline works
+Synthetic media server for offline download benchmarks
+
+Generates content on the fly, so nothing has to be on disk:
+  /video.mp4                     progressive MP4-shaped file (Range supported)
+  /hls/master.m3u8               multi-variant HLS master playlist
+  /hls/<variant>/index.m3u8      VOD media playlist per variant
+  /hls/<variant>/seg<N>.ts       MPEG-TS segments sized to the variant bitrate
+  /dash/manifest.mpd             DASH manifest, one representation per variant
+  /dash/<variant>/init.mp4, /dash/<variant>/seg-<N>.m4s
+  /static/<path>                 files from --static-dir (e.g. a real HLS encode)
+
+Every request can be slowed down by a per-connection bandwidth cap, a fixed
+latency plus random jitter, and failed with a configurable error rate.
+Latency and error draws are seeded per (path, range, attempt), so the same
+request sequence behaves the same way on every run whatever the thread
+interleaving.
+
+Usage: python test_server.py [--port 8000] [--bandwidth 4M] [--latency 0.05]
+                             [--jitter 0.02] [--error-rate 0.01] [--seed 1]
 """
+import argparse
 import http.server
-import socketserver
 import os
-from pathlib import Path
+import random
+import re
+import threading
+import time
 
-PORT = 8000
-TEST_FILE = r"C:\Users\sande\Downloads\test-source.mp4"
+DEFAULT_FILE_SIZE = 64 * 1024 * 1024
+DEFAULT_SEGMENTS = 30
+DEFAULT_SEGMENT_DURATION = 4.0
+DEFAULT_VARIANTS = (800000, 2400000, 6000000)
+RESOLUTIONS = ('640x360', '1280x720', '1920x1080', '2560x1440', '3840x2160')
+WRITE_CHUNK = 64 * 1024
 
-class Handler(http.server.SimpleHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/test-video.mp4":
-            # Serve the test video
-            if os.path.exists(TEST_FILE):
-                size = os.path.getsize(TEST_FILE)
-                self.send_response(200)
-                self.send_header("Content-Type", "video/mp4")
-                self.send_header("Content-Length", str(size))
-                self.send_header("Accept-Ranges", "bytes")
-                self.end_headers()
-                
-                with open(TEST_FILE, 'rb') as f:
-                    self.wfile.write(f.read())
-                return
+BLOCK = random.Random(1234).getrandbits(8 * WRITE_CHUNK).to_bytes(WRITE_CHUNK, 'little')
+RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+
+def mp4_header(size):
+    """ftyp box plus an mdat header covering the rest of the file"""
+    ftyp = b'\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isomiso2'
+    return ftyp + (size - len(ftyp)).to_bytes(4, 'big') + b'mdat'
+
+
+def ts_segment_size(bandwidth, duration):
+    return max(188, int(bandwidth * duration / 8) // 188 * 188)
+
+
+def ts_packet(index):
+    """A null-PID TS packet tagged with its segment index"""
+    return b'\x47\x1f\xff\x10' + index.to_bytes(4, 'big') + b'\xff' * 180
+
+
+class Body:
+    """Deterministic bytes of a given size, produced in slices"""
+
+    def __init__(self, size, prefix=b'', pattern=BLOCK):
+        self.size = size
+        self.prefix = prefix[:size]
+        self.pattern = pattern
+
+    @classmethod
+    def text(cls, text):
+        data = text.encode('utf-8')
+        return cls(len(data), data)
+
+    @classmethod
+    def file(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        return cls(len(data), data)
+
+    def chunks(self, start, length, chunk_size=WRITE_CHUNK):
+        end = start + length
+        position = start
+        while position < end:
+            if position < len(self.prefix):
+                data = self.prefix[position:min(end, len(self.prefix))]
             else:
-                self.send_response(404)
+                offset = (position - len(self.prefix)) % len(self.pattern)
+                data = self.pattern[offset:offset + min(chunk_size, end - position)]
+            position += len(data)
+            yield data
+
+
+class MediaServer:
+    def __init__(self, host='127.0.0.1', port=0, bandwidth=None, latency=0.0, jitter=0.0,
+                 error_rate=0.0, seed=0, file_size=DEFAULT_FILE_SIZE, segments=DEFAULT_SEGMENTS,
+                 segment_duration=DEFAULT_SEGMENT_DURATION, variants=DEFAULT_VARIANTS, static_dir=None):
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.file_size = file_size
+        self.segments = segments
+        self.segment_duration = segment_duration
+        self.variants = list(variants)
+        self.static_dir = static_dir
+        self._attempts = {}
+        self._stats = {"requests": 0, "errors": 0, "bytes": 0}
+        self._lock = threading.Lock()
+        self._httpd = http.server.ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.media = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path):
+        return self.base_url + '/' + path.lstrip('/')
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), name='media-server',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, **amounts):
+        with self._lock:
+            for key, amount in amounts.items():
+                self._stats[key] += amount
+
+    def _draw(self, path, range_header):
+        """Per-request RNG, reproducible for the same request sequence"""
+        key = (path, range_header)
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        return random.Random(f"{self.seed}:{path}:{range_header}:{attempt}")
+
+    # Content
+
+    def playlist_master(self):
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+        for index, bandwidth in enumerate(self.variants):
+            resolution = RESOLUTIONS[min(index, len(RESOLUTIONS) - 1)]
+            lines += [f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={resolution},CODECS="avc1.64001f,mp4a.40.2"',
+                      f'v{index}/index.m3u8']
+        return '\n'.join(lines) + '\n'
+
+    def playlist_media(self):
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{int(self.segment_duration + 0.999)}',
+                 '#EXT-X-MEDIA-SEQUENCE:0', '#EXT-X-PLAYLIST-TYPE:VOD']
+        for index in range(self.segments):
+            lines += [f'#EXTINF:{self.segment_duration:.3f},', f'seg{index}.ts']
+        lines.append('#EXT-X-ENDLIST')
+        return '\n'.join(lines) + '\n'
+
+    def manifest_dash(self):
+        total = self.segments * self.segment_duration
+        representations = ''.join(
+            f'      <Representation id="v{index}" bandwidth="{bandwidth}" codecs="avc1.64001f" '
+            f'width="{RESOLUTIONS[min(index, len(RESOLUTIONS) - 1)].split("x")[0]}" '
+            f'height="{RESOLUTIONS[min(index, len(RESOLUTIONS) - 1)].split("x")[1]}"/>\n'
+            for index, bandwidth in enumerate(self.variants))
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" '
+            f'mediaPresentationDuration="PT{total:.3f}S" minBufferTime="PT2S" '
+            'profiles="urn:mpeg:dash:profile:isoff-on-demand:2011">\n'
+            '  <Period>\n'
+            '    <AdaptationSet mimeType="video/mp4" segmentAlignment="true">\n'
+            f'      <SegmentTemplate timescale="1000" duration="{int(self.segment_duration * 1000)}" startNumber="0" '
+            'initialization="$RepresentationID$/init.mp4" media="$RepresentationID$/seg-$Number$.m4s"/>\n'
+            f'{representations}'
+            '    </AdaptationSet>\n'
+            '  </Period>\n'
+            '</MPD>\n')
+
+    def resolve(self, path):
+        """(content_type, Body) for a request path, or None for 404"""
+        if path == '/video.mp4':
+            return 'video/mp4', Body(self.file_size, mp4_header(self.file_size))
+        if path == '/hls/master.m3u8':
+            return 'application/vnd.apple.mpegurl', Body.text(self.playlist_master())
+        if path == '/dash/manifest.mpd':
+            return 'application/dash+xml', Body.text(self.manifest_dash())
+        match = re.match(r'/(hls|dash)/v(\d+)/(index\.m3u8|seg(\d+)\.ts|init\.mp4|seg-(\d+)\.m4s)$', path)
+        if match and int(match.group(2)) < len(self.variants):
+            kind, variant, name, ts_index, m4s_index = match.groups()
+            bandwidth = self.variants[int(variant)]
+            if kind == 'hls' and name == 'index.m3u8':
+                return 'application/vnd.apple.mpegurl', Body.text(self.playlist_media())
+            if kind == 'hls' and ts_index is not None and int(ts_index) < self.segments:
+                packet = ts_packet(int(ts_index))
+                return 'video/mp2t', Body(ts_segment_size(bandwidth, self.segment_duration), pattern=packet)
+            if kind == 'dash' and name == 'init.mp4':
+                return 'video/mp4', Body(1024, mp4_header(1024))
+            if kind == 'dash' and m4s_index is not None and int(m4s_index) < self.segments:
+                return 'video/iso.segment', Body(int(bandwidth * self.segment_duration / 8))
+        if path.startswith('/static/') and self.static_dir:
+            local = os.path.realpath(os.path.join(self.static_dir, path[len('/static/'):]))
+            if local.startswith(os.path.realpath(self.static_dir) + os.sep) and os.path.isfile(local):
+                return 'application/octet-stream', Body.file(local)
+        return None
+
+
+def parse_range(header, size):
+    """(start, length) for a single "bytes=" range, None if unsatisfiable"""
+    match = RANGE_RE.match(header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    first, last = match.groups()
+    if not first:
+        length = min(int(last), size)
+        return (size - length, length) if length else None
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return None
+    return start, end - start + 1
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, send_body):
+        media = self.server.media
+        path = self.path.split('?', 1)[0]
+        range_header = self.headers.get('Range')
+        rng = media._draw(path, range_header)
+        media._count(requests=1)
+
+        delay = media.latency + (rng.uniform(-media.jitter, media.jitter) if media.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+        if media.error_rate and rng.random() < media.error_rate:
+            media._count(errors=1)
+            self._send_simple(503, b'Injected error\n')
+            return
+
+        resolved = media.resolve(path)
+        if resolved is None:
+            self._send_simple(404, b'Not found\n')
+            return
+        content_type, body = resolved
+
+        start, length = 0, body.size
+        status = 200
+        if range_header:
+            byte_range = parse_range(range_header, body.size)
+            if byte_range is None:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{body.size}')
+                self.send_header('Content-Length', '0')
                 self.end_headers()
-                self.wfile.write(b"Test file not found")
                 return
-        else:
-            self.send_response(404)
-            self.end_headers()
-            self.wfile.write(b"Not found. Use /test-video.mp4")
-
-if __name__ == "__main__":
-    print(f"Starting test server on http://127.0.0.1:{PORT}")
-    print(f"Video URL: http://127.0.0.1:{PORT}/test-video.mp4")
-    print(f"Serving: {TEST_FILE}")
-    
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
-        print("Server running... Press Ctrl+C to stop")
+            start, length = byte_range
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{start + length - 1}/{body.size}')
+        self.end_headers()
+        if send_body:
+            self._write_throttled(body.chunks(start, length), media.bandwidth)
+
+    def _send_simple(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_throttled(self, chunks, bandwidth):
+        """Write chunks, holding this connection to bandwidth bytes/s"""
+        media = self.server.media
+        started = time.monotonic()
+        sent = 0
         try:
-            httpd.serve_forever()
-        except KeyboardInterrupt:
-            print("\nServer stopped")
+            for chunk in chunks:
+                if bandwidth:
+                    for offset in range(0, len(chunk), max(1, bandwidth // 20)):
+                        piece = chunk[offset:offset + max(1, bandwidth // 20)]
+                        ahead = sent / bandwidth - (time.monotonic() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+                        self.wfile.write(piece)
+                        sent += len(piece)
+                else:
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        media._count(bytes=sent)
+
+
+def parse_rate(text):
+    """'4M' -> 4194304 bytes/s ('k', 'M', 'G' suffixes, powers of 1024)"""
+    units = {'k': 1024, 'K': 1024, 'm': 1024 ** 2, 'M': 1024 ** 2, 'g': 1024 ** 3, 'G': 1024 ** 3}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic media server for download benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--bandwidth', type=parse_rate, default=None, help='bytes/s per connection, e.g. 4M')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before each response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='+/- seconds added to the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered 503')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--file-size', type=parse_rate, default=DEFAULT_FILE_SIZE, help='size of /video.mp4')
+    parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS)
+    parser.add_argument('--segment-duration', type=float, default=DEFAULT_SEGMENT_DURATION)
+    parser.add_argument('--static-dir', help='also serve this directory under /static/')
+    args = parser.parse_args()
+
+    server = MediaServer(args.host, args.port, bandwidth=args.bandwidth, latency=args.latency,
+                         jitter=args.jitter, error_rate=args.error_rate, seed=args.seed,
+                         file_size=args.file_size, segments=args.segments,
+                         segment_duration=args.segment_duration, static_dir=args.static_dir)
+    print(f"Synthetic media server on {server.base_url}")
+    for path in ('video.mp4', 'hls/master.m3u8', 'dash/manifest.mpd'):
+        print(f"  {server.url(path)}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nServer stopped")
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+
+
+@pytest.fixture(autouse=True)
+def host_logs(monkeypatch, tmp_path):
+    """Point the host's log, job database, journals and caches at tmp_path
+
+    The host opens them lazily, so a test that needs the store or journal
+    gets a fresh one here instead of the repository's logs/ directory.
+    """
+    import host
+    logs = tmp_path / "logs"
+    monkeypatch.setattr(host, 'LOGS_DIR', str(logs))
+    monkeypatch.setattr(host, 'LOG_FILE', str(logs / "ffmpeg-download.log"))
+    monkeypatch.setattr(host, 'FFMPEG_CAPS_FILE', str(logs / "ffmpeg-caps.json"))
+    monkeypatch.setattr(host, 'JOBS_DB', str(logs / "jobs.db"))
+    monkeypatch.setattr(host, 'JOURNAL_DIR', str(logs / "jobs"))
+    monkeypatch.setattr(host, 'LOGGER', None)
+    monkeypatch.setattr(host, 'STORE', None)
+    monkeypatch.setattr(host, 'JOURNAL', None)
+    monkeypatch.setattr(host, 'PROFILES', None)
+    yield logs
+    if host.LOGGER is not None:
+        host.LOGGER.close()
+    for store in (host.STORE, host.PROFILES):
+        if store is not None:
+            store.close()
+
+
+@pytest.fixture
+def host_state(monkeypatch, tmp_path):
+    """The host with no jobs of its own: downloads go to tmp_path and
+    one scheduler slot runs them through start_download"""
+    import host
+    monkeypatch.setattr(host, 'DOWNLOADS_DIR', str(tmp_path))
+    monkeypatch.setattr(host, 'JOBS', {})
+    monkeypatch.setattr(host, 'LIMITER', host.BandwidthLimiter())
+    monkeypatch.setattr(host, 'SCHEDULER', host.DownloadScheduler(1, host.start_download, host.launch_failed))
+    monkeypatch.setattr(host, 'PROBE_CACHE', None)
+    return host
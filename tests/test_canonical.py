@@ -0,0 +1,71 @@
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+import canonical  # noqa: E402
+from jobstore import JobStore  # noqa: E402
+
+SIGNED = "https://vdownload-47.sb-cd.com/1/4/14737616-720p.mp4?secure=Wmb7Ku3ZWoP8F3vKDQkMBg,1769506956&m=47&d=1&_tid=14737616"
+
+
+def test_rotating_auth_params_are_stripped():
+    rotated = "HTTPS://vdownload-47.sb-cd.com:443/1/4/14737616-720p.mp4?_tid=99&d=1&m=47&secure=other,1769510000#t=10"
+    assert canonical.canonical(SIGNED) == "https://vdownload-47.sb-cd.com/1/4/14737616-720p.mp4?d=1&m=47"
+    assert canonical.canonical(rotated) == canonical.canonical(SIGNED)
+    assert canonical.canonical("http://cdn/a.m3u8?X-Amz-Signature=1&X-Amz-Expires=2&v=3") == "http://cdn/a.m3u8?v=3"
+
+
+def test_content_key_follows_stream_and_variant_selection():
+    assert canonical.content_key(SIGNED) == canonical.content_key(SIGNED.replace("_tid=14737616", "_tid=1"))
+    assert canonical.content_key(SIGNED) != canonical.content_key(SIGNED.replace("720p", "1080p"))
+    assert canonical.content_key(SIGNED, "max-bandwidth") != canonical.content_key(SIGNED, "bandwidth-cap", 800000)
+
+
+def test_rules_file_adds_and_keeps_params_per_host(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"strip": ["m"], "hosts": {"*.sb-cd.com": {"strip": ["d"], "keep": ["secure"]}}}))
+    rules = canonical.Rules.load(str(path))
+    assert canonical.canonical(SIGNED, rules) == \
+        "https://vdownload-47.sb-cd.com/1/4/14737616-720p.mp4?secure=Wmb7Ku3ZWoP8F3vKDQkMBg%2C1769506956"
+    assert canonical.canonical("http://other/a.mp4?d=1&m=2&secure=x", rules) == "http://other/a.mp4?d=1"
+
+
+def test_store_gains_content_key_column_on_open(tmp_path):
+    db = tmp_path / "jobs.db"
+    old = sqlite3.connect(str(db))
+    old.execute("CREATE TABLE jobs (job_id TEXT PRIMARY KEY, job_key TEXT, url TEXT NOT NULL, pid INTEGER,"
+                " host_pid INTEGER, output_path TEXT NOT NULL, engine TEXT, status TEXT NOT NULL,"
+                " bytes INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL, started REAL, updated REAL NOT NULL,"
+                " finished REAL, exit_code INTEGER, error TEXT)")
+    old.execute("INSERT INTO jobs (job_id, url, output_path, status, created, updated)"
+                " VALUES ('old', 'http://x/a.mp4', '/tmp/a.mp4', 'finished', 1, 1)")
+    old.commit()
+    old.close()
+
+    store = JobStore(db)
+    assert store.get("old")['content_key'] is None
+    store.add("new", "http://x/a.mp4?token=1", "/tmp/a_1.mp4", status="finished", content_key="k1")
+    store.add("live", "http://x/a.mp4?token=2", "/tmp/a_2.mp4", content_key="k1")
+    assert store.by_content_key("k1")['job_id'] == "live"
+    assert store.by_content_key("k1", ("finished",))['job_id'] == "new"
+    assert store.by_content_key("k2") is None
+
+
+def test_canonical_and_manifest_import_without_the_hls_engine():
+    code = ("import sys, canonical, manifest; "
+            "print(sorted({'hls', 'http.client', 'concurrent.futures'} & set(sys.modules)))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+    assert result.stdout.strip() == "[]"
+
+
+def test_the_extension_strips_the_same_parameters():
+    background = os.path.join(os.path.dirname(__file__), '..', 'extension', 'background.js')
+    with open(background, encoding='utf-8') as f:
+        source = f.read()
+    listed = re.search(r"const DEFAULT_VOLATILE_PARAMS = \[(.*?)\];", source, re.S).group(1)
+    assert tuple(re.findall(r"'([^']*)'", listed)) == canonical.DEFAULT_STRIP
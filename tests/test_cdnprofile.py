@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+import cdnprofile  # noqa: E402
+from cdnprofile import ProfileStore  # noqa: E402
+
+FFMPEG = cdnprofile.candidates('ffmpeg')
+DEFAULT, RECONNECT, NO_PERSIST = FFMPEG[0], FFMPEG[1], FFMPEG[2]
+
+
+class _Rng:
+    def __init__(self, value):
+        self.value = value
+
+    def random(self):
+        return self.value
+
+    def choice(self, items):
+        return items[-1]
+
+
+def _store(tmp_path, explore=False):
+    return ProfileStore(tmp_path / "jobs.db", rng=_Rng(0.0 if explore else 1.0))
+
+
+def test_new_hosts_start_from_the_default(tmp_path):
+    store = _store(tmp_path)
+    assert store.choose("cdn.example", "ffmpeg", FFMPEG) == (DEFAULT, 'default')
+    assert cdnprofile.candidates('hls', 4) == [{"workers": 4}, {"workers": 8}, {"workers": 2}]
+    assert cdnprofile.candidates('range', 1) == [{"connections": 1}, {"connections": 2}]
+
+
+def test_settings_that_break_are_dropped_for_ones_that_work(tmp_path):
+    store = _store(tmp_path)
+    store.record("cdn.example", "ffmpeg", DEFAULT, ok=False)
+    # Nothing has worked yet: try the next candidate
+    assert store.choose("cdn.example", "ffmpeg", FFMPEG) == (RECONNECT, 'untried')
+    store.record("cdn.example", "ffmpeg", RECONNECT, ok=True, downloaded=10_000_000, seconds=10)
+    assert store.choose("cdn.example", "ffmpeg", FFMPEG) == (RECONNECT, 'learned')
+    # Other hosts are unaffected
+    assert store.choose("other.example", "ffmpeg", FFMPEG) == (DEFAULT, 'default')
+
+
+def test_fastest_reliable_settings_win_and_history_decays(tmp_path):
+    store = _store(tmp_path)
+    store.record("cdn.example", "ffmpeg", DEFAULT, ok=True, downloaded=30_000_000, seconds=10)
+    store.record("cdn.example", "ffmpeg", NO_PERSIST, ok=True, downloaded=10_000_000, seconds=10)
+    assert store.choose("cdn.example", "ffmpeg", FFMPEG) == (DEFAULT, 'learned')
+
+    for _ in range(3):
+        store.record("cdn.example", "ffmpeg", DEFAULT, ok=False)
+    stats = {entry['settings']['persistent']: entry for entry in store.stats("cdn.example")}
+    assert stats[True]['failure_rate'] > cdnprofile.MAX_FAILURE_RATE
+    assert stats[True]['throughput'] == 3_000_000
+    assert store.choose("cdn.example", "ffmpeg", FFMPEG) == (NO_PERSIST, 'learned')
+    assert store.hosts() == ["cdn.example"]
+    assert store.forget("cdn.example") == 2 and store.hosts() == []
+
+
+def test_exploration_tries_undersampled_settings(tmp_path):
+    store = _store(tmp_path, explore=True)
+    store.record("cdn.example", "hls", {"workers": 4}, ok=True, downloaded=1000, seconds=1)
+    options = cdnprofile.candidates('hls', 4)
+    assert store.choose("cdn.example", "hls", options) == ({"workers": 2}, 'explore')
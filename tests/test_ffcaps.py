@@ -0,0 +1,63 @@
+import os
+import stat
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+import ffcaps  # noqa: E402
+
+FAKE_FFMPEG = """#!/bin/sh
+echo "$@" >> "$0.calls"
+case "$*" in
+  *-version*) echo "ffmpeg version 6.1.1 Copyright (c) 2000-2023 the FFmpeg developers" ;;
+  *-protocols*) printf 'Supported file protocols:\\nInput:\\n  file\\n  http\\n  https\\nOutput:\\n  file\\n' ;;
+  *demuxer=hls*) printf 'hls demuxer AVOptions:\\n  -http_persistent   <boolean>  .D.... Use persistent HTTP connections\\n' ;;
+  *protocol=http*) printf 'http AVOptions:\\n  -multiple_requests <boolean>  .D.... use persistent connections\\n' ;;
+esac
+"""
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="uses a shell script as a stand-in ffmpeg")
+def test_discovery_is_cached_until_the_binary_changes(tmp_path):
+    binary = tmp_path / "ffmpeg"
+    binary.write_text(FAKE_FFMPEG)
+    binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+    cache = str(tmp_path / "caps.json")
+    calls = tmp_path / "ffmpeg.calls"
+
+    info = ffcaps.discover(cache, lambda: str(binary))
+    assert info['version'] == '6.1.1'
+    assert info['protocols'] == ['file', 'http', 'https']
+    assert info['hls_options'] == ['http_persistent']
+    probes = len(calls.read_text().splitlines())
+
+    assert ffcaps.discover(cache, lambda: pytest.fail("cache should be used")) == info
+    assert len(calls.read_text().splitlines()) == probes
+
+    binary.write_text(FAKE_FFMPEG + "\n# upgraded\n")
+    ffcaps.discover(cache, lambda: str(binary))
+    assert len(calls.read_text().splitlines()) == probes * 2
+
+
+def test_missing_binary_is_not_cached(tmp_path):
+    cache = tmp_path / "caps.json"
+    info = ffcaps.discover(str(cache), lambda: str(tmp_path / "nope"))
+    assert info['version'] is None and not cache.exists()
+
+
+def test_input_options_only_use_supported_flags():
+    caps = {"hls_options": ["http_persistent"], "http_options": ["multiple_requests"]}
+    assert ffcaps.input_options(caps, "https://cdn/a.m3u8", True) == ['-http_persistent', '1']
+    assert ffcaps.input_options(caps, "https://cdn/a.mp4", False) == ['-multiple_requests', '1']
+    assert ffcaps.input_options(caps, "/tmp/a.part", False) == []
+
+
+def test_input_options_follow_the_cdn_profile():
+    caps = {"hls_options": ["http_persistent", "http_multiple"],
+            "http_options": ["multiple_requests", "reconnect", "reconnect_streamed"]}
+    assert ffcaps.input_options(caps, "https://cdn/a.m3u8", True, {"persistent": False, "reconnect": False}) == []
+    assert ffcaps.input_options(caps, "https://cdn/a.m3u8", True, {"persistent": False, "reconnect": True}) == \
+        ['-reconnect', '1', '-reconnect_streamed', '1']
+    assert ffcaps.input_options(caps, "https://cdn/a.mp4", False, {"persistent": True, "reconnect": True}) == \
+        ['-multiple_requests', '1', '-reconnect', '1', '-reconnect_streamed', '1']
@@ -0,0 +1,48 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+from ffparse import FFmpegOutputParser, parse_input_info  # noqa: E402
+
+SAMPLES = os.path.join(os.path.dirname(__file__), '..', 'native-host', 'samples')
+
+
+def test_stderr_header_stats_and_errors_in_one_pass():
+    parser = FFmpegOutputParser()
+    with open(os.path.join(SAMPLES, 'ffmpeg-hls-stderr.log')) as f:
+        for line in f:
+            parser.feed_stderr(line.rstrip('\n'))
+
+    assert parser.duration == 600.0
+    assert parser.input_bitrate_kbps == 2200.0
+    assert parser.estimated_total == 2200 * 1000 / 8 * 600
+    assert parser.progress['out_time'] == 600.0
+    assert parser.progress['speed'] == 8.44
+    assert parser.progress['downloaded'] == (74 * 1100 + 100) * 1024
+    assert [e for e in parser.errors if 'segment 77' in e]
+    assert not any('Opening' in e for e in parser.errors)
+
+
+def test_progress_stream_yields_one_block_per_progress_line():
+    parser = FFmpegOutputParser()
+    blocks = []
+    with open(os.path.join(SAMPLES, 'ffmpeg-progress.log')) as f:
+        for line in f:
+            block = parser.feed_progress(line)
+            if block is not None:
+                blocks.append(block)
+
+    assert len(blocks) == 120
+    assert blocks[0] == {"out_time": 5.0, "downloaded": 275000, "speed": 8.41,
+                         "bitrate_kbps": 2201.3, "state": "continue"}
+    assert blocks[-1]['state'] == 'end' and parser.progress is blocks[-1]
+
+
+def test_input_info_lists_input_streams_only():
+    with open(os.path.join(SAMPLES, 'ffmpeg-hls-stderr.log')) as f:
+        info = parse_input_info(f.read())
+    assert info['container'] == 'hls' and info['duration'] == 600.0 and info['bitrate_kbps'] == 2200.0
+    assert info['streams'] == [
+        {"index": 0, "type": "video", "codec": "h264", "language": None, "width": 1280, "height": 720},
+        {"index": 1, "type": "audio", "codec": "aac", "language": None},
+    ]
@@ -0,0 +1,109 @@
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+import framing  # noqa: E402
+from framing import HEADER, FrameReader, FrameWriter, FramingError  # noqa: E402
+
+
+class TrickleStream(io.RawIOBase):
+    """Hands out at most step bytes per read, like a slow pipe"""
+
+    def __init__(self, data, step=3):
+        self.data = data
+        self.position = 0
+        self.step = step
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = min(len(buffer), self.step, len(self.data) - self.position)
+        buffer[:count] = self.data[self.position:self.position + count]
+        self.position += count
+        return count
+
+
+class RecordingStream(io.BytesIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+
+def _frames(data):
+    frames = []
+    position = 0
+    while position < len(data):
+        size = HEADER.unpack_from(data, position)[0]
+        frames.append(framing.decode(data[position + 4:position + 4 + size]))
+        position += 4 + size
+    return frames
+
+
+def test_reader_handles_partial_reads():
+    payload = b''.join(HEADER.pack(len(body)) + body
+                       for body in (b'{"command":"list"}', '{"title":"café"}'.encode('utf-8')))
+    reader = FrameReader(TrickleStream(payload))
+    assert reader.read() == {"command": "list"}
+    assert reader.read() == {"title": "café"}
+    assert reader.read() is None
+
+
+def test_reader_rejects_truncated_and_oversized_frames():
+    with pytest.raises(FramingError):
+        FrameReader(io.BytesIO(b'\x10\x00')).read()
+    with pytest.raises(FramingError):
+        FrameReader(io.BytesIO(HEADER.pack(20) + b'{"a":1}')).read()
+    with pytest.raises(FramingError):
+        FrameReader(io.BytesIO(HEADER.pack(1000) + b'{}'), max_size=100).read()
+
+
+def test_writer_sends_header_and_payload_in_one_write():
+    stream = RecordingStream()
+    FrameWriter(stream).send({"status": "ok", "id": 7})
+    assert stream.writes == 1
+    assert _frames(stream.getvalue()) == [{"status": "ok", "id": 7}]
+
+
+def test_large_reply_is_split_into_chunks():
+    stream = io.BytesIO()
+    message = {"status": "ok", "history": ["x" * 100] * 50}
+    writer = FrameWriter(stream, max_size=1000, chunk_payload=600)
+    writer.send(message)
+    writer.send({"status": "small"})
+
+    frames = _frames(stream.getvalue())
+    chunks = frames[:-1]
+    assert all(len(framing.encode(frame)) <= 1000 for frame in chunks)
+    assert [frame['index'] for frame in chunks] == list(range(chunks[0]['count']))
+    assert framing.join_chunks(chunks) == message
+    assert frames[-1] == {"status": "small"}
+
+
+def test_stdlib_codec_round_trips(monkeypatch):
+    monkeypatch.setattr(framing, 'orjson', None)
+    message = {"title": "café", "size": 12, "eta": None}
+    assert framing.decode(memoryview(framing.encode(message))) == message
+
+
+def test_orjson_is_loaded_only_for_persistent_ports(monkeypatch):
+    monkeypatch.setattr(framing, 'orjson', None)
+    monkeypatch.setattr(framing, '_orjson_wanted', True)
+    loads = []
+    monkeypatch.setattr(framing, 'load_orjson', lambda: loads.append(1))
+    stream = io.BytesIO()
+    writer = framing.FrameWriter(stream)
+    for number in range(3):
+        writer.send({"command": "get-progress", "n": number})
+    reader = framing.FrameReader(io.BytesIO(stream.getvalue()))
+    assert reader.read() == {"command": "get-progress", "n": 0} and loads == []
+    reader.read()
+    reader.read()
+    assert loads == [1]
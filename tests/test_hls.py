@@ -0,0 +1,118 @@
+import http.server
+import os
+import socketserver
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+import hls  # noqa: E402
+
+MASTER = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2"
+low/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2400000,RESOLUTION=1280x720
+high/index.m3u8
+"""
+
+
+def _media_playlist(count):
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:2", "#EXT-X-MAP:URI=\"init.mp4\""]
+    for index in range(count):
+        lines += ["#EXTINF:2.0,", f"seg{index}.m4s"]
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def test_parse_master_playlist_attributes():
+    playlist = hls.parse_playlist(MASTER, "http://cdn/v/master.m3u8")
+    assert playlist['type'] == 'master'
+    assert [v['bandwidth'] for v in playlist['variants']] == [800000, 2400000]
+    assert playlist['variants'][0]['CODECS'] == 'avc1.4d401e,mp4a.40.2'
+    assert playlist['variants'][1]['uri'] == 'http://cdn/v/high/index.m3u8'
+
+
+def test_parse_media_playlist_byteranges():
+    text = "#EXTM3U\n#EXTINF:4,\n#EXT-X-BYTERANGE:100@0\nall.ts\n#EXTINF:4,\n#EXT-X-BYTERANGE:50\nall.ts\n#EXT-X-ENDLIST\n"
+    playlist = hls.parse_playlist(text, "http://cdn/a/index.m3u8")
+    assert [s.byterange for s in playlist['segments']] == [(0, 100), (100, 50)]
+    assert playlist['endlist']
+
+
+@pytest.fixture
+def hls_server():
+    files = {
+        "/master.m3u8": MASTER.encode(),
+        "/high/index.m3u8": _media_playlist(12).encode(),
+        "/high/init.mp4": b"INIT",
+    }
+    for index in range(12):
+        files[f"/high/seg{index}.m4s"] = f"[{index:02d}]".encode()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body = files.get(self.path)
+            self.send_response(200 if body else 404)
+            self.send_header("Content-Length", str(len(body or b"")))
+            self.end_headers()
+            self.wfile.write(body or b"")
+
+        def log_message(self, *args):
+            pass
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_hls_writes_segments_in_order(hls_server, tmp_path):
+    output = tmp_path / "out.part"
+    progress = []
+    written = hls.download_hls(hls_server + "/master.m3u8", str(output), workers=4,
+                               on_progress=lambda done, total, size: progress.append((done, total)))
+    expected = b"INIT" + b"".join(f"[{i:02d}]".encode() for i in range(12))
+    assert output.read_bytes() == expected
+    assert written == len(expected)
+    assert progress[-1] == (12, 12)
+
+
+def test_live_playlist_is_left_to_ffmpeg(tmp_path):
+    class Fetcher:
+        def get_text(self, url):
+            return "#EXTM3U\n#EXTINF:2,\nseg0.ts\n"
+
+    with pytest.raises(hls.UnsupportedPlaylist):
+        hls.download_hls("http://cdn/live.m3u8", str(tmp_path / "x"), fetcher=Fetcher())
+
+
+def test_interrupted_download_resumes_from_checkpoint(hls_server, tmp_path):
+    output = tmp_path / "out.part"
+    cancel = threading.Event()
+    checkpoints = []
+
+    def stop_after_five(done, total, size):
+        if done == 5:
+            cancel.set()
+
+    with pytest.raises(hls.DownloadCancelled):
+        hls.download_hls(hls_server + "/master.m3u8", str(output), workers=2,
+                         on_progress=stop_after_five, cancel=cancel,
+                         on_checkpoint=checkpoints.append)
+    assert checkpoints[-1]['segments_done'] == 5
+
+    # Bytes past the checkpoint (never journaled) must be discarded
+    with open(output, 'ab') as f:
+        f.write(b"GARBAGE")
+
+    progress = []
+    hls.download_hls(hls_server + "/master.m3u8", str(output), workers=2, resume=checkpoints[-1],
+                     on_progress=lambda done, total, size: progress.append(done))
+    expected = b"INIT" + b"".join(f"[{i:02d}]".encode() for i in range(12))
+    assert output.read_bytes() == expected
+    assert progress[0] == 6
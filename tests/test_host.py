@@ -1,5 +1,20 @@
-import subprocess
+import io
+import json
 import os
+import struct
+import subprocess
+import sys
+import threading
+import types
+
+import pytest
+
+import cdnprofile
+import ffcaps
+import hls
+import host
+from ffparse import parse_progress_block
+from test_server import MediaServer
 
 # Test 1: Verify FFmpeg is installed in the CI environment
 def test_ffmpeg_installation():
@@ -18,4 +33,475 @@ def test_download_command_construction():
     # Assert the command structure is correct (Basic Logic Test)
     assert command[0] == 'ffmpeg'
     assert command[3] == url
-    assert command[8] == path
\ No newline at end of file
+    assert command[8] == path
+
+# Test 3: Persistent host loop - several commands over one stdin/stdout stream
+
+
+def _frame(msg):
+    encoded = json.dumps(msg).encode('utf-8')
+    return struct.pack('@I', len(encoded)) + encoded
+
+
+def _unframe(data):
+    messages = []
+    while data:
+        length = struct.unpack('@I', data[:4])[0]
+        messages.append(json.loads(data[4:4 + length]))
+        data = data[4 + length:]
+    return messages
+
+
+class _Stream:
+    def __init__(self, data=b''):
+        self.buffer = io.BytesIO(data)
+
+
+def test_main_serves_multiple_commands_with_ids(monkeypatch):
+    stdin = _Stream(_frame({"command": "list", "id": 1}) + _frame({"command": "bogus", "id": 2}))
+    stdout = _Stream()
+    monkeypatch.setattr(sys, 'stdin', stdin)
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    monkeypatch.setattr(host, '_reader', None)
+    monkeypatch.setattr(host, '_writer', None)
+
+    host.main()
+
+    replies = _unframe(stdout.buffer.getvalue())
+    assert [r['id'] for r in replies] == [1, 2]
+    assert replies[0]['status'] == 'jobs'
+    assert replies[1]['status'] == 'error'
+
+
+def test_main_survives_a_message_that_is_not_json(monkeypatch):
+    bad = b'{"command": "list", '
+    stdin = _Stream(struct.pack('@I', len(bad)) + bad + _frame({"command": "list", "id": 2})
+                    + struct.pack('@I', 100) + b'{"trunc')
+    stdout = _Stream()
+    monkeypatch.setattr(sys, 'stdin', stdin)
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    monkeypatch.setattr(host, '_reader', None)
+    monkeypatch.setattr(host, '_writer', None)
+
+    host.main()  # returns at the truncated frame
+
+    replies = _unframe(stdout.buffer.getvalue())
+    assert [r['status'] for r in replies] == ['error', 'jobs']
+    assert replies[1]['id'] == 2
+
+
+def test_download_without_url_is_an_error():
+    reply = host.handle_message({"command": "download", "id": "x"})
+    assert reply == {"status": "error", "message": "No URL provided", "id": "x"}
+
+
+# Test 4: -progress pipe output drives job progress and pushed events
+class _FakeProcess:
+    def __init__(self, stdout_lines, returncode=0):
+        self.stdout = io.BytesIO(''.join(stdout_lines).encode('utf-8'))
+        self.returncode = returncode
+        self.pid = 4242
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+
+def _estimator(**attributes):
+    estimator = host.ProgressEstimator()
+    estimator.__dict__.update(attributes)
+    return estimator
+
+
+def _fake_job(process):
+    return {
+        "job_id": "job1", "pid": process.pid, "url": "http://x/a.m3u8", "path": "/tmp/a.mp4",
+        "status": "downloading", "process": process, "progress": {},
+        "estimator": _estimator(duration=10.0), "stderr_tail": [],
+        "engine": "ffmpeg", "cancel": threading.Event(), "temp_files": [],
+        "parser": host.FFmpegOutputParser(),
+    }
+
+
+def test_parse_progress_block():
+    progress = parse_progress_block({
+        "out_time_us": "5000000", "total_size": "1048576",
+        "speed": "2.5x", "bitrate": "1677.7kbits/s", "progress": "continue",
+    })
+    assert progress == {"out_time": 5.0, "downloaded": 1048576, "speed": 2.5,
+                        "bitrate_kbps": 1677.7, "state": "continue"}
+
+
+def test_progress_lines_push_progress_events(monkeypatch, tmp_path):
+    events = []
+    monkeypatch.setattr(host, 'send_message', events.append)
+    monkeypatch.setattr(host.SUPERVISOR, 'watch', lambda process, **callbacks: None)
+    host.EVENTS_ENABLED.set()
+    try:
+        process = _FakeProcess([
+            "total_size=100\n", "out_time_us=2500000\n", "speed=1x\n", "progress=continue\n",
+            "total_size=400\n", "out_time_us=10000000\n", "speed=1x\n", "progress=end\n",
+        ])
+        job = _fake_job(process)
+        job['path'] = str(tmp_path / "a.mp4")
+        (tmp_path / "a.mp4").write_bytes(b"x" * 400)
+        host.supervise_ffmpeg(job)
+        for line in process.stdout:
+            host.handle_progress_line(job, line)
+        host.handle_ffmpeg_exit(job, process.wait())
+    finally:
+        host.EVENTS_ENABLED.clear()
+
+    assert job['status'] == 'finished'
+    # The first block is pushed, the second is rate-limited until progress=end
+    progress = [e for e in events if e['event'] == 'progress']
+    assert [e['percent'] for e in progress] == [25.0, 100.0]
+    assert progress[-1]['downloaded'] == 400
+    # Then the terminal event, straight from the exit code
+    assert events[-1]['event'] == 'finished'
+    assert events[-1]['status'] == 'finished' and events[-1]['exit_code'] == 0
+    assert events[-1]['size'] == 400 and events[-1]['duration'] == 10.0
+
+
+def test_failed_and_empty_exits_are_terminal_failures(monkeypatch, tmp_path):
+    events = []
+    monkeypatch.setattr(host, 'send_message', events.append)
+    monkeypatch.setattr(host.SUPERVISOR, 'watch', lambda process, **callbacks: None)
+    host.EVENTS_ENABLED.set()
+    try:
+        for job_id, returncode in (("crashed", 1), ("empty", 0)):
+            job = _fake_job(_FakeProcess([], returncode))
+            job['job_id'] = job_id
+            job['path'] = str(tmp_path / f"{job_id}.mp4")
+            host.job_store().add(job_id, job['url'], job['path'], status='downloading')
+            host.supervise_ffmpeg(job)
+            host.handle_stderr_line(job, b"https://x/a.m3u8: Server returned 403 Forbidden\n")
+            host.handle_ffmpeg_exit(job, returncode)
+    finally:
+        host.EVENTS_ENABLED.clear()
+
+    crashed, empty = events
+    assert crashed['status'] == 'failed' and crashed['exit_code'] == 1
+    assert '403' in crashed['error']
+    assert empty['status'] == 'failed' and empty['exit_code'] == 0
+    assert empty['error'] == "Output file is missing or empty"
+    assert host.job_store().get("empty")['status'] == 'failed'
+
+
+def test_download_with_missing_ffmpeg_reports_error_and_frees_slot(monkeypatch, host_state):
+    monkeypatch.setattr(host, 'FFMPEG_PATH', '/nonexistent/ffmpeg')
+    reply = host.handle_message({"command": "download", "url": "http://x/a.flv", "filename": "a.mp4"})
+    assert reply['status'] == 'error'
+    assert reply['message'].startswith('FFmpeg not found')
+    assert host.SCHEDULER.stats()['running'] == 0
+
+
+def test_commands_open_the_store_and_logs_only_when_they_need_them(monkeypatch, host_logs):
+    monkeypatch.setattr(host, 'FFMPEG_INFO', None)
+    monkeypatch.setattr(host, 'ffmpeg_info', lambda: pytest.fail("list must not discover FFmpeg"))
+    subscribed = host.handle_message({"command": "subscribe"})
+    assert subscribed['status'] == 'subscribed' and '_tid' in subscribed['strip']
+    host.EVENTS_ENABLED.clear()
+    assert not host_logs.exists() and host.STORE is None
+
+    reply = host.handle_message({"command": "list"})
+    assert reply['status'] == 'jobs' and reply['ffmpeg']['version'] is None
+    assert (host_logs / "jobs.db").exists() and host.STORE is not None
+
+
+def test_pid_alive_never_signals_on_windows(monkeypatch):
+    calls = []
+    monkeypatch.setattr(host.sys, 'platform', 'win32')
+    monkeypatch.setitem(sys.modules, 'psutil', types.SimpleNamespace(pid_exists=lambda pid: calls.append(pid) or True))
+    monkeypatch.setattr(host.os, 'kill', lambda *args: pytest.fail("os.kill terminates processes on Windows"))
+    assert host.pid_alive(4242) and calls == [4242]
+
+
+def test_kill_refuses_pids_the_job_store_does_not_know():
+    reply = host.handle_message({"command": "kill", "pid": os.getpid()})
+    assert reply == {"status": "error", "message": "Unknown job"}
+
+
+def test_finished_job_is_answered_from_the_job_store():
+    host.job_store().add("stored1", "http://x/a.mp4", "/tmp/stored1.mp4", status="finished", bytes=2048, exit_code=0)
+
+    reply = host.handle_message({"command": "get-progress", "job_id": "stored1"})
+    assert reply['state'] == 'finished' and reply['downloaded'] == 2048
+    listed = host.handle_message({"command": "list"})
+    assert [r['job_id'] for r in listed['history']] == ["stored1"]
+
+
+def test_progress_batch_answers_live_stored_and_unknown_jobs(monkeypatch):
+    host.job_store().add("done1", "http://x/b.mp4", "/tmp/done1.mp4", status="finished", bytes=10)
+    live = _fake_job(_FakeProcess([]))
+    live['job_id'] = "live1"
+    live['progress'] = {"downloaded": 500, "out_time": 5.0}
+    live['estimator'].update(500, position=5.0)
+    monkeypatch.setitem(host.JOBS, "live1", live)
+
+    reply = host.handle_message({"command": "get-progress-batch", "job_ids": ["live1", "done1", "gone"]})
+    jobs = reply['jobs']
+    assert reply['status'] == 'progress-batch'
+    assert jobs['live1']['downloaded'] == 500 and jobs['live1']['percent'] == 50.0
+    assert jobs['done1']['state'] == 'finished'
+    assert jobs['gone']['status'] == 'error'
+
+    everything = host.handle_message({"command": "get-progress-batch"})['jobs']
+    assert "live1" in everything and "done1" not in everything
+
+
+def test_limit_command_changes_cap_and_rejects_unknown_jobs(host_state):
+    reply = host.handle_message({"command": "limit", "max_rate": 2 * 1024 * 1024})
+    assert reply['status'] == 'limited' and reply['limiter']['max_rate'] == 2 * 1024 * 1024
+    assert host.handle_message({"command": "limit", "max_rate": 0})['limiter']['max_rate'] is None
+    reply = host.handle_message({"command": "limit", "job_id": "nope", "weight": 2})
+    assert reply == {"status": "error", "message": "Unknown job"}
+
+
+def test_duplicate_requests_attach_or_are_answered_from_disk(monkeypatch, host_state):
+    # Jobs stay queued: nothing is launched
+    monkeypatch.setattr(host, 'SCHEDULER', host.DownloadScheduler(1, lambda job: None))
+    url = "https://cdn.example/v/720p.mp4?secure=aaa,1769506956&m=47&_tid=1"
+
+    first = host.handle_message({"command": "download", "url": url, "filename": "clip.mp4"})
+    fresher = url.replace("aaa", "bbb").replace("_tid=1", "_tid=2")
+    again = host.handle_message({"command": "download", "url": fresher, "filename": "other.mp4"})
+    assert first['status'] == 'success' and 'attached' not in first
+    assert again['attached'] and again['job_id'] == first['job_id'] and again['filename'] == "clip.mp4"
+    assert host.JOBS[first['job_id']]['url'] == fresher
+    forced = host.handle_message({"command": "download", "url": url, "filename": "clip.mp4", "force": True})
+    assert forced['job_id'] != first['job_id'] and forced['filename'] == "clip_1.mp4"
+
+    # Settle both as finished downloads on disk
+    for reply in (first, forced):
+        job = host.JOBS[reply['job_id']]
+        with open(job['path'], 'wb') as f:
+            f.write(b"x" * 100)
+        job['status'] = 'finished'
+        host.finish_job(job)
+
+    exists = host.handle_message({"command": "download", "url": fresher})
+    assert exists['status'] == 'exists' and exists['job_id'] == forced['job_id'] and exists['size'] == 100
+    # A file changed since is downloaded again
+    with open(exists['path'], 'ab') as f:
+        f.write(b"more")
+    assert host.handle_message({"command": "download", "url": fresher})['status'] == 'success'
+
+
+def test_queued_jobs_that_fail_to_start_or_are_killed_settle(monkeypatch, host_state):
+    events = []
+    monkeypatch.setattr(host, 'push_event', events.append)
+
+    def start(job):
+        if job['url'].endswith('bad.flv'):
+            host.LIMITER.register(job['job_id'], 1)
+            raise FileNotFoundError('ffmpeg')
+    monkeypatch.setattr(host, 'SCHEDULER', host.DownloadScheduler(1, start, host.launch_failed))
+
+    first, bad, killed = (host.handle_message({"command": "download", "url": f"http://cdn/{name}.flv"})
+                          for name in ('first', 'bad', 'killed'))
+    assert host.handle_message({"command": "kill", "job_id": killed['job_id']})['status'] == 'killed'
+    host.finish_job(host.JOBS[first['job_id']])
+
+    assert host.JOBS == {}
+    assert host.job_store().get(bad['job_id'])['status'] == 'failed'
+    assert host.job_store().get(killed['job_id'])['status'] == 'stopped'
+    assert not host.job_journal().load(host.job_store().get(killed['job_id'])['job_key'])
+    assert host.job_journal().load(host.job_store().get(bad['job_id'])['job_key'])['status'] == 'interrupted'
+    assert host.LIMITER.stats()['jobs'] == {}
+    settled = {event['job_id']: event['status'] for event in events if event.get('event') == 'finished'}
+    assert settled[bad['job_id']] == 'failed' and settled[killed['job_id']] == 'stopped'
+
+
+def test_hls_fallback_that_cannot_start_ffmpeg_fails_the_job(monkeypatch, host_state):
+    monkeypatch.setattr(host, 'SCHEDULER', host.DownloadScheduler(1, lambda job: None))
+    monkeypatch.setattr(host, 'resolve_job_stream',
+                        lambda job: {"media_url": job['url'], "audio_url": None, "program": None,
+                                     "variant": None, "rendition": None})
+
+    def unsupported(*args, **kwargs):
+        raise hls.UnsupportedPlaylist("SAMPLE-AES")
+
+    def missing(*args, **kwargs):
+        raise FileNotFoundError("ffmpeg")
+    monkeypatch.setattr(hls, 'download_hls', unsupported)
+    monkeypatch.setattr(host, 'launch_ffmpeg', missing)
+
+    reply = host.handle_message({"command": "download", "url": "http://cdn/v.m3u8", "engine": "hls"})
+    job = host.JOBS[reply['job_id']]
+    job['profile'] = {}
+    host.run_hls_job(job)
+    assert job['status'] == 'failed' and reply['job_id'] not in host.JOBS
+    assert host.job_store().get(reply['job_id'])['status'] == 'failed'
+    assert host.SCHEDULER.stats()['running'] == 0
+
+
+@pytest.mark.parametrize("audio_url,inputs,map_args", [
+    (None, ["http://cdn/master.m3u8"], ['-map', '0:p:2:v?', '-map', '0:p:2:a?']),
+    ("http://cdn/en.m3u8", ["http://cdn/1080p.m3u8", "http://cdn/en.m3u8"], ['-map', '0:v', '-map', '1:a']),
+])
+def test_ffmpeg_engine_maps_only_the_chosen_variant(monkeypatch, audio_url, inputs, map_args):
+    stream = {"media_url": "http://cdn/1080p.m3u8", "audio_url": audio_url, "program": 2,
+              "variant": {"bandwidth": 4000000}, "rendition": None}
+    monkeypatch.setattr(host, 'resolve_job_stream', lambda job: stream)
+    launched = []
+    monkeypatch.setattr(host, 'launch_ffmpeg', lambda job, inputs, map_args=(): launched.append((inputs, map_args)))
+    job = {"job_id": "j", "url": "http://cdn/master.m3u8", "probe": None, "selection": None}
+    host.run_ffmpeg_job(job)
+    assert launched == [(inputs[0] if len(inputs) == 1 else inputs, map_args)]
+
+
+def test_download_opens_its_own_signed_playlists_not_the_probes(monkeypatch):
+    def stream(sig, program=1):
+        return {"media_url": f"http://cdn/720p.m3u8?sig={sig}", "audio_url": None, "program": program,
+                "variant": {"bandwidth": 2500000}, "rendition": None}
+    probe = {"stream": stream("old"), "streams": [{"index": 0, "type": "video", "input": 0}], "duration": 10.0}
+    fresh = [stream("new")]
+    monkeypatch.setattr(host, 'resolve_job_stream', lambda job: fresh[0])
+    launched = []
+    monkeypatch.setattr(host, 'launch_ffmpeg', lambda job, inputs, map_args=(): launched.append((inputs, map_args)))
+    host.run_ffmpeg_job({"job_id": "j", "url": "http://cdn/master.m3u8?sig=new", "probe": probe,
+                         "selection": {"type": "audio", "max_height": None, "languages": ["en"], "subtitles": False}})
+    # Probed streams apply: no audio in English there, so all audio is kept
+    assert launched[-1] == (["http://cdn/720p.m3u8?sig=new"], ['-map', '0:a'])
+    assert host.probed_streams(probe, fresh[0]) is probe['streams']
+    assert host.probed_streams(probe, stream("new", program=2)) is None
+
+
+FAKE_PROBE_FFMPEG = """#!/bin/sh
+cat >&2 <<'EOF'
+Input #0, hls, from 'x':
+  Duration: 00:00:40.00, start: 0.000000, bitrate: 0 kb/s
+  Stream #0:0: Video: h264 (High), yuv420p, 1920x1080, 25 fps
+  Stream #0:1(eng): Audio: aac (LC), 48000 Hz, stereo
+EOF
+exit 1
+"""
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="uses a shell script as a stand-in ffmpeg")
+def test_download_reuses_the_probe_of_its_stream(monkeypatch, tmp_path, host_state):
+    ffmpeg = tmp_path / "ffmpeg"
+    ffmpeg.write_text(FAKE_PROBE_FFMPEG)
+    ffmpeg.chmod(0o755)
+    monkeypatch.setattr(host, 'FFMPEG_PATH', str(ffmpeg))
+    monkeypatch.setattr(host, 'FFMPEG_INFO', {"path": str(ffmpeg), "version": "test"})
+    monkeypatch.setattr(host, 'DEFAULT_ENGINE', 'ffmpeg')
+    launched = []
+    started = threading.Event()
+
+    def fake_launch(job, inputs, map_args=()):
+        launched.append((job, inputs, list(map_args)))
+        started.set()
+    monkeypatch.setattr(host, 'launch_ffmpeg', fake_launch)
+
+    with MediaServer(segments=10, segment_duration=4.0) as server:
+        url = server.url('hls/master.m3u8')
+        probed = host.handle_message({"command": "probe", "url": url + "?token=1", "wait": True})
+        assert probed['status'] == 'probed' and probed['duration'] == 40.0
+        assert [(s['input'], s['type'], s['codec']) for s in probed['streams']] == \
+            [(0, 'video', 'h264'), (0, 'audio', 'aac')]
+        again = host.handle_message({"command": "probe", "url": url + "?token=2"})
+        assert again['status'] == 'probed' and again['key'] == probed['key']
+
+        reply = host.handle_message({"command": "download", "url": url + "?token=3", "filename": "clip.mp4"})
+        assert reply['status'] == 'success'
+        assert started.wait(5)
+
+    job, inputs, map_args = launched[0]
+    assert job['probe']['duration'] == 40.0
+    assert inputs == [server.url('hls/v2/index.m3u8')] and map_args == ['-map', '0:v?', '-map', '0:a?']
+    assert job['expected_size'] == 40 * 6000000 // 8
+
+
+def test_stream_selection_maps_streams_and_is_its_own_download(monkeypatch, host_state):
+    # host_state runs one job at a time: the second waits instead of fetching
+    monkeypatch.setattr(host, 'DEFAULT_ENGINE', 'auto')
+    launched = []
+    monkeypatch.setattr(host, 'launch_ffmpeg', lambda job, inputs, map_args=(): launched.append(list(map_args)))
+
+    bad = host.handle_message({"command": "download", "url": "http://cdn/a.mp4", "select": "karaoke"})
+    assert bad['status'] == 'error'
+
+    # Range requests copy every byte, so a selective download goes to FFmpeg
+    audio = host.handle_message({"command": "download", "url": "http://cdn/a.mp4?token=1",
+                                 "select": {"type": "audio", "languages": "en"}})
+    job = host.JOBS[audio['job_id']]
+    assert job['engine'] == 'ffmpeg' and host.job_summary(job)['select']['type'] == 'audio'
+    assert launched == [['-map', '0:a']]
+
+    # The whole file is different content, not a duplicate of the audio
+    whole = host.handle_message({"command": "download", "url": "http://cdn/a.mp4?token=2"})
+    assert whole['status'] == 'success' and not whole.get('attached') and whole['queue_position'] == 1
+    assert host.JOBS[whole['job_id']]['engine'] == 'range'
+
+
+def test_job_outcomes_teach_the_cdn_profile(monkeypatch, host_state):
+    monkeypatch.setattr(host, 'DEFAULT_ENGINE', 'ffmpeg')
+    monkeypatch.setattr(host, 'CDN_PROFILES', True)
+    monkeypatch.setattr(cdnprofile, 'EXPLORE_RATE', 0)
+    monkeypatch.setattr(host, 'launch_ffmpeg', lambda job, inputs, map_args=(): None)
+
+    def run(status):
+        reply = host.handle_message({"command": "download", "url": "http://CDN.example/a.flv", "force": True})
+        job = host.JOBS[reply['job_id']]
+        profile = job['profile']
+        job['status'] = status
+        host.finish_job(job)
+        return profile
+
+    assert run('failed') == {"persistent": True, "reconnect": False}
+    assert run('stopped') == {"persistent": True, "reconnect": True}
+    assert run('failed') == {"persistent": True, "reconnect": True}
+    # Both failed; the next untried settings are next
+    assert run('failed') == {"persistent": False, "reconnect": True}
+    reply = host.handle_message({"command": "profiles"})
+    assert [entry['failure_rate'] for entry in reply['profiles']['cdn.example']] == [1.0, 1.0, 1.0]
+
+
+def test_range_downloads_keep_the_source_container(monkeypatch, host_state):
+    monkeypatch.setattr(host, 'SCHEDULER', host.DownloadScheduler(1, lambda job: None))
+    monkeypatch.setattr(host, 'DEFAULT_ENGINE', 'auto')
+
+    def download(url, filename=''):
+        reply = host.handle_message({"command": "download", "url": url, "filename": filename})
+        job = host.JOBS[reply['job_id']]
+        return job['engine'], os.path.basename(job['path'])
+
+    # The range engine copies bytes: WebM stays WebM, whatever it is called
+    assert download("http://cdn/v/talk.webm?sig=1") == ('range', "talk.webm")
+    assert download("http://cdn/v/movie.mov", "movie") == ('range', "movie.mov")
+    assert download("http://cdn/v/clip.webm", "clip.mp4") == ('range', "clip.webm")
+    assert download("http://cdn/v/a.flv", "a") == ('ffmpeg', "a.mp4")
+
+
+def test_a_container_change_goes_to_ffmpeg_not_the_range_engine(monkeypatch, host_state):
+    monkeypatch.setattr(host, 'SCHEDULER', host.DownloadScheduler(1, lambda job: None))
+    monkeypatch.setattr(host, 'DEFAULT_ENGINE', 'auto')
+
+    def download(**msg):
+        reply = host.handle_message(dict(msg, command="download", url="http://cdn/v/clip.mp4"))
+        job = host.JOBS[reply['job_id']]
+        return job['engine'], job['output'], os.path.basename(job['path'])
+
+    assert download(output="ts") == ('ffmpeg', 'ts', "clip.ts")
+    assert download(filename="clip.mkv", force=True) == ('ffmpeg', 'mkv', "clip.mkv")
+    assert download(output="fragmented", engine="range", force=True) == ('ffmpeg', 'fragmented', "clip.mp4")
+    assert download(output="faststart", force=True) == ('range', 'faststart', "clip_1.mp4")
+
+
+def test_a_missing_ffmpeg_is_looked_for_again(monkeypatch):
+    found = [{"path": "/usr/bin/ffmpeg", "stat": None, "version": None},
+             {"path": "/usr/local/bin/ffmpeg", "stat": [1, 2], "version": "7.1"}]
+    calls = []
+    monkeypatch.setattr(ffcaps, 'discover', lambda cache_path, find_path: calls.append(1) or found[len(calls) - 1])
+    monkeypatch.setattr(host, 'FFMPEG_INFO', None)
+    monkeypatch.setattr(host, 'FFMPEG_PATH', None)
+    monkeypatch.setattr(host, 'FFMPEG_RECHECK_INTERVAL', 60.0)
+
+    assert host.ffmpeg_info()['version'] is None
+    assert host.ffmpeg_info()['version'] is None and len(calls) == 1
+    # Installed since: found once the interval is up, then kept
+    monkeypatch.setattr(host, 'FFMPEG_RECHECK_INTERVAL', 0.0)
+    assert host.ffmpeg_info()['version'] == "7.1" and host.FFMPEG_PATH == "/usr/local/bin/ffmpeg"
+    host.ffmpeg_info()
+    assert len(calls) == 2
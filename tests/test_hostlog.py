@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+import hostlog  # noqa: E402
+
+
+def _records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_json_lines_with_job_fields(tmp_path):
+    path = tmp_path / "host.log"
+    logger = hostlog.AsyncLogger(path)
+    logger.log("FFmpeg started", level="INFO", job_id="abc", pid=42, skipped=None)
+    assert logger.flush()
+    logger.close()
+
+    [record] = _records(path)
+    assert record['msg'] == "FFmpeg started"
+    assert record['job_id'] == "abc" and record['pid'] == 42
+    assert record['host_pid'] == os.getpid()
+    assert 'skipped' not in record
+
+
+def test_rotates_by_size(tmp_path):
+    path = tmp_path / "host.log"
+    logger = hostlog.AsyncLogger(path, max_bytes=200, backup_count=2)
+    for index in range(30):
+        logger.log(f"line {index}")
+        logger.flush()
+    logger.close()
+
+    assert os.path.exists(f"{path}.1") and os.path.exists(f"{path}.2")
+    assert not os.path.exists(f"{path}.3")
+    assert _records(path)[-1]['msg'] == "line 29"
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    logger = hostlog.AsyncLogger(tmp_path / "host.log", queue_size=1)
+    for index in range(1000):
+        logger.log(f"tick {index}")
+    logger.close()
+
+    # Every record is either written or accounted for in a drop notice
+    messages = [r['msg'] for r in _records(tmp_path / "host.log")]
+    written = sum(1 for m in messages if m.startswith("tick"))
+    dropped = sum(int(m.split()[2]) for m in messages if m.startswith("Logger dropped"))
+    assert written + dropped == 1000
+
+
+def test_split_level():
+    assert hostlog.split_level("\n[WARN] disk slow") == ("WARN", "disk slow")
+    assert hostlog.split_level("plain") == ("INFO", "plain")
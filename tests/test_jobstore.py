@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+from jobstore import JobStore  # noqa: E402
+
+
+def test_store_lookups_survive_reopen(tmp_path):
+    db = tmp_path / "jobs.db"
+    store = JobStore(db)
+    store.add("a1", "http://cdn/a.m3u8", "/tmp/a.mp4", engine="ffmpeg")
+    store.update("a1", pid=4242, status="downloading", bytes=1024)
+    store.add("b2", "http://cdn/b.m3u8", "/tmp/b.mp4")
+    store.close()
+
+    store = JobStore(db)
+    assert store.by_pid(4242)['job_id'] == "a1"
+    assert store.by_path("/tmp/b.mp4")['job_id'] == "b2"
+    assert store.get("a1")['bytes'] == 1024
+    assert [r['job_id'] for r in store.list(["queued"])] == ["b2"]
+    assert store.get("missing") is None
+
+
+def test_orphans_are_marked_interrupted_and_cleanup_removes_old_records(tmp_path):
+    store = JobStore(tmp_path / "jobs.db")
+    store.add("dead", "http://cdn/a.mp4", "/tmp/a.mp4", status="downloading", pid=111, host_pid=1)
+    store.add("alive", "http://cdn/b.mp4", "/tmp/b.mp4", status="downloading", pid=222, host_pid=1)
+    store.add("mine", "http://cdn/c.mp4", "/tmp/c.mp4")
+
+    assert store.mark_orphans(lambda pid: pid == 222) == 1
+    assert store.get("dead")['status'] == "interrupted"
+    assert store.get("alive")['status'] == "downloading"
+    assert store.get("mine")['status'] == "queued"
+
+    assert store.cleanup(older_than=3600) == 0
+    time.sleep(0.01)
+    assert store.cleanup(older_than=0) == 1
+    assert store.get("dead") is None and store.get("alive") is not None
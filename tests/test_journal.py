@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+from journal import JobJournal  # noqa: E402
+
+
+def test_journal_round_trip_and_incomplete_listing(tmp_path):
+    journal = JobJournal(str(tmp_path))
+    key = JobJournal.key_for("http://cdn/a.m3u8", "a.mp4")
+    assert key == JobJournal.key_for("http://cdn/a.m3u8", "a.mp4")
+    assert key != JobJournal.key_for("http://cdn/a.m3u8", "b.mp4")
+
+    journal.save({"job_key": key, "url": "http://cdn/a.m3u8", "path": "/tmp/a.mp4"})
+    journal.update(key, segments_done=7, bytes_done=1024)
+
+    record = journal.load(key)
+    assert record['segments_done'] == 7 and record['bytes_done'] == 1024
+    assert [r['job_key'] for r in journal.incomplete()] == [key]
+    assert not any(name.endswith('.tmp') for name in os.listdir(tmp_path))
+
+    journal.remove(key)
+    assert journal.load(key) is None
+    assert journal.update(key, segments_done=8) is None
@@ -0,0 +1,91 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+import hls  # noqa: E402
+import manifest  # noqa: E402
+
+MASTER = """#EXTM3U
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aud",NAME="English",LANGUAGE="en",DEFAULT=YES,URI="audio/en.m3u8"
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aud",NAME="Deutsch",LANGUAGE="de",URI="audio/de.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,AUDIO="aud"
+360p.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=5000000,RESOLUTION=1280x720,AUDIO="aud"
+720p.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=4000000,RESOLUTION=1920x1080,AUDIO="aud"
+1080p.m3u8
+"""
+
+
+class CountingFetcher:
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def get_text(self, url):
+        self.calls += 1
+        return self.text
+
+
+@pytest.mark.parametrize("policy,cap,expected", [
+    ("max-bandwidth", None, 1),
+    ("max-resolution", None, 2),
+    ("bandwidth-cap", 4500000, 2),
+    ("bandwidth-cap", 100, 0),
+])
+def test_select_variant_policies(policy, cap, expected):
+    variants = hls.parse_playlist(MASTER, "http://cdn/v/master.m3u8")['variants']
+    assert manifest.select_variant(variants, policy, cap) == expected
+
+
+def test_resolve_stream_picks_default_audio_rendition():
+    fetcher = CountingFetcher(MASTER)
+    cache = manifest.ManifestCache()
+    stream = manifest.resolve_stream(fetcher, "http://cdn/v/master.m3u8", cache, "max-resolution")
+    assert stream['program'] == 2
+    assert stream['media_url'] == "http://cdn/v/1080p.m3u8"
+    assert stream['audio_url'] == "http://cdn/v/audio/en.m3u8"
+
+    # Same manifest under a differently-cased host is served from the cache
+    manifest.resolve_stream(fetcher, "http://CDN:80/v/master.m3u8#t=1", cache)
+    assert fetcher.calls == 1
+    assert cache.stats()['hits'] == 1
+
+
+@pytest.mark.parametrize("select,media,audio", [
+    ({"type": "all", "resolution": "720p", "languages": ["de"]}, "720p.m3u8", "audio/de.m3u8"),
+    ({"type": "video"}, "1080p.m3u8", None),
+    ({"type": "audio", "languages": ["ger"]}, "audio/de.m3u8", None),
+])
+def test_resolve_stream_honours_stream_selection(select, media, audio):
+    import selection
+    cache = manifest.ManifestCache()
+    stream = manifest.resolve_stream(CountingFetcher(MASTER), "http://cdn/v/master.m3u8", cache,
+                                     "max-resolution", selection=selection.parse(select))
+    assert stream['media_url'] == "http://cdn/v/" + media
+    assert stream['audio_url'] == (audio and "http://cdn/v/" + audio)
+    if select['type'] == 'audio':
+        assert stream['variant'] is None and stream['rendition']['LANGUAGE'] == "de"
+
+
+def test_cache_evicts_least_recently_used_and_expired(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(manifest.time, 'monotonic', lambda: now[0])
+    cache = manifest.ManifestCache(max_entries=2, ttl=10)
+    cache.put("http://a/1", "one")
+    cache.put("http://a/2", "two")
+    assert cache.get("http://a/1") == "one"
+    cache.put("http://a/3", "three")
+    assert cache.get("http://a/2") is None
+    now[0] += 11
+    assert cache.get("http://a/1") is None
+
+
+def test_live_media_playlists_are_not_cached():
+    fetcher = CountingFetcher("#EXTM3U\n#EXTINF:2,\nseg0.ts\n")
+    cache = manifest.ManifestCache()
+    cache.fetch(fetcher, "http://cdn/live.m3u8")
+    cache.fetch(fetcher, "http://cdn/live.m3u8")
+    assert fetcher.calls == 2
@@ -0,0 +1,99 @@
+import os
+import sys
+import urllib.error
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+import hls  # noqa: E402
+import ranged  # noqa: E402
+from test_server import MediaServer, parse_range  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    with MediaServer(file_size=300000, segments=5, segment_duration=2.0, variants=[80000, 160000]) as media:
+        yield media
+
+
+def _get(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    with urllib.request.urlopen(request) as response:
+        return response.status, dict(response.headers), response.read()
+
+
+def test_parse_range():
+    assert parse_range('bytes=0-99', 1000) == (0, 100)
+    assert parse_range('bytes=900-', 1000) == (900, 100)
+    assert parse_range('bytes=-50', 1000) == (950, 50)
+    assert parse_range('bytes=990-2000', 1000) == (990, 10)
+    assert parse_range('bytes=1000-', 1000) is None
+    assert parse_range('bytes=-', 1000) is None
+
+
+def test_progressive_file_supports_ranges(server):
+    status, headers, full = _get(server.url('video.mp4'))
+    assert status == 200
+    assert len(full) == 300000
+    assert full[4:8] == b'ftyp'
+
+    status, headers, part = _get(server.url('video.mp4'), {'Range': 'bytes=100000-100099'})
+    assert status == 206
+    assert headers['Content-Range'] == 'bytes 100000-100099/300000'
+    assert part == full[100000:100100]
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        _get(server.url('video.mp4'), {'Range': 'bytes=400000-'})
+    assert error.value.code == 416
+
+
+def test_range_engine_matches_full_download(server, tmp_path):
+    output = str(tmp_path / 'video.mp4')
+    size = ranged.download_ranged(server.url('video.mp4'), output, connections=4, chunk_size=64 * 1024)
+    _, _, full = _get(server.url('video.mp4'))
+    assert size == len(full)
+    with open(output, 'rb') as f:
+        assert f.read() == full
+
+
+def test_hls_variants_and_segments(server, tmp_path):
+    _, _, text = _get(server.url('hls/master.m3u8'))
+    master = hls.parse_playlist(text.decode(), server.url('hls/master.m3u8'))
+    assert master['type'] == 'master'
+    assert [v['bandwidth'] for v in master['variants']] == [80000, 160000]
+
+    output = str(tmp_path / 'out.ts')
+    size = hls.download_hls(server.url('hls/master.m3u8'), output, workers=3)
+    # Best variant: 5 segments of 2 s at 160 kbit/s, whole TS packets
+    assert size == 5 * (160000 * 2 // 8 // 188 * 188)
+
+
+def test_dash_manifest_lists_representations(server):
+    status, headers, body = _get(server.url('dash/manifest.mpd'))
+    assert headers['Content-Type'] == 'application/dash+xml'
+    assert body.count(b'<Representation ') == 2
+    status, _, segment = _get(server.url('dash/v1/seg-0.m4s'))
+    assert status == 200 and len(segment) == 160000 * 2 // 8
+
+
+def test_injected_errors_are_reproducible():
+    def run():
+        with MediaServer(error_rate=0.5, seed=7, segments=2) as media:
+            codes = []
+            for _ in range(10):
+                try:
+                    codes.append(_get(media.url('hls/v0/seg0.ts'))[0])
+                except urllib.error.HTTPError as error:
+                    codes.append(error.code)
+            return codes, media.stats()['errors']
+
+    first, errors = run()
+    assert set(first) == {200, 503}
+    assert run() == (first, errors)
+
+
+def test_unknown_path_is_404(server):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        _get(server.url('hls/v9/index.m3u8'))
+    assert error.value.code == 404
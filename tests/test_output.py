@@ -0,0 +1,80 @@
+import os
+import stat
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+import output  # noqa: E402
+from hls import Segment  # noqa: E402
+
+# Copies the input to the output, or fails when the input says so
+FAKE_FFMPEG = """#!/bin/sh
+while [ "$1" != "-i" ]; do shift; done
+source="$2"
+for target; do :; done
+grep -q broken "$source" && { echo "moov atom not found" >&2; exit 1; }
+cp "$source" "$target"
+"""
+
+
+def test_auto_picks_by_expected_size():
+    assert output.choose('auto', 50 * 1024 * 1024) == 'faststart'
+    assert output.choose('auto', 4 * 1024 ** 3) == 'fragmented'
+    assert output.choose('auto', None) == 'fragmented'
+    assert output.choose('ts', 10) == 'ts'
+
+
+def test_ffmpeg_args_never_rewrite_except_faststart():
+    assert output.ffmpeg_args('faststart') == ['-movflags', '+faststart']
+    for strategy in ('fragmented', 'deferred'):
+        assert 'faststart' not in ' '.join(output.ffmpeg_args(strategy))
+    assert output.ffmpeg_args('ts') == ['-f', 'mpegts']
+    with pytest.raises(ValueError):
+        output.ffmpeg_args('auto')
+
+
+def test_container_follows_strategy_and_filename():
+    assert output.requested('auto', 'clip.mkv') == 'mkv'
+    assert output.requested(None, 'clip.mp4') == 'auto'
+    assert output.requested('fragmented', 'clip.ts') == 'fragmented'
+    assert output.filename_for('ts', 'clip.mp4') == 'clip.ts'
+    assert output.filename_for('fragmented', 'clip.mp4') == 'clip.mp4'
+    assert output.filename_for('auto', 'clip.m3u8') == 'clip.m3u8'
+
+
+def test_estimate_hls_size():
+    playlist = {"endlist": True, "segments": [Segment("a.ts", 6.0, None)] * 10}
+    assert output.estimate_hls_size(playlist, 8000000) == 60 * 1000000
+    assert output.estimate_hls_size(dict(playlist, endlist=False), 8000000) is None
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="uses a shell script as a stand-in ffmpeg")
+def test_deferred_remux_replaces_file_and_keeps_it_on_failure(tmp_path):
+    ffmpeg = tmp_path / "ffmpeg"
+    ffmpeg.write_text(FAKE_FFMPEG)
+    ffmpeg.chmod(ffmpeg.stat().st_mode | stat.S_IEXEC)
+    good = tmp_path / "good.mp4"
+    good.write_bytes(b"fragmented data")
+    bad = tmp_path / "bad.mp4"
+    bad.write_bytes(b"broken data")
+
+    results = {}
+    done = threading.Event()
+
+    def on_done(path, ok, error):
+        results[os.path.basename(path)] = (ok, error)
+        if len(results) == 2:
+            done.set()
+
+    remuxer = output.DeferredRemuxer(on_done=on_done)
+    remuxer.submit(str(ffmpeg), str(good))
+    remuxer.submit(str(ffmpeg), str(bad))
+    assert done.wait(10)
+
+    assert results["good.mp4"] == (True, None)
+    assert results["bad.mp4"] == (False, "moov atom not found")
+    assert bad.read_bytes() == b"broken data"
+    assert sorted(os.listdir(tmp_path)) == ["bad.mp4", "ffmpeg", "good.mp4"]
+    assert remuxer.pending == 0
@@ -0,0 +1,50 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+from progress import ProgressEstimator  # noqa: E402
+
+
+def test_ffmpeg_eta_follows_media_position():
+    estimator = ProgressEstimator()
+    estimator.duration = 100.0
+    estimator.prior_total = 5000
+    assert estimator.snapshot() == {"percent": None, "estimated_total": 5000, "eta": None, "rate": None}
+
+    # 2 media seconds and 1000 bytes per wall second
+    for tick in range(11):
+        estimator.update(tick * 1000, position=tick * 2.0, now=float(tick))
+
+    snapshot = estimator.snapshot()
+    assert snapshot['percent'] == 20.0
+    assert snapshot['estimated_total'] == 50000
+    assert snapshot['eta'] == 40.0
+    assert snapshot['rate'] == 1000
+
+
+def test_rate_is_smoothed_and_exact_totals_win():
+    estimator = ProgressEstimator(half_life=5.0)
+    estimator.total_bytes = 10000
+    estimator.update(0, now=0.0)
+    estimator.update(1000, now=1.0)
+    # A stalled second only pulls the smoothed rate part of the way down
+    estimator.update(1000, now=2.0)
+    assert 800 < estimator.byte_rate < 1000
+    assert estimator.estimated_total == 10000
+    assert estimator.snapshot()['percent'] == 10.0
+
+    estimator.update(10000, fraction=1.0, now=3.0)
+    assert estimator.snapshot()['eta'] == 0.0
+
+
+def test_a_tick_on_the_same_clock_reading_still_counts():
+    estimator = ProgressEstimator()
+    estimator.update(0, now=0.0)
+    estimator.update(4000, now=1.0)
+    # The final update often lands on the last tick's timestamp
+    estimator.update(5000, fraction=1.0, now=1.0)
+    assert estimator.snapshot() == {"percent": 100.0, "estimated_total": 5000, "eta": 0.0, "rate": 4000}
+    # The next rate is measured from the last tick that had one: 3000 B/s
+    # since t=1, not 2000 since the bytes of the same-time tick
+    estimator.update(7000, now=2.0)
+    assert 3800 < estimator.byte_rate < 4000
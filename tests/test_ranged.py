@@ -0,0 +1,114 @@
+import http.server
+import os
+import socketserver
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+import ranged  # noqa: E402
+
+CONTENT = bytes(range(256)) * 1000  # 256000 bytes
+
+
+def _serve(handler_class):
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def do_GET(self):
+        header = self.headers.get("Range")
+        self.requests.append(header)
+        if header and self.server.supports_ranges:
+            start, end = header.split("=")[1].split("-")
+            start, end = int(start), int(end or len(CONTENT) - 1)
+            body = CONTENT[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(CONTENT)}")
+        else:
+            body = CONTENT
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(params=[True, False], ids=["ranges", "no-ranges"])
+def server(request):
+    RangeHandler.requests = []
+    server = _serve(RangeHandler)
+    server.supports_ranges = request.param
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_download_matches_source(server, tmp_path, use_mmap):
+    output = tmp_path / "video.mp4"
+    url = f"http://127.0.0.1:{server.server_address[1]}/video.mp4"
+    size = ranged.download_ranged(url, str(output), connections=3, chunk_size=50000, use_mmap=use_mmap)
+    assert size == len(CONTENT)
+    assert output.read_bytes() == CONTENT
+    if server.supports_ranges:
+        # probe + 6 chunks of 50000 bytes
+        assert len(RangeHandler.requests) == 7
+
+
+def test_resume_skips_finished_chunks(tmp_path):
+    RangeHandler.requests = []
+    server = _serve(RangeHandler)
+    server.supports_ranges = True
+    try:
+        output = tmp_path / "video.mp4"
+        output.write_bytes(CONTENT[:100000] + b"\0" * (len(CONTENT) - 100000))
+        resume = {"size": len(CONTENT), "chunk_size": 50000, "chunks_done": [0, 50000]}
+        url = f"http://127.0.0.1:{server.server_address[1]}/video.mp4"
+        ranged.download_ranged(url, str(output), connections=2, chunk_size=50000, resume=resume)
+        assert output.read_bytes() == CONTENT
+        assert "bytes=0-49999" not in RangeHandler.requests
+        assert len(RangeHandler.requests) == 1 + 4
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_split_chunks_covers_file():
+    assert ranged.split_chunks(10, 4) == [(0, 4), (4, 4), (8, 2)]
+
+
+def test_probe_does_not_read_a_body_sent_without_ranges(server):
+    from hls import SegmentFetcher
+    fetcher = SegmentFetcher()
+    url = f"http://127.0.0.1:{server.server_address[1]}/video.mp4"
+    response_reads = []
+    original_open = fetcher.open
+
+    def tracking_open(*args, **kwargs):
+        response = original_open(*args, **kwargs)
+        read = response.read
+
+        def counting_read(*read_args):
+            data = read(*read_args)
+            response_reads.append(len(data))
+            return data
+        response.read = counting_read
+        return response
+    fetcher.open = tracking_open
+    try:
+        assert ranged.probe(fetcher, url) == (len(CONTENT), server.supports_ranges)
+        assert sum(response_reads) == (1 if server.supports_ranges else 0)
+        # The connection is still usable (or reopened) afterwards
+        assert fetcher.get(url, (0, 10))[:10] == CONTENT[:10]
+    finally:
+        fetcher.close()
@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+import ranged  # noqa: E402
+from ratelimit import BandwidthLimiter  # noqa: E402
+from test_server import MediaServer  # noqa: E402
+
+
+def _limiter(rate, *weights):
+    limiter = BandwidthLimiter(rate)
+    for index, weight in enumerate(weights):
+        limiter.register(f"job{index}", weight)
+    return limiter
+
+
+def test_unlimited_never_waits():
+    limiter = _limiter(None, 1)
+    assert limiter.report("job0", 10 ** 9) == 0.0
+    assert limiter.stats()['jobs']['job0']['bytes'] == 10 ** 9
+
+
+def test_active_jobs_split_the_cap_by_weight():
+    limiter = _limiter(1000, 1, 3)
+    now = time.monotonic()
+    with limiter._lock:
+        limiter._charge("job0", 0, now)
+        limiter._charge("job1", 0, now)
+        # Both active: 250 and 750 bytes/s; 500 bytes of debt is 2 s and 0.67 s
+        assert limiter._charge("job0", 500, now) == pytest.approx(2.0, rel=1e-3)
+        assert limiter._charge("job1", 500, now) == pytest.approx(500 / 750, rel=1e-3)
+
+
+def test_idle_job_gives_up_its_share():
+    limiter = _limiter(1000, 1, 1)
+    now = time.monotonic()
+    with limiter._lock:
+        limiter._charge("job1", 0, now - 5)
+        # job1 has been quiet for 5 s, so job0 gets the whole cap
+        assert limiter._charge("job0", 1000, now) == pytest.approx(1.0, rel=1e-3)
+
+
+def test_rate_and_weight_change_at_runtime():
+    limiter = _limiter(1000, 1)
+    limiter.set_rate(4000)
+    assert limiter.set_weight("job0", 2)
+    assert not limiter.set_weight("missing", 2)
+    assert limiter.stats()['jobs']['job0'] == {"weight": 2.0, "active": False, "share": 4000, "bytes": 0}
+
+
+def test_range_engine_is_held_to_its_share(tmp_path):
+    limiter = _limiter(400 * 1024, 1)
+    with MediaServer(file_size=600 * 1024) as server:
+        start = time.monotonic()
+        ranged.download_ranged(server.url('video.mp4'), str(tmp_path / "out.mp4"), connections=4,
+                               chunk_size=64 * 1024, throttle=limiter.throttle_for("job0"))
+        elapsed = time.monotonic() - start
+    # 600 KB at 400 KB/s, less at most one 0.5 s burst
+    assert elapsed >= 0.9
+    assert limiter.stats()['jobs']['job0']['bytes'] == 600 * 1024
@@ -0,0 +1,73 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+from scheduler import DownloadScheduler  # noqa: E402
+
+
+def _job(job_id):
+    return {"job_id": job_id, "status": "queued"}
+
+
+def test_limit_priority_and_fifo_order():
+    started = []
+    scheduler = DownloadScheduler(1, lambda job: started.append(job['job_id']))
+
+    assert scheduler.submit(_job('a')) == 0
+    b, c, d = _job('b'), _job('c'), _job('d')
+    assert scheduler.submit(b) == 1
+    assert scheduler.submit(c) == 2
+    # Higher priority jumps ahead of earlier normal-priority jobs
+    assert scheduler.submit(d, priority=5) == 1
+    assert scheduler.position(b) == 2
+
+    scheduler.job_finished(_job('a'))
+    scheduler.job_finished(d)
+    assert started == ['a', 'd', 'b']
+
+
+def test_cancel_and_raise_limit():
+    started = []
+    scheduler = DownloadScheduler(1, lambda job: started.append(job['job_id']))
+    a, b, c = _job('a'), _job('b'), _job('c')
+    for job in (a, b, c):
+        scheduler.submit(job)
+
+    assert scheduler.cancel(b)
+    assert not scheduler.cancel(a)  # running, not queued
+    scheduler.set_max_concurrent(3)
+    assert started == ['a', 'c']
+    assert scheduler.stats() == {"max_concurrent": 3, "running": 2, "queued": 0}
+
+
+def test_failed_launch_frees_slot():
+    def start(job):
+        if job['job_id'] == 'bad':
+            raise FileNotFoundError('ffmpeg')
+
+    scheduler = DownloadScheduler(1, start)
+    bad = _job('bad')
+    scheduler.submit(bad)
+    assert bad['status'] == 'failed'
+    assert scheduler.submit(_job('ok')) == 0
+
+
+def test_failure_of_a_later_launch_is_reported():
+    failures = []
+
+    def start(job):
+        if job['job_id'] == 'bad':
+            raise FileNotFoundError('ffmpeg')
+
+    scheduler = DownloadScheduler(1, start, lambda job, error: failures.append((job['job_id'], error)))
+    first, bad, ok = _job('first'), _job('bad'), _job('ok')
+    for job in (first, bad, ok):
+        scheduler.submit(job)
+
+    scheduler.job_finished(first)
+    assert bad['status'] == 'failed' and [job_id for job_id, _ in failures] == ['bad']
+    assert scheduler.stats()['running'] == 1 and scheduler.position(ok) == 0
+    # The submitter of a job that fails right away hears of it directly
+    scheduler.job_finished(ok)
+    scheduler.submit(_job('bad'))
+    assert len(failures) == 1
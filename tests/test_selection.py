@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+import hls  # noqa: E402
+import selection  # noqa: E402
+
+MUXED = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=128000,CODECS="mp4a.40.2"
+audio.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2"
+360p.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2500000,RESOLUTION=1280x720,CODECS="avc1.4d401f,mp4a.40.2"
+720p.m3u8
+"""
+
+
+def test_parse_normalises_and_rejects():
+    assert selection.parse(None) is None
+    assert selection.parse({"type": "all"}) is None
+    assert selection.parse("audio") == {"type": "audio", "max_height": None, "languages": [], "subtitles": False}
+    assert selection.parse({"resolution": "1280x720", "languages": "EN, de"}) == \
+        {"type": "all", "max_height": 720, "languages": ["en", "de"], "subtitles": False}
+    with pytest.raises(ValueError):
+        selection.parse("karaoke")
+    with pytest.raises(ValueError):
+        selection.parse({"resolution": "huge"})
+    assert selection.key(selection.parse("audio")) != selection.key(selection.parse("video"))
+    assert selection.key(None) == ''
+
+
+def test_variant_candidates_by_type_and_resolution():
+    variants = hls.parse_playlist(MUXED, "http://cdn/master.m3u8")['variants']
+    assert selection.variant_candidates(variants, None) == [0, 1, 2]
+    assert selection.variant_candidates(variants, selection.parse("audio")) == [0]
+    assert selection.variant_candidates(variants, selection.parse("video")) == [1, 2]
+    assert selection.variant_candidates(variants, selection.parse({"resolution": 480})) == [1]
+    # Nothing fits: the smallest video variant rather than nothing
+    assert selection.variant_candidates(variants, selection.parse({"resolution": 144})) == [1]
+    # Audio muxed into every variant: the cheapest one carries it
+    assert selection.variant_candidates(variants[1:], selection.parse("audio")) == [0]
+
+
+def test_language_matching_across_code_styles():
+    assert selection.language_matches("eng", ["en"])
+    assert selection.language_matches("en-US", ["eng"])
+    assert not selection.language_matches("de", ["en"])
+    assert not selection.language_matches(None, ["en"])
+    renditions = [{"LANGUAGE": "en", "DEFAULT": "YES"}, {"LANGUAGE": "de"}]
+    assert selection.pick_rendition(renditions, ["fr", "deu"]) is renditions[1]
+    assert selection.pick_rendition(renditions, ["fr"]) is renditions[0]
+    assert selection.pick_rendition([], ["en"]) is None
+
+
+def test_map_args():
+    assert selection.map_args(None) == []
+    assert selection.map_args(None, separate_audio=True) == ['-map', '0:v', '-map', '1:a']
+    assert selection.map_args(selection.parse("audio")) == ['-map', '0:a']
+    assert selection.map_args(selection.parse("video"), separate_audio=True) == ['-map', '0:v']
+    assert selection.map_args(selection.parse("audio"), separate_audio=True) == ['-map', '1:a?']
+
+    german = selection.parse({"languages": ["de"]})
+    # Without a probe there is nothing to match against: all audio, as when
+    # no stream is in a wanted language
+    assert selection.map_args(german) == ['-map', '0:v?', '-map', '0:a?']
+    assert selection.map_args(selection.parse({"type": "audio", "languages": ["de"]})) == ['-map', '0:a']
+    # With one, the exact streams
+    streams = [{"index": 0, "type": "video", "input": 0},
+               {"index": 1, "type": "audio", "language": "eng", "input": 0},
+               {"index": 2, "type": "audio", "language": "ger", "input": 0},
+               {"index": 3, "type": "subtitle", "language": "ger", "input": 0}]
+    assert selection.map_args(german, streams=streams) == ['-map', '0:v?', '-map', '0:2']
+    with_subtitles = selection.parse({"type": "audio", "languages": ["fr"], "subtitles": True})
+    assert selection.map_args(with_subtitles, streams=streams) == ['-map', '0:a', '-map', '0:s?']
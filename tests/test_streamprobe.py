@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+import hls  # noqa: E402
+import manifest  # noqa: E402
+import streamprobe  # noqa: E402
+from test_server import MediaServer  # noqa: E402
+
+
+def _probe(url, policy=None):
+    fetcher = hls.SegmentFetcher()
+    try:
+        return streamprobe.probe_manifest(fetcher, url, manifest.ManifestCache(), policy)
+    finally:
+        fetcher.close()
+
+
+def test_hls_probe_picks_the_variant_and_sums_the_duration():
+    with MediaServer(segments=10, segment_duration=4.0) as server:
+        info = _probe(server.url('hls/master.m3u8'))
+        capped = _probe(server.url('hls/master.m3u8'), 'max-resolution')
+    assert info['type'] == 'hls' and info['container'] == 'mpegts' and not info['live']
+    assert [v['bandwidth'] for v in info['variants']] == [800000, 2400000, 6000000]
+    assert info['variants'][1] == {"bandwidth": 2400000, "resolution": "1280x720", "codecs": "avc1.64001f,mp4a.40.2"}
+    assert info['stream']['program'] == 2 and info['stream']['media_url'].endswith('/hls/v2/index.m3u8')
+    assert info['duration'] == 40.0 and info['size'] == 40 * 6000000 // 8
+    assert capped['stream']['program'] == 2
+
+
+def test_dash_and_progressive_probes():
+    with MediaServer(segments=10, segment_duration=4.0, file_size=123456) as server:
+        dash = _probe(server.url('dash/manifest.mpd'))
+        progressive = _probe(server.url('video.mp4'))
+    assert dash['duration'] == 40.0 and dash['container'] == 'mp4'
+    assert [r['resolution'] for r in dash['variants']] == ['640x360', '1280x720', '1920x1080']
+    assert progressive == dict(progressive, type='progressive', size=123456, ranges=True, container='mp4')
+    assert streamprobe.parse_iso_duration("PT1H2M3.5S") == 3723.5
+    assert streamprobe.parse_iso_duration("bogus") is None
+
+
+def test_ffmpeg_streams_are_tagged_with_their_input():
+    info = {"duration": None, "live": False, "container": None}
+    video = {"container": "hls", "duration": 40.0, "streams": [{"index": 0, "type": "video", "codec": "h264"}]}
+    audio = {"container": "hls", "duration": 40.0, "streams": [{"index": 0, "type": "audio", "codec": "aac"}]}
+    streamprobe.merge_ffmpeg_info(info, [video, audio])
+    assert [(s['input'], s['type']) for s in info['streams']] == [(0, 'video'), (1, 'audio')]
+    assert info['duration'] == 40.0 and info['container'] is None
+
+
+def test_cache_runs_each_probe_once_and_reports_failures():
+    done = threading.Event()
+    results = []
+
+    def on_done(key, info, error):
+        results.append((key, info, error))
+        if len(results) == 2:
+            done.set()
+
+    release = threading.Event()
+    cache = streamprobe.ProbeCache(on_done=on_done)
+
+    def slow():
+        release.wait(5)
+        return {"duration": 1.0}
+
+    def broken():
+        raise ValueError("no manifest")
+
+    assert cache.submit("a", slow)
+    assert not cache.submit("a", slow)
+    assert cache.pending("a")
+    assert cache.submit("b", broken)
+    release.set()
+    assert done.wait(5)
+    assert sorted((key, error) for key, _, error in results) == [("a", None), ("b", "no manifest")]
+    assert cache.get("a")['duration'] == 1.0 and cache.get("b") is None
+    assert not cache.submit("a", slow)
+
+    cache.ttl = 0
+    assert cache.get("a") is None
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'native-host'))
+from supervisor import ProcessSupervisor, _Watch  # noqa: E402
+
+CHILD = r'''
+import sys, time
+for i in range(3):
+    sys.stdout.write(f"line{i}\n"); sys.stdout.flush()
+    sys.stderr.write(f"err{i}\n"); sys.stderr.flush()
+    time.sleep(0.01)
+sys.stdout.write("tail-without-newline")
+sys.exit(int(sys.argv[1]))
+'''
+
+
+def _spawn(code=0):
+    return subprocess.Popen([sys.executable, '-c', CHILD, str(code)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def _collect(supervisor, process):
+    result = {"stdout": [], "stderr": [], "exit": None}
+    done = threading.Event()
+
+    def on_exit(code):
+        result["exit"] = code
+        done.set()
+
+    supervisor.watch(process, on_stdout=result["stdout"].append, on_stderr=result["stderr"].append,
+                     on_exit=on_exit)
+    return result, done
+
+
+def test_watch_joins_partial_reads_into_lines():
+    lines = []
+    watch = _Watch(type('P', (), {'stdout': open(os.devnull, 'rb'), 'stderr': None})(),
+                   lines.append, None, None)
+    fd = next(iter(watch.callbacks))
+    watch.feed(fd, b'a=1\nb=')
+    watch.feed(fd, b'2\n')
+    watch.feed(fd, b'c')
+    assert lines == [b'a=1\n', b'b=2\n']
+    watch.feed(fd, b'')
+    assert lines[-1] == b'c' and watch.closed
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="selector loop is POSIX only")
+def test_one_thread_supervises_many_children():
+    supervisor = ProcessSupervisor()
+    runs = [_collect(supervisor, _spawn(code)) for code in (0, 3, 0, 0, 1)]
+    for _, done in runs:
+        assert done.wait(10)
+
+    for (result, _), code in zip(runs, (0, 3, 0, 0, 1)):
+        assert result["exit"] == code
+        assert result["stdout"] == [b"line0\n", b"line1\n", b"line2\n", b"tail-without-newline"]
+        assert result["stderr"] == [b"err0\n", b"err1\n", b"err2\n"]
+    assert supervisor.wait_idle(5)
+    assert supervisor.active == 0
+    # The thread exits once nothing is left to watch
+    assert supervisor._thread is None
+
+
+def test_failing_callback_is_reported_and_supervision_continues():
+    errors = []
+    supervisor = ProcessSupervisor(on_error=lambda e, process: errors.append(str(e)))
+    done = threading.Event()
+
+    def broken(line):
+        raise ValueError("bad line")
+
+    supervisor.watch(_spawn(), on_stdout=broken, on_exit=lambda code: done.set())
+    assert done.wait(10)
+    assert errors and errors[0] == "bad line"
+
+
+def test_exit_callback_can_start_the_next_child():
+    supervisor = ProcessSupervisor()
+    codes = []
+    done = threading.Event()
+
+    def first_exited(code):
+        codes.append(code)
+        supervisor.watch(_spawn(2), on_exit=lambda code: (codes.append(code), done.set()))
+
+    supervisor.watch(_spawn(0), on_exit=first_exited)
+    assert done.wait(10)
+    assert codes == [0, 2]
+
+
+def test_reader_threads_are_not_daemons(monkeypatch):
+    # Either reader can be the one that runs on_exit and records the outcome
+    monkeypatch.setattr(sys, 'platform', 'win32')
+    started = []
+    real_thread = threading.Thread
+
+    def thread(*args, **kwargs):
+        started.append(kwargs.get('daemon'))
+        return real_thread(*args, **kwargs)
+    monkeypatch.setattr(threading, 'Thread', thread)
+    supervisor = ProcessSupervisor()
+    result, done = _collect(supervisor, _spawn())
+    assert done.wait(10) and result["exit"] == 0
+    assert started == [False, False]
+    assert supervisor.wait_idle(5)